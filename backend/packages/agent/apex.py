@@ -0,0 +1,412 @@
+"""
+Ape-X style actor–learner training.
+
+``ApexTrainer`` starts ``actors`` processes.  Each one steps its own
+:class:`VectorTradingEnv` with a frozen :class:`DQNetwork` and writes the
+transitions into one :class:`SharedReplayBuffer` in shared memory.  The
+calling process is the single learner: it runs ``train_step`` on that
+buffer in a loop.  Every ``publish_every`` updates it writes the online
+network's parameters to :class:`SharedWeights`, and actors pull them every
+``actor_sync_every`` steps.  Actor ``i`` of ``N`` explores with
+ε_i = 0.4 ** (1 + 7·i/(N−1)), as in the Ape-X paper.  The actors together
+keep a spread of exploration rates, so the learner does not need an ε
+schedule.
+
+Writers append to the replay ring under a ``multiprocessing.Lock``.  The
+learner holds the same lock only while it copies out a sampled batch.  The
+weights use a seqlock (see :mod:`packages.agent.snapshot`), so publishing
+never waits for actors.  Bars reach the actors through the memory-mapped
+:class:`packages.backtest.sweep.BarStore`.
+
+Used by :func:`packages.agent.trainer.run_training` when
+``TrainingConfig.actors`` is positive.  An "episode" then means
+``episode_length`` learner updates.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import multiprocessing
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+from packages.agent.ddqn import DDQNAgent, DQNetwork, ReplayBuffer
+from packages.agent.env import VectorTradingEnv, epsilon_greedy
+from packages.agent.feature_engine import FeatureEngine
+from packages.agent.trainer import EpisodeMetrics, TrainingConfig, TrainingResult
+from packages.backtest.data import Bars
+from packages.backtest.sweep import BarStore
+
+logger = logging.getLogger(__name__)
+
+_HEADER_BYTES = 64
+_REPLAY_HEADER = np.dtype([
+    ("pos", "<i8"),
+    ("size", "<i8"),
+    ("added", "<i8"),  # transitions ever written
+    ("episodes", "<i8"),  # env episodes finished by the actors
+    ("return_sum", "<f8"),  # sum of their returns
+])
+_EPSILON_BASE, _EPSILON_ALPHA = 0.4, 7.0
+
+
+def actor_epsilon(index: int, actors: int) -> float:
+    if actors <= 1:
+        return _EPSILON_BASE
+    return _EPSILON_BASE ** (1.0 + _EPSILON_ALPHA * index / (actors - 1))
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Spawned actors share the learner's resource tracker, which keeps one
+    # entry per name; the learner's unlink() clears it, so no unregister here.
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedReplayBuffer(ReplayBuffer):
+    """:class:`ReplayBuffer` whose arrays and cursor live in shared memory."""
+
+    def __init__(
+        self,
+        shm: shared_memory.SharedMemory,
+        capacity: int,
+        state_dim: int,
+        lock,
+        owner: bool,
+    ) -> None:
+        self._shm = shm
+        self._owner = owner
+        self.capacity = capacity
+        self._lock = lock
+        self._rng = np.random.default_rng()
+        self._header = np.ndarray((), dtype=_REPLAY_HEADER, buffer=shm.buf)
+        offset = _HEADER_BYTES
+        views = {}
+        for name, dtype, shape in self.layout(capacity, state_dim):
+            views[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            offset += views[name].nbytes
+        self.states = views["states"]
+        self.actions = views["actions"]
+        self.rewards = views["rewards"]
+        self.next_states = views["next_states"]
+        self.dones = views["dones"]
+
+    @classmethod
+    def create(cls, capacity: int, state_dim: int, lock=None) -> SharedReplayBuffer:
+        size = _HEADER_BYTES + sum(
+            int(np.prod(shape)) * np.dtype(dtype).itemsize
+            for _, dtype, shape in cls.layout(capacity, state_dim)
+        )
+        name = f"stocktrade-replay-{secrets.token_hex(4)}"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:_HEADER_BYTES] = bytes(_HEADER_BYTES)
+        return cls(shm, capacity, state_dim, lock or multiprocessing.Lock(), owner=True)
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, state_dim: int, lock) -> SharedReplayBuffer:
+        return cls(_attach(name), capacity, state_dim, lock, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def lock(self):
+        return self._lock
+
+    # ReplayBuffer keeps its cursor in these two attributes
+    @property
+    def _pos(self) -> int:
+        return int(self._header["pos"])
+
+    @_pos.setter
+    def _pos(self, value: int) -> None:
+        self._header["pos"] = value
+
+    @property
+    def _size(self) -> int:
+        return int(self._header["size"])
+
+    @_size.setter
+    def _size(self, value: int) -> None:
+        self._header["size"] = value
+
+    def push_batch(self, states, actions, rewards, next_states, dones) -> None:
+        super().push_batch(states, actions, rewards, next_states, dones)
+        with self._lock:
+            self._header["added"] += len(actions)
+
+    def record_episodes(self, returns: np.ndarray) -> None:
+        with self._lock:
+            self._header["episodes"] += returns.size
+            self._header["return_sum"] += float(returns.sum())
+
+    def stats(self) -> tuple[int, int, float]:
+        """(transitions added, episodes finished, sum of their returns)."""
+        with self._lock:
+            h = self._header
+            return int(h["added"]), int(h["episodes"]), float(h["return_sum"])
+
+    def close(self) -> None:
+        for attr in ("_header", "states", "actions", "rewards", "next_states", "dones"):
+            setattr(self, attr, None)
+        self._shm.close()
+        if self._owner:
+            with contextlib.suppress(FileNotFoundError):
+                self._shm.unlink()
+
+
+class SharedWeights:
+    """A flat float32 parameter vector published by one writer under a seqlock."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, size: int, owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._seq = np.ndarray((1,), dtype="<u8", buffer=shm.buf)
+        self._data = np.ndarray((size,), dtype=np.float32, buffer=shm.buf, offset=_HEADER_BYTES)
+
+    @classmethod
+    def create(cls, size: int) -> SharedWeights:
+        name = f"stocktrade-weights-{secrets.token_hex(4)}"
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_BYTES + size * 4)
+        shm.buf[:_HEADER_BYTES] = bytes(_HEADER_BYTES)
+        return cls(shm, size, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, size: int) -> SharedWeights:
+        return cls(_attach(name), size, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def version(self) -> int:
+        return int(self._seq[0]) // 2
+
+    def publish(self, vector: np.ndarray) -> None:
+        self._seq[0] += 1  # odd: write in progress
+        self._data[:] = vector
+        self._seq[0] += 1
+
+    def read_into(self, out: np.ndarray) -> int | None:
+        """Copy the latest consistent vector into ``out``; returns its version."""
+        for _ in range(100):
+            before = int(self._seq[0])
+            if before == 0:
+                return None  # nothing published yet
+            if before % 2 == 0:
+                out[:] = self._data
+                if int(self._seq[0]) == before:
+                    return before // 2
+            time.sleep(0)
+        return None
+
+    def close(self) -> None:
+        self._seq = self._data = None
+        self._shm.close()
+        if self._owner:
+            with contextlib.suppress(FileNotFoundError):
+                self._shm.unlink()
+
+
+# ── actors ────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class _ActorSpec:
+    store_dir: str
+    store_index: dict[str, tuple[int, int]]
+    replay_name: str
+    replay_capacity: int
+    weights_name: str
+    weights_size: int
+    num_envs: int
+    episode_length: int
+    cost_bps: float
+    reward_scale: float
+    sync_every: int
+    seed: int | None
+
+
+def _actor_main(index: int, epsilon: float, spec: _ActorSpec, lock, stop) -> None:
+    torch.set_num_threads(1)
+    store = BarStore(spec.store_dir, spec.store_index)
+    env = VectorTradingEnv(
+        [store.bars(s) for s in spec.store_index],
+        num_envs=spec.num_envs,
+        episode_length=spec.episode_length,
+        cost_bps=spec.cost_bps,
+        reward_scale=spec.reward_scale,
+        seed=None if spec.seed is None else spec.seed + index,
+    )
+    replay = SharedReplayBuffer.attach(
+        spec.replay_name, spec.replay_capacity, FeatureEngine.STATE_DIM, lock
+    )
+    weights = SharedWeights.attach(spec.weights_name, spec.weights_size)
+    net = DQNetwork(FeatureEngine.STATE_DIM, 3).eval()
+    vector = np.empty(spec.weights_size, dtype=np.float32)
+    version = None
+    rng = np.random.default_rng(None if spec.seed is None else spec.seed + 1_000 + index)
+    returns = np.zeros(spec.num_envs)
+    env.reset()
+    step = 0
+    try:
+        while not stop.is_set():
+            if step % spec.sync_every == 0:
+                latest = weights.read_into(vector)
+                if latest is not None and latest != version:
+                    vector_to_parameters(torch.from_numpy(vector), net.parameters())
+                    version = latest
+            states = env.states
+            with torch.no_grad():
+                q = net(torch.from_numpy(states)).numpy()
+            actions = epsilon_greedy(q, epsilon, rng)
+            next_states, rewards, dones = env.step(actions)
+            replay.push_batch(states, actions, rewards, next_states, dones)
+            returns += rewards
+            if dones.any():
+                replay.record_episodes(returns[dones])
+                returns[dones] = 0.0
+            step += 1
+    finally:
+        replay.close()
+        weights.close()
+
+
+# ── learner ───────────────────────────────────────────────────
+
+
+class ApexTrainer:
+    """Same interface as :class:`packages.agent.trainer.DDQNTrainer`."""
+
+    def __init__(
+        self,
+        bars: Sequence[Bars],
+        config: TrainingConfig | None = None,
+        agent: DDQNAgent | None = None,
+    ) -> None:
+        self.config = config = config or TrainingConfig()
+        if config.actors < 1:
+            raise ValueError("ApexTrainer needs at least one actor")
+        self._bars = {b.symbol: b for b in bars}
+        self.agent = agent or DDQNAgent(
+            lr=config.lr,
+            gamma=config.gamma,
+            epsilon=0.0,  # exploration happens in the actors
+            epsilon_min=0.0,
+            batch_size=config.batch_size,
+            target_update_freq=config.target_update_freq,
+            buffer_capacity=1,
+        )
+
+    def run(
+        self,
+        on_episode: Callable[[EpisodeMetrics], None] | None = None,
+        stop: threading.Event | None = None,
+    ) -> TrainingResult:
+        cfg = self.config
+        ctx = multiprocessing.get_context("spawn")
+        store_dir = tempfile.mkdtemp(prefix="stocktrade-apex-")
+        store = BarStore.create(self._bars, store_dir)
+        replay = SharedReplayBuffer.create(cfg.buffer_capacity, FeatureEngine.STATE_DIM, ctx.Lock())
+        params = parameters_to_vector(self.agent.online_net.parameters()).detach()
+        weights = SharedWeights.create(params.numel())
+        weights.publish(params.cpu().numpy())
+        self.agent.replay = replay
+
+        spec = _ActorSpec(
+            store_dir, store.index, replay.name, cfg.buffer_capacity,
+            weights.name, params.numel(), cfg.num_envs, cfg.episode_length,
+            cfg.cost_bps, cfg.reward_scale, cfg.actor_sync_every, cfg.seed,
+        )
+        stop_actors = ctx.Event()
+        epsilons = [actor_epsilon(i, cfg.actors) for i in range(cfg.actors)]
+        actors = [
+            ctx.Process(
+                target=_actor_main,
+                args=(i, epsilons[i], spec, replay.lock, stop_actors),
+                name=f"apex-actor-{i}",
+                daemon=True,
+            )
+            for i in range(cfg.actors)
+        ]
+        threads = torch.get_num_threads()
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) - cfg.actors))
+        for p in actors:
+            p.start()
+        logger.info("Ape-X: %d actors started, learner pid %d", cfg.actors, os.getpid())
+        try:
+            return self._learn(replay, weights, actors, float(np.mean(epsilons)), on_episode, stop)
+        finally:
+            stop_actors.set()
+            for p in actors:
+                p.join(timeout=10)
+                if p.is_alive():
+                    p.terminate()
+            torch.set_num_threads(threads)
+            self.agent.replay = ReplayBuffer(1, FeatureEngine.STATE_DIM)
+            replay.close()
+            weights.close()
+            del store
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+    def _check_actors(self, actors: list) -> None:
+        for p in actors:
+            if p.exitcode is not None:
+                raise RuntimeError(f"{p.name} exited with code {p.exitcode}")
+
+    def _learn(self, replay, weights, actors, epsilon, on_episode, stop) -> TrainingResult:
+        cfg, agent = self.config, self.agent
+        warmup = max(cfg.learning_starts, cfg.batch_size)
+        while len(replay) < warmup:
+            if stop is not None and stop.is_set():
+                return TrainingResult(0, None, None)
+            self._check_actors(actors)
+            time.sleep(0.05)
+
+        best: float | None = None
+        final_loss: float | None = None
+        done = 0
+        _, episodes_seen, returns_seen = replay.stats()
+        reward = 0.0
+        for episode in range(1, cfg.episodes + 1):
+            if stop is not None and stop.is_set():
+                break
+            self._check_actors(actors)
+            loss_sum = 0.0
+            for _ in range(cfg.episode_length):
+                loss_sum += agent.train_step()
+                if agent.step_count % cfg.publish_every == 0:
+                    weights.publish(
+                        parameters_to_vector(agent.online_net.parameters()).detach().cpu().numpy()
+                    )
+            _, episodes, returns = replay.stats()
+            if episodes > episodes_seen:  # otherwise keep the previous mean
+                reward = (returns - returns_seen) / (episodes - episodes_seen)
+                episodes_seen, returns_seen = episodes, returns
+            probe = replay.states[: min(len(replay), 1_024)]
+            metrics = EpisodeMetrics(
+                episode=episode,
+                reward=reward,
+                loss=loss_sum / cfg.episode_length,
+                q_value=float(agent.q_values_batch(probe).max(axis=1).mean()),
+                epsilon=epsilon,
+            )
+            done = episode
+            best = metrics.reward if best is None else max(best, metrics.reward)
+            final_loss = metrics.loss
+            if on_episode is not None:
+                on_episode(metrics)
+        return TrainingResult(done, best, final_loss)
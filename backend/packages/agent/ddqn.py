@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import contextlib
+import logging
+import os
 import random
-from collections import deque
+import tempfile
+import threading
+from collections.abc import Callable
 from datetime import datetime, timezone
 
 import numpy as np
@@ -9,6 +14,9 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 
+from packages.agent.inference import SNAPSHOT_BACKENDS, InferenceFn, optimize
+
+logger = logging.getLogger(__name__)
 
 # -- Neural network -------------------------------------------------
 class DQNetwork(nn.Module):
@@ -27,31 +35,74 @@ class DQNetwork(nn.Module):
 
 # -- Replay buffer --------------------------------------------------
 class ReplayBuffer:
-    def __init__(self, capacity: int = 50_000):
-        self.buffer: deque = deque(maxlen=capacity)
+    """Fixed-capacity ring buffer of transitions in preallocated NumPy arrays."""
+
+    def __init__(self, capacity: int = 50_000, state_dim: int = 14):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self._pos = 0
+        self._size = 0
+        self._rng = np.random.default_rng()
+        # the API pushes on the event loop while a training thread samples
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def layout(capacity: int, state_dim: int) -> list[tuple[str, type, tuple]]:
+        """(attribute, dtype, shape) of each transition array, for alternative storage."""
+        return [
+            ("states", np.float32, (capacity, state_dim)),
+            ("next_states", np.float32, (capacity, state_dim)),
+            ("actions", np.int64, (capacity,)),
+            ("rewards", np.float32, (capacity,)),
+            ("dones", np.float32, (capacity,)),
+        ]
 
     def push(self, state, action, reward, next_state, done):
-        self.buffer.append((
-            np.array(state, dtype=np.float32),
-            int(action),
-            float(reward),
-            np.array(next_state, dtype=np.float32),
-            bool(done),
-        ))
+        with self._lock:
+            i = self._pos
+            self.states[i] = state
+            self.actions[i] = action
+            self.rewards[i] = reward
+            self.next_states[i] = next_state
+            self.dones[i] = done
+            self._pos = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, dones) -> None:
+        """Append n transitions with one slice assignment per field."""
+        n = len(actions)
+        if n > self.capacity:  # only the newest ``capacity`` survive anyway
+            cut = n - self.capacity
+            states, actions, rewards = states[cut:], actions[cut:], rewards[cut:]
+            next_states, dones = next_states[cut:], dones[cut:]
+            n = self.capacity
+        with self._lock:
+            first = min(n, self.capacity - self._pos)
+            for lo, hi, at in ((0, first, self._pos), (first, n, 0)):
+                if hi > lo:
+                    self.states[at : at + hi - lo] = states[lo:hi]
+                    self.actions[at : at + hi - lo] = actions[lo:hi]
+                    self.rewards[at : at + hi - lo] = rewards[lo:hi]
+                    self.next_states[at : at + hi - lo] = next_states[lo:hi]
+                    self.dones[at : at + hi - lo] = dones[lo:hi]
+            self._pos = (self._pos + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
 
     def sample(self, batch_size: int):
-        batch = random.sample(self.buffer, batch_size)
-        s, a, r, ns, d = zip(*batch)
-        return (
-            torch.FloatTensor(np.array(s)),
-            torch.LongTensor(a),
-            torch.FloatTensor(r),
-            torch.FloatTensor(np.array(ns)),
-            torch.FloatTensor(d),
-        )
+        with self._lock:
+            idx = self._rng.choice(self._size, batch_size, replace=False)
+            batch = (
+                self.states[idx], self.actions[idx], self.rewards[idx],
+                self.next_states[idx], self.dones[idx],
+            )
+        return tuple(torch.from_numpy(a) for a in batch)
 
     def __len__(self) -> int:
-        return len(self.buffer)
+        return self._size
 
 
 # -- DDQN agent -----------------------------------------------------
@@ -74,7 +125,9 @@ class DDQNAgent:
         self.device = torch.device(
             "cuda" if torch.cuda.is_available() else "cpu"
         )
+        self.state_dim = state_dim
         self.action_dim = action_dim
+        self.lr = lr
         self.gamma = gamma
         self.epsilon = epsilon
         self.epsilon_min = epsilon_min
@@ -91,20 +144,63 @@ class DDQNAgent:
 
         self.optimizer = optim.Adam(self.online_net.parameters(), lr=lr)
         self.loss_fn = nn.SmoothL1Loss()
-        self.replay = ReplayBuffer(buffer_capacity)
+        self.replay = ReplayBuffer(buffer_capacity, state_dim)
+        # held by inference and by copy_weights_from, never by train_step
+        self.weights_lock = threading.Lock()
+        # optimized variant of online_net that decisions run through
+        self.inference_backend = "eager"
+        self._inference: InferenceFn | None = None
 
     # -- Inference --------------------------------------------------
+    # Each call reads the serving network once, so a concurrent
+    # :meth:`install` never changes the network mid-decision.
     def act(self, state: np.ndarray, training: bool = False) -> int:
         if training and random.random() < self.epsilon:
             return random.randrange(self.action_dim)
         t = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            return int(self.online_net(t).argmax(dim=1).item())
+        with self.weights_lock, torch.no_grad():
+            return int(self._serving_net()(t).argmax(dim=1).item())
 
     def q_values(self, state: np.ndarray) -> list[float]:
         t = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            return self.online_net(t).squeeze().tolist()
+        with self.weights_lock, torch.no_grad():
+            return self._serving_net()(t).squeeze().tolist()
+
+    def q_values_batch(self, states: np.ndarray) -> np.ndarray:
+        """Q-values for a (n, state_dim) batch in one forward pass → (n, action_dim)."""
+        t = torch.from_numpy(np.ascontiguousarray(states, dtype=np.float32)).to(self.device)
+        with self.weights_lock, torch.no_grad():
+            return self._serving_net()(t).cpu().numpy()
+
+    def set_inference_backend(self, backend: str) -> None:
+        """Serve decisions through an optimized variant (see :mod:`packages.agent.inference`).
+
+        Meant for agents that are not trained in place: with ``torchscript``
+        or ``int8`` every :meth:`train_step` forces a rebuild.
+        """
+        try:
+            variant = (
+                None if backend == "eager" else optimize(self.online_net, backend, self.state_dim)
+            )
+        except Exception as exc:
+            logger.warning("Inference backend %r unavailable (%s); serving eager", backend, exc)
+            backend, variant = "eager", None
+        self.inference_backend, self._inference = backend, variant
+
+    def _serving_net(self) -> InferenceFn:
+        if self.inference_backend == "eager":
+            return self.online_net
+        net = self._inference
+        if net is None:  # invalidated by train_step
+            net = optimize(self.online_net, self.inference_backend, self.state_dim)
+            self._inference = net
+        return net
+
+    def _refresh_inference(self) -> None:
+        # variants holding a copy of the weights must be rebuilt after an
+        # update; callers hold weights_lock so no decision sees a stale variant
+        if self.inference_backend in SNAPSHOT_BACKENDS:
+            self._inference = optimize(self.online_net, self.inference_backend, self.state_dim)
 
     def confidence(self, q_vals: list[float]) -> float:
         """Softmax probability of the chosen action as confidence score."""
@@ -131,6 +227,8 @@ class DDQNAgent:
         loss.backward()
         nn.utils.clip_grad_norm_(self.online_net.parameters(), 1.0)
         self.optimizer.step()
+        if self.inference_backend in SNAPSHOT_BACKENDS:
+            self._inference = None
         self.step_count += 1
         if self.step_count % self.target_update_freq == 0:
             self.target_net.load_state_dict(self.online_net.state_dict())
@@ -139,20 +237,105 @@ class DDQNAgent:
         self.last_trained = datetime.now(timezone.utc)
         return loss.item()
 
+    # -- Training off the serving copy -----------------------------
+    def learner(self) -> DDQNAgent:
+        """A separate agent that trains on this agent's replay buffer.
+
+        It starts from this agent's weights, optimizer state and schedule.
+        Pushing its progress back is :meth:`copy_weights_from`.
+        """
+        clone = DDQNAgent(
+            state_dim=self.state_dim,
+            action_dim=self.action_dim,
+            lr=self.lr,
+            gamma=self.gamma,
+            epsilon_min=self.epsilon_min,
+            epsilon_decay=self.epsilon_decay,
+            batch_size=self.batch_size,
+            target_update_freq=self.target_update_freq,
+            buffer_capacity=1,
+        )
+        clone.load_state_dict(self.state_dict())
+        clone.replay = self.replay
+        return clone
+
+    def copy_weights_from(self, other: DDQNAgent) -> None:
+        """Adopt ``other``'s weights; inference never sees a half-copied network."""
+        online = {k: v.detach().clone() for k, v in other.online_net.state_dict().items()}
+        with self.weights_lock:
+            self.online_net.load_state_dict(online)
+            self._refresh_inference()
+        self.target_net.load_state_dict(other.target_net.state_dict())
+        self.epsilon = other.epsilon
+        self.step_count = other.step_count
+        self.last_trained = other.last_trained
+
+    # -- Hot swap ---------------------------------------------------
+    def build_network(self, ckpt: dict) -> DQNetwork:
+        """A ready-to-serve online network from a checkpoint, on this agent's device."""
+        net = DQNetwork(self.state_dim, self.action_dim).to(self.device)
+        net.load_state_dict(ckpt["online"])
+        net.eval()
+        return net
+
+    def install(self, online: DQNetwork, ckpt: dict) -> None:
+        """Serve ``online`` (built by :meth:`build_network`) from now on.
+
+        The switch is one reference assignment, made last.  Calls already
+        inside ``act``/``q_values`` finish on the previous network.
+        """
+        self.target_net.load_state_dict(ckpt.get("target", ckpt["online"]))
+        optimizer = optim.Adam(online.parameters(), lr=self.lr)
+        if "optimizer" in ckpt:
+            optimizer.load_state_dict(ckpt["optimizer"])
+        self.optimizer = optimizer
+        self.epsilon = ckpt.get("epsilon", self.epsilon_min)
+        self.step_count = ckpt.get("step_count", 0)
+        if self.inference_backend != "eager":
+            self._inference = optimize(online, self.inference_backend, self.state_dim)
+        self.online_net = online
+
     # -- Persistence ------------------------------------------------
-    def save(self, path: str) -> None:
-        torch.save({
+    def state_dict(self) -> dict:
+        return {
             "online": self.online_net.state_dict(),
             "target": self.target_net.state_dict(),
             "optimizer": self.optimizer.state_dict(),
-            "epsilon": self.epsilon,
-            "step_count": self.step_count,
-        }, path)
+            # plain Python scalars, so the file loads with ``weights_only=True``
+            "epsilon": float(self.epsilon),
+            "step_count": int(self.step_count),
+        }
 
-    def load(self, path: str) -> None:
-        ckpt = torch.load(path, map_location=self.device)
-        self.online_net.load_state_dict(ckpt["online"])
+    def load_state_dict(self, ckpt: dict) -> None:
+        with self.weights_lock:
+            self.online_net.load_state_dict(ckpt["online"])
+            self._refresh_inference()
         self.target_net.load_state_dict(ckpt["target"])
         self.optimizer.load_state_dict(ckpt["optimizer"])
         self.epsilon = ckpt.get("epsilon", self.epsilon_min)
         self.step_count = ckpt.get("step_count", 0)
+
+    def save(self, path: str, before_replace: Callable[[str], None] | None = None) -> None:
+        """Write the checkpoint atomically: readers see the old file or the new one.
+
+        ``before_replace`` gets the written temporary file just before it is
+        renamed onto ``path``.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".ddqn-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                torch.save(self.state_dict(), fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.chmod(tmp, 0o644)  # mkstemp creates 0600
+            if before_replace is not None:
+                before_replace(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+
+    def load(self, path: str) -> None:
+        self.load_state_dict(torch.load(path, map_location=self.device))
@@ -0,0 +1,179 @@
+"""
+Vectorised trading environment for DDQN training.
+
+``VectorTradingEnv`` steps ``num_envs`` independent episodes at once, each
+on a random symbol and start bar of historical OHLCV.  Market features for
+every bar are precomputed once with :func:`packages.backtest.market_features`,
+so a step is a handful of NumPy operations on length-``num_envs`` arrays.  No
+per-environment Python runs during a step.
+
+States use the :class:`FeatureEngine` layout, (num_envs, 14) float32.  The
+execution model matches the backtester: long/flat, all-in at the bar's close,
+BUY while long and SELL while flat are holds.  The reward for a step is the
+log growth of the portfolio over the next bar, net of ``cost_bps`` on each
+trade, times ``reward_scale``.  An episode's rewards therefore sum to the
+(scaled) log return the backtester would report for the same actions.
+Finished episodes are reset in place.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+
+from packages.agent.ddqn import DDQNAgent
+from packages.agent.feature_engine import FeatureEngine
+from packages.backtest.data import Bars
+from packages.backtest.features import WARMUP, market_features
+
+_BUY, _SELL = 1, 2
+
+
+class VectorTradingEnv:
+    def __init__(
+        self,
+        bars: Sequence[Bars],
+        num_envs: int = 256,
+        episode_length: int = 1_000,
+        cost_bps: float = 1.0,
+        reward_scale: float = 100.0,
+        seed: int | None = None,
+    ) -> None:
+        usable = [b for b in bars if len(b) > WARMUP + 1]
+        if not usable:
+            raise ValueError(f"Need at least one symbol with more than {WARMUP + 1} bars")
+
+        self.num_envs = num_envs
+        self.episode_length = episode_length
+        self.reward_scale = reward_scale
+        self._log_keep = np.log1p(-cost_bps / 10_000.0)  # log of (1 - cost)
+        self._rng = np.random.default_rng(seed)
+
+        # all symbols concatenated; episodes never cross a symbol's end
+        self._market = np.concatenate(
+            [market_features(b.close, b.high, b.low, b.volume) for b in usable]
+        )
+        self._close = np.concatenate([b.close for b in usable])
+        self._log_close = np.log(self._close)
+        ts = np.concatenate([b.ts for b in usable])
+        self._day = ts // 86_400
+        self._time_of_day = ((ts % 86_400) // 3_600 / 24.0).astype(np.float32)
+
+        lengths = np.array([len(b) for b in usable])
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        self._first = offsets + WARMUP  # earliest start bar per symbol
+        self._last = offsets + lengths - 1  # final bar per symbol
+        starts = self._last - self._first  # a start needs one bar after it
+        self._start_p = starts / starts.sum()
+        self._start_count = starts
+
+        n = num_envs
+        self._t = np.zeros(n, dtype=np.int64)
+        self._end = np.zeros(n, dtype=np.int64)
+        self._long = np.zeros(n, dtype=bool)
+        self._entry = np.ones(n, dtype=np.float64)
+        self._trade_day = np.full(n, -1, dtype=np.int64)
+        self._trades_today = np.zeros(n, dtype=np.int64)
+        self.states = np.zeros((n, FeatureEngine.STATE_DIM), dtype=np.float32)
+
+    # ── episodes ──────────────────────────────────────────────
+
+    def reset(self) -> np.ndarray:
+        """Start fresh episodes in every slot; returns the (num_envs, 14) states."""
+        self._reset(np.arange(self.num_envs))
+        return self.states
+
+    def _reset(self, idx: np.ndarray) -> None:
+        symbol = self._rng.choice(self._start_p.size, size=idx.size, p=self._start_p)
+        start = self._first[symbol] + self._rng.integers(0, self._start_count[symbol])
+        self._t[idx] = start
+        self._end[idx] = np.minimum(start + self.episode_length, self._last[symbol])
+        self._long[idx] = False
+        self._entry[idx] = 1.0
+        self._trade_day[idx] = -1
+        self._trades_today[idx] = 0
+        self.states[idx] = self._observe(idx)
+
+    def _observe(self, idx: np.ndarray | slice | None = None) -> np.ndarray:
+        if idx is None:
+            idx = slice(None)
+        t = self._t[idx]
+        long = self._long[idx]
+        out = np.empty((t.size, FeatureEngine.STATE_DIM), dtype=np.float32)
+        out[:, : FeatureEngine.MARKET_DIM] = self._market[t]
+        out[:, 9] = long
+        out[:, 10] = np.where(long, self._close[t] / self._entry[idx] - 1.0, 0.0)
+        out[:, 11] = ~long
+        same_day = self._day[t] == self._trade_day[idx]
+        out[:, 12] = np.where(same_day, self._trades_today[idx], 0) / 10.0
+        out[:, 13] = self._time_of_day[t]
+        np.clip(out, -10.0, 10.0, out=out)
+        return out
+
+    # ── stepping ──────────────────────────────────────────────
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Apply one action per env.
+
+        Returns ``(next_states, rewards, dones)`` for the transitions just
+        taken.  For finished episodes ``next_states`` is the terminal state;
+        ``self.states`` already holds the first state of their next episode.
+        """
+        actions = np.asarray(actions)
+        t = self._t
+        buy = (actions == _BUY) & ~self._long
+        sell = (actions == _SELL) & self._long
+        traded = buy | sell
+
+        day = self._day[t]
+        same_day = day == self._trade_day
+        self._trades_today = np.where(
+            traded, np.where(same_day, self._trades_today + 1, 1), self._trades_today
+        )
+        self._trade_day = np.where(traded, day, self._trade_day)
+        self._entry = np.where(buy, self._close[t], self._entry)
+        self._long ^= traded
+
+        nxt = t + 1
+        growth = np.where(self._long, self._log_close[nxt] - self._log_close[t], 0.0)
+        rewards = ((growth + traded * self._log_keep) * self.reward_scale).astype(np.float32)
+        self._t = nxt
+
+        next_states = self._observe()
+        dones = nxt >= self._end
+        self.states = next_states.copy()
+        if dones.any():
+            self._reset(np.flatnonzero(dones))
+        return next_states, rewards, dones
+
+
+def epsilon_greedy(
+    q_values: np.ndarray, epsilon: float, rng: np.random.Generator
+) -> np.ndarray:
+    """Greedy actions for a (n, actions) Q batch, each replaced by a random one with prob. ε."""
+    actions = q_values.argmax(axis=1)
+    if epsilon > 0:
+        explore = rng.random(actions.size) < epsilon
+        actions[explore] = rng.integers(0, q_values.shape[1], int(explore.sum()))
+    return actions
+
+
+def collect_experience(
+    env: VectorTradingEnv,
+    agent: DDQNAgent,
+    steps: int,
+    epsilon: float | None = None,
+) -> int:
+    """Roll the agent's ε-greedy policy for ``steps`` env steps into its replay buffer.
+
+    Returns the number of transitions pushed (``steps * env.num_envs``).
+    """
+    epsilon = agent.epsilon if epsilon is None else epsilon
+    rng = np.random.default_rng()
+    for _ in range(steps):
+        states = env.states
+        actions = epsilon_greedy(agent.q_values_batch(states), epsilon, rng)
+        next_states, rewards, dones = env.step(actions)
+        agent.replay.push_batch(states, actions, rewards, next_states, dones)
+    return steps * env.num_envs
@@ -29,6 +29,7 @@ class FeatureEngine:
     """
 
     STATE_DIM = 14
+    MARKET_DIM = 9  # [0-8] depend only on the quote stream
     WINDOW = 100  # candles kept in memory
 
     def __init__(self):
@@ -42,13 +43,26 @@ class FeatureEngine:
     # -- Feed incoming quote ----------------------------------------
     def update(self, quote: dict) -> None:
         """Call this every time a new quote arrives from the provider."""
-        c = float(quote.get("close", quote.get("price", 0)))
-        self._closes.append(c)
-        self._volumes.append(float(quote.get("volume", 1)))
-        self._highs.append(float(quote.get("high", c)))
-        self._lows.append(float(quote.get("low", c)))
-        self._52w_high = max(self._52w_high, c)
-        self._52w_low = min(self._52w_low, c)
+        c = float(quote.get("close") or quote.get("price", 0))
+        self.push(
+            c,
+            float(quote.get("volume", 1)),
+            float(quote.get("high") or c),
+            float(quote.get("low") or c),
+        )
+
+    def push(self, close: float, volume: float, high: float, low: float) -> None:
+        """Append one bar's values (the dict-free form of :meth:`update`)."""
+        self._closes.append(close)
+        self._volumes.append(volume)
+        self._highs.append(high)
+        self._lows.append(low)
+        self._52w_high = max(self._52w_high, close)
+        self._52w_low = min(self._52w_low, close)
+
+    @property
+    def last_price(self) -> float | None:
+        return self._closes[-1] if self._closes else None
 
     # -- Build state vector -----------------------------------------
     def get_state(self, portfolio: dict) -> np.ndarray | None:
@@ -61,6 +75,19 @@ class FeatureEngine:
           total_value        float
           trade_count_today  int
         """
+        market = self.market_features()
+        if market is None:
+            return None
+        return self.compose(market, portfolio)
+
+    @classmethod
+    def compose(cls, market: np.ndarray, portfolio: dict) -> np.ndarray:
+        """Join market features [0-8] with portfolio features [9-13]."""
+        state = np.concatenate([market, cls.portfolio_features(portfolio)])
+        return np.clip(state, -10.0, 10.0)
+
+    def market_features(self) -> np.ndarray | None:
+        """Indicator part of the state vector, (9,) float32, or None if warming up."""
         if len(self._closes) < 26:  # need at least 26 for MACD
             return None
 
@@ -105,7 +132,15 @@ class FeatureEngine:
         atr = self._atr(highs, lows, closes, 14)
         atr_norm = atr / price if price > 0 else 0.0
 
-        # [9-13] Portfolio features
+        return np.array([
+            p_norm, pc1, pc5, vol_ratio,
+            rsi, macd_hist, bb_pos, ema_cross,
+            atr_norm,
+        ], dtype=np.float32)
+
+    @staticmethod
+    def portfolio_features(portfolio: dict) -> np.ndarray:
+        """Portfolio part of the state vector [9-13], (5,) float32."""
         pos_flag = float(portfolio.get("position_flag", 0))
         pnl_pct = float(portfolio.get("unrealized_pnl_pct", 0.0))
         cash = float(portfolio.get("cash", 0.0))
@@ -115,15 +150,10 @@ class FeatureEngine:
         hour = datetime.now(timezone.utc).hour
         time_of_day = hour / 24.0
 
-        state = np.array([
-            p_norm, pc1, pc5, vol_ratio,
-            rsi, macd_hist, bb_pos, ema_cross,
-            atr_norm, pos_flag, pnl_pct,
-            cash_ratio, trade_today, time_of_day,
+        return np.array([
+            pos_flag, pnl_pct, cash_ratio, trade_today, time_of_day,
         ], dtype=np.float32)
 
-        return np.clip(state, -10.0, 10.0)
-
     # -- Indicator helpers ------------------------------------------
     @staticmethod
     def _ema(series: np.ndarray, period: int) -> float:
@@ -0,0 +1,99 @@
+"""
+Optimized inference variants of :class:`DQNetwork`.
+
+``AGENT_INFERENCE_BACKEND`` selects the module the serving agent runs
+decisions through:
+
+``eager``        the training network itself (default)
+``torchscript``  traced and frozen TorchScript; weights become constants
+``int8``         ``torch.ao`` dynamic quantization of every ``nn.Linear``
+                 (int8 weights, activations quantized per batch), CPU only
+``compile``      ``torch.compile``; compiles when built (and again for the
+                 first new batch shapes), needs a C++ toolchain
+
+``torchscript`` and ``int8`` copy the weights, so the agent rebuilds them
+after every weight update (see :data:`SNAPSHOT_BACKENDS`).  ``compile``
+shares the network's parameters and is built once per network.  When a
+backend is unavailable the agent logs a warning and serves ``eager``.
+
+``scripts/bench_inference.py`` reports latency and decision parity of each
+backend.
+
+:func:`configure_threads` sizes torch's intra-op and inter-op pools.  By
+default each torch pool uses every core.  With several gunicorn workers,
+the workers' pools then oversubscribe the cores, and a forward pass of this
+small MLP spends more time synchronising threads than computing.
+``scripts/bench_threads.py`` measures inference and ``train_step``
+throughput per thread count.  The deploy configs set the worker count only
+through ``WEB_CONCURRENCY``, which gunicorn reads as its ``--workers``
+default, so both see the same number.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import warnings
+from collections.abc import Callable
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "int8", "compile")
+
+# variants holding their own copy of the weights
+SNAPSHOT_BACKENDS = frozenset({"torchscript", "int8"})
+
+InferenceFn = Callable[[torch.Tensor], torch.Tensor]
+
+
+def optimize(net: nn.Module, backend: str, state_dim: int) -> InferenceFn:
+    """Build the ``backend`` variant of ``net`` for inference."""
+    if backend == "eager":
+        return net
+    device = next(net.parameters()).device
+    example = torch.zeros(1, state_dim, device=device)
+    with warnings.catch_warnings():
+        # torch flags TorchScript and torch.ao as deprecated in favour of torchao/export
+        warnings.simplefilter("ignore", FutureWarning)
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        with torch.no_grad():
+            if backend == "torchscript":
+                return torch.jit.freeze(torch.jit.trace(net, example).eval())
+            if backend == "int8":
+                if device.type != "cpu":
+                    raise ValueError("int8 dynamic quantization runs on CPU only")
+                return torch.ao.quantization.quantize_dynamic(net, {nn.Linear}, dtype=torch.qint8)
+            if backend == "compile":
+                if not hasattr(torch, "compile"):
+                    raise RuntimeError("torch.compile needs torch >= 2.0")
+                compiled = torch.compile(net)
+                compiled(example)  # compile now, not on the first decision
+                return compiled
+    raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+
+
+# ── thread pools ──────────────────────────────────────────────
+
+
+def configure_threads(num_threads: int = 0, interop_threads: int = 0) -> tuple[int, int]:
+    """Size torch's thread pools for this process; returns (intra-op, inter-op).
+
+    ``num_threads`` 0 splits the cores evenly between the ``WEB_CONCURRENCY``
+    workers.  ``interop_threads`` 0 keeps torch's default.  The inter-op pool
+    can only be sized before its first use, so a late call logs a warning and
+    leaves it unchanged.
+    """
+    if num_threads <= 0:
+        workers = max(int(os.environ.get("WEB_CONCURRENCY", "1") or 1), 1)
+        num_threads = max((os.cpu_count() or 1) // workers, 1)
+    torch.set_num_threads(num_threads)
+    if interop_threads > 0 and interop_threads != torch.get_num_interop_threads():
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as exc:
+            logger.warning("Could not set torch inter-op threads to %d: %s", interop_threads, exc)
+    return torch.get_num_threads(), torch.get_num_interop_threads()
@@ -0,0 +1,223 @@
+"""
+Background training jobs for the API process.
+
+``POST /api/v1/rl/train`` used to run forward, backward and optimizer steps
+inside the request handler, stalling every WebSocket stream in the worker.
+:class:`TrainingJobManager` queues each request as a job on a dedicated
+single-thread executor instead.  Jobs run one at a time in submission order.
+
+Jobs train a *learner* copy of the serving agent that shares its replay
+buffer.  Every ``sync_every`` steps, and when the job ends, the learner's
+weights are copied into the serving agent under its ``weights_lock``, so
+inference only ever sees whole networks.  The checkpoint is written from the
+worker thread, never from the event loop: after the first job, then once
+``checkpoint_every`` steps or ``checkpoint_interval`` seconds have gone by,
+and at shutdown, so a stream of one-step jobs does not save on every step.
+A job that finds less than one batch in the replay buffer fails.
+
+A hot-loaded model goes through :meth:`install_model`, which also drops the
+learner.  A job still running from the old lineage stops without publishing
+over the new weights.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from packages.agent.ddqn import DDQNAgent, DQNetwork
+from packages.shared.schemas import TrainingJobState, TrainingJobStatus
+
+logger = logging.getLogger(__name__)
+
+_TERMINAL = {TrainingJobState.COMPLETED, TrainingJobState.FAILED, TrainingJobState.CANCELLED}
+
+
+@dataclass
+class TrainingJob:
+    id: str
+    steps: int
+    state: TrainingJobState = TrainingJobState.QUEUED
+    completed_steps: int = 0
+    loss: float | None = None
+    epsilon: float | None = None
+    error: str | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.state in _TERMINAL
+
+    def status(self) -> TrainingJobStatus:
+        return TrainingJobStatus(
+            id=self.id,
+            state=self.state,
+            steps=self.steps,
+            completed_steps=self.completed_steps,
+            loss=self.loss,
+            epsilon=self.epsilon,
+            error=self.error,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+
+class TrainingJobManager:
+    def __init__(
+        self,
+        agent: DDQNAgent,
+        checkpoint: Path | None = None,
+        sync_every: int = 50,
+        history: int = 100,
+        on_checkpoint: Callable[[str], None] | None = None,
+        checkpoint_every: int = 1_000,
+        checkpoint_interval: float = 60.0,
+    ) -> None:
+        self._serving = agent
+        self._learner: DDQNAgent | None = None
+        self._generation = 0
+        self._publish_lock = threading.Lock()  # orders syncs against install_model
+        self.checkpoint = checkpoint
+        self._on_checkpoint = on_checkpoint
+        self._checkpoint_every = checkpoint_every
+        self._checkpoint_interval = checkpoint_interval
+        self._unsaved_steps = 0
+        self._saved_at = -math.inf
+        self._sync_every = sync_every
+        self._history = history
+        self._jobs: OrderedDict[str, TrainingJob] = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rl-train")
+
+    def submit(self, steps: int = 1) -> TrainingJob:
+        job = TrainingJob(id=uuid.uuid4().hex, steps=steps)
+        self._jobs[job.id] = job
+        self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> TrainingJob | None:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> TrainingJob | None:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            job.cancel_event.set()
+        return job
+
+    def install_model(self, online: DQNetwork, ckpt: dict) -> None:
+        """Serve a hot-loaded model; the next job trains from it."""
+        with self._publish_lock:
+            self._generation += 1
+            self._learner = None
+            self._unsaved_steps = 0
+            self._serving.install(online, ckpt)
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and wait for the running one to stop."""
+        for job in self._jobs.values():
+            job.cancel_event.set()
+        try:
+            final = self._executor.submit(self._save_checkpoint, True)
+        except RuntimeError:  # already shut down
+            return
+        self._executor.shutdown(wait=True)
+        if final.exception() is not None:
+            logger.error("Saving the final checkpoint failed: %s", final.exception())
+
+    async def events(self, job_id: str, interval: float = 0.5) -> AsyncIterator[TrainingJobStatus]:
+        """Yield the job's status whenever it changes, ending after a terminal state."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        last = None
+        while True:
+            current = job.status()
+            if current != last:
+                yield current
+                last = current
+            if job.done:
+                return
+            await asyncio.sleep(interval)
+
+    def _prune(self) -> None:
+        # forget the oldest finished jobs beyond the history limit
+        excess = len(self._jobs) - self._history
+        for job_id in [j.id for j in self._jobs.values() if j.done][: max(excess, 0)]:
+            del self._jobs[job_id]
+
+    # ── worker thread ─────────────────────────────────────────
+
+    def _run(self, job: TrainingJob) -> None:
+        if job.cancel_event.is_set():
+            job.state, job.finished_at = TrainingJobState.CANCELLED, datetime.now(timezone.utc)
+            return
+        job.state, job.started_at = TrainingJobState.RUNNING, datetime.now(timezone.utc)
+        try:
+            generation = self._generation
+            if self._learner is None:
+                self._learner = self._serving.learner()
+            learner = self._learner
+            for step in range(1, job.steps + 1):
+                if job.cancel_event.is_set():
+                    job.state = TrainingJobState.CANCELLED
+                    break
+                loss = learner.train_step()
+                if loss is None:
+                    job.state = TrainingJobState.FAILED
+                    job.error = (
+                        f"replay buffer holds {len(learner.replay)} transitions, "
+                        f"fewer than one batch of {learner.batch_size}"
+                    )
+                    break
+                job.completed_steps, job.loss, job.epsilon = step, loss, learner.epsilon
+                if step % self._sync_every == 0 and not self._publish(learner, generation):
+                    break
+            if job.completed_steps and not self._publish(learner, generation):
+                job.state, job.error = TrainingJobState.CANCELLED, "superseded by a new model"
+            elif job.completed_steps:
+                self._unsaved_steps += job.completed_steps
+                self._save_checkpoint()
+            if job.state is TrainingJobState.RUNNING:
+                job.state = TrainingJobState.COMPLETED
+        except Exception as exc:
+            logger.exception("Training job %s failed", job.id)
+            job.state, job.error = TrainingJobState.FAILED, str(exc)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+
+    def _save_checkpoint(self, force: bool = False) -> None:
+        """Write the learner's weights if enough steps or time went by (or ``force``)."""
+        if self.checkpoint is None or self._learner is None or not self._unsaved_steps:
+            return
+        due = (
+            self._unsaved_steps >= self._checkpoint_every
+            or time.monotonic() - self._saved_at >= self._checkpoint_interval
+        )
+        if not (force or due):
+            return
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        # on_checkpoint sees the written file before it replaces the checkpoint
+        self._learner.save(str(self.checkpoint), before_replace=self._on_checkpoint)
+        self._unsaved_steps, self._saved_at = 0, time.monotonic()
+
+    def _publish(self, learner: DDQNAgent, generation: int) -> bool:
+        """Copy the learner into the serving agent unless a new model replaced it."""
+        with self._publish_lock:
+            if generation != self._generation:
+                return False
+            self._serving.copy_weights_from(learner)
+            return True
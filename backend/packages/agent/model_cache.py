@@ -0,0 +1,177 @@
+"""
+In-process cache of named, versioned models from ``model_artifacts``.
+
+Decision endpoints can ask for a model by name (and optionally a version)
+instead of the live agent.  :class:`ModelCache` loads the artifact's
+checkpoint on first use, in a worker thread, and keeps the online network in
+an LRU ordered by last use.  When the parameters of all cached networks
+exceed ``max_bytes``, the least recently used ones are evicted.  The most
+recent model always stays, even if it alone is over budget.
+
+Resolving a name to its current version costs a database query, so results
+are remembered for ``resolve_ttl`` seconds.  Requests that pin a version
+already in the cache skip the lookup.  Cached networks are never trained,
+so inference on them needs no lock.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+
+from packages.agent.ddqn import DQNetwork
+from packages.shared.metrics import (
+    agent_model_cache_bytes,
+    agent_model_cache_request,
+    track_model_load,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotFound(LookupError):
+    pass
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # mark a failed load retrieved when every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+@dataclass(slots=True)
+class CachedModel:
+    name: str
+    version: str
+    network: DQNetwork
+    nbytes: int
+
+    def q_values(self, state: np.ndarray) -> list[float]:
+        return self.q_values_batch(state[None, :])[0].tolist()
+
+    def q_values_batch(self, states: np.ndarray) -> np.ndarray:
+        """(n, state_dim) → (n, action_dim) in one forward pass."""
+        t = torch.from_numpy(np.ascontiguousarray(states, dtype=np.float32))
+        with torch.no_grad():
+            return self.network(t.to(next(self.network.parameters()).device)).cpu().numpy()
+
+
+class ModelCache:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 2**20,
+        state_dim: int = 14,
+        action_dim: int = 3,
+        device: torch.device | None = None,
+        resolve_ttl: float = 30.0,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self._state_dim = state_dim
+        self._action_dim = action_dim
+        self._device = device or torch.device("cpu")
+        self._resolve_ttl = resolve_ttl
+        self._models: OrderedDict[tuple[str, str], CachedModel] = OrderedDict()
+        self._loading: dict[tuple[str, str], asyncio.Task[CachedModel]] = {}
+        self._resolved: dict[str, tuple[float, str, str]] = {}  # name → (expires, version, uri)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self._models
+
+    async def get(self, name: str, version: str | None = None) -> CachedModel:
+        """The model ``name`` at ``version`` (default: its current version).
+
+        Raises :class:`ModelNotFound` if the registry has no such model, or
+        the requested version is neither cached nor the current one.
+        """
+        if version is not None and (name, version) in self._models:
+            return self._hit((name, version))
+        current, uri = await self._resolve(name, refresh=version is not None)
+        if version is not None and version != current:
+            raise ModelNotFound(f"{name} version {version} is not available (current: {current})")
+        key = (name, current)
+        if key in self._models:
+            return self._hit(key)
+
+        pending = self._loading.get(key)
+        if pending is not None:  # another request is already loading it
+            self.hits += 1
+            agent_model_cache_request("hit")
+        else:
+            self.misses += 1
+            agent_model_cache_request("miss")
+            # a task of its own, so cancelling this request leaves other waiters alone
+            pending = asyncio.create_task(self._fetch(key, uri))
+            pending.add_done_callback(_retrieve_exception)
+            self._loading[key] = pending
+        return await asyncio.shield(pending)
+
+    def invalidate(self, name: str) -> None:
+        """Forget the cached version lookup for ``name``.
+
+        The model watcher calls it when ``name`` gets a new version, so the
+        next request resolves it instead of waiting out ``resolve_ttl``.
+        """
+        self._resolved.pop(name, None)
+
+    # ── internals ─────────────────────────────────────────────
+
+    def _hit(self, key: tuple[str, str]) -> CachedModel:
+        self._models.move_to_end(key)
+        self.hits += 1
+        agent_model_cache_request("hit")
+        return self._models[key]
+
+    def _insert(self, key: tuple[str, str], model: CachedModel) -> None:
+        self._models[key] = model
+        self.nbytes += model.nbytes
+        while self.nbytes > self.max_bytes and len(self._models) > 1:
+            (name, version), evicted = self._models.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            logger.info("Evicted model %s@%s from the cache", name, version)
+        agent_model_cache_bytes(self.nbytes)
+
+    async def _fetch(self, key: tuple[str, str], uri: str) -> CachedModel:
+        try:
+            with track_model_load():
+                model = await asyncio.to_thread(self._load, *key, uri)
+        finally:
+            del self._loading[key]
+        self._insert(key, model)
+        return model
+
+    async def _resolve(self, name: str, refresh: bool = False) -> tuple[str, str]:
+        entry = self._resolved.get(name)
+        if entry is not None and not refresh and entry[0] > time.monotonic():
+            return entry[1], entry[2]
+        from packages.db.engine import get_session_ctx
+        from packages.db.repositories import ModelArtifactRepository
+
+        async with get_session_ctx() as session:
+            artifact = await ModelArtifactRepository(session).get_by_name(name)
+        if artifact is None or not artifact.artifact_uri:
+            raise ModelNotFound(f"Unknown model {name!r}")
+        self._resolved[name] = (
+            time.monotonic() + self._resolve_ttl, artifact.version, artifact.artifact_uri
+        )
+        return artifact.version, artifact.artifact_uri
+
+    def _load(self, name: str, version: str, uri: str) -> CachedModel:
+        ckpt = torch.load(uri, map_location=self._device, weights_only=True)
+        net = DQNetwork(self._state_dim, self._action_dim).to(self._device)
+        net.load_state_dict(ckpt["online"])
+        net.eval()
+        nbytes = sum(p.numel() * p.element_size() for p in net.parameters())
+        logger.info("Loaded model %s@%s from %s (%d bytes)", name, version, uri, nbytes)
+        return CachedModel(name, version, net, nbytes)
@@ -0,0 +1,154 @@
+"""
+Hot reload of the serving agent's weights.
+
+:class:`ModelWatcher` polls for a new checkpoint every ``interval`` seconds.
+By default it watches the local checkpoint file's (mtime, size).  With
+``registry_name`` it watches that ``model_artifacts`` row's
+(version, artifact_uri) instead.  Publish a new model with
+:meth:`ModelArtifactRepository.publish` or ``trainer --register``.
+
+When something changed, a worker thread loads the checkpoint into a second
+:class:`DQNetwork` and warms it up with a few forward passes.  It then hands
+the network to :meth:`DDQNAgent.install` (or the ``install`` callable
+given).  That swaps the reference inference reads in one assignment.
+Decisions already in flight finish on the old network, and nothing on the
+event loop waits for ``torch.load``.
+
+Writers should replace checkpoint files atomically (write, then rename).  A
+file caught half-written fails to load and is retried only after it changes
+again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import torch
+
+from packages.agent.ddqn import DDQNAgent, DQNetwork
+from packages.shared.metrics import agent_model_swap
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_BATCHES = (1, 32)
+
+
+class ModelWatcher:
+    def __init__(
+        self,
+        agent: DDQNAgent,
+        path: str | Path,
+        interval: float = 30.0,
+        registry_name: str | None = None,
+        install: Callable[[DQNetwork, dict], None] | None = None,
+        on_publish: Callable[[str], None] | None = None,
+    ) -> None:
+        self._agent = agent
+        self.path = Path(path)
+        self.interval = interval
+        self.registry_name = registry_name or None
+        self._install = install or agent.install
+        self._on_publish = on_publish  # called with registry_name on a new version
+        self._task: asyncio.Task[None] | None = None
+        # file mode starts from what the service loaded at startup;
+        # registry mode loads the published model on the first check
+        self._signature: tuple | None = (
+            None if self.registry_name else _file_signature(self.path)
+        )
+        self._own: tuple[Path, tuple[int, int] | None] | None = None
+        self.version: str | None = None
+
+    async def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def acknowledge(self, written: str | Path) -> None:
+        """Accept the checkpoint about to be renamed onto ``path`` without reloading it.
+
+        Called by this process with the fully written temporary file, before
+        the rename, so a poll in between cannot mistake it for a new model.
+        The rename keeps the file's (mtime, size).  In registry mode this
+        also covers a version published with this file as its artifact.
+        """
+        self._own = (self.path.resolve(), _file_signature(Path(written)))
+
+    async def check(self) -> bool:
+        """Poll once; returns True if a new model was installed."""
+        if self.registry_name is None:
+            signature, path, version = _file_signature(self.path), self.path, None
+        else:
+            artifact = await self._lookup()
+            if artifact is None or not artifact.artifact_uri:
+                return False
+            signature = (artifact.version, artifact.artifact_uri)
+            path, version = Path(artifact.artifact_uri), artifact.version
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        if self.registry_name is not None and self._on_publish is not None:
+            self._on_publish(self.registry_name)
+        if self._wrote(path):
+            self.version = version
+            return False
+        try:
+            await asyncio.to_thread(self._load, path)
+        except Exception:
+            logger.exception("Failed to load model checkpoint %s", path)
+            agent_model_swap("failed")
+            return False
+        self.version = version
+        agent_model_swap("swapped")
+        logger.info("Serving model from %s%s", path, f" (version {version})" if version else "")
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Model watcher poll failed")
+            await asyncio.sleep(self.interval)
+
+    # ── helpers ───────────────────────────────────────────────
+
+    def _wrote(self, path: Path) -> bool:
+        """Whether ``path`` still holds the checkpoint this process wrote."""
+        if self._own is None or path.resolve() != self._own[0]:
+            return False
+        return _file_signature(path) == self._own[1]
+
+    async def _lookup(self):
+        from packages.db.engine import get_session_ctx
+        from packages.db.repositories import ModelArtifactRepository
+
+        async with get_session_ctx() as session:
+            return await ModelArtifactRepository(session).get_by_name(self.registry_name)
+
+    def _load(self, path: Path) -> None:
+        """Worker thread: build, warm up and install the new network."""
+        ckpt = torch.load(path, map_location=self._agent.device, weights_only=True)
+        online = self._agent.build_network(ckpt)
+        with torch.no_grad():
+            for n in _WARMUP_BATCHES:
+                online(torch.zeros(n, self._agent.state_dim, device=self._agent.device))
+        self._install(online, ckpt)
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
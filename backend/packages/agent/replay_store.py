@@ -0,0 +1,113 @@
+"""
+Replay buffer persisted in memory-mapped ``.npy`` files.
+
+:class:`MemmapReplayBuffer` keeps each transition array of
+:class:`ReplayBuffer` in its own ``.npy`` file under ``directory``, opened
+with :func:`numpy.lib.format.open_memmap`.  ``meta.npy`` holds the format
+version, capacity, state size and the ring cursor (``pos``, ``size``).  A
+restarted process opens the same files and continues with every
+transition it had, without re-collecting experience.  The arrays are
+paged in on demand, so a buffer larger than RAM works too.
+
+``push_batch`` writes the transitions before it advances the cursor, so
+after a crash ``size`` only counts fully written rows.  The exception is a
+full buffer: rows just past ``pos`` may mix an old and a new transition.
+Only one process may write a directory; a second one gets
+:class:`RuntimeError`.  Files of another capacity or state size raise
+:class:`ValueError`.  ``AgentService`` falls back to memory on either.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from packages.agent.ddqn import ReplayBuffer
+from packages.shared.locks import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+_VERSION = 1
+
+_META = np.dtype([
+    ("version", "<u4"),
+    ("capacity", "<i8"),
+    ("state_dim", "<i8"),
+    ("pos", "<i8"),
+    ("size", "<i8"),
+])
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    def __init__(self, directory: str | Path, capacity: int = 50_000, state_dim: int = 14) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._writer = LeaderLock(str(self.directory / ".lock"))
+        if not self._writer.try_acquire():
+            raise RuntimeError(f"Replay buffer {self.directory} is open in another process")
+        self.capacity = capacity
+        self._rng = np.random.default_rng()
+        self._lock = threading.Lock()
+        try:
+            self._meta = self._open(capacity, state_dim)
+        except BaseException:
+            self._writer.release()
+            raise
+
+    def _open(self, capacity: int, state_dim: int) -> np.memmap:
+        meta_path = self.directory / "meta.npy"
+        if meta_path.exists():
+            meta = open_memmap(meta_path, mode="r+")
+            found = (int(meta["version"]), int(meta["capacity"]), int(meta["state_dim"]))
+            if found != (_VERSION, capacity, state_dim):
+                raise ValueError(
+                    f"{self.directory} holds a version {found[0]} buffer of {found[1]} x "
+                    f"{found[2]} transitions, not {capacity} x {state_dim}"
+                )
+            for name, _, _ in self.layout(capacity, state_dim):
+                setattr(self, name, open_memmap(self.directory / f"{name}.npy", mode="r+"))
+            logger.info(
+                "Reattached replay buffer %s (%d transitions)", self.directory, int(meta["size"])
+            )
+            return meta
+
+        for name, dtype, shape in self.layout(capacity, state_dim):
+            path = self.directory / f"{name}.npy"
+            setattr(self, name, open_memmap(path, mode="w+", dtype=dtype, shape=shape))
+        # meta.npy last: its presence marks a complete set of files
+        meta = open_memmap(meta_path, mode="w+", dtype=_META, shape=())
+        meta["version"], meta["capacity"], meta["state_dim"] = _VERSION, capacity, state_dim
+        meta.flush()
+        return meta
+
+    # ReplayBuffer keeps its cursor in these two attributes
+    @property
+    def _pos(self) -> int:
+        return int(self._meta["pos"])
+
+    @_pos.setter
+    def _pos(self, value: int) -> None:
+        self._meta["pos"] = value
+
+    @property
+    def _size(self) -> int:
+        return int(self._meta["size"])
+
+    @_size.setter
+    def _size(self, value: int) -> None:
+        self._meta["size"] = value
+
+    def flush(self) -> None:
+        """Write dirty pages to disk (they survive a process crash regardless)."""
+        with self._lock:
+            for name, _, _ in self.layout(self.capacity, self.states.shape[1]):
+                getattr(self, name).flush()
+            self._meta.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.release()
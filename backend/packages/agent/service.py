@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 
 from packages.agent.ddqn import DDQNAgent
 from packages.agent.feature_engine import FeatureEngine
+from packages.agent.inference import configure_threads
+from packages.agent.jobs import TrainingJob, TrainingJobManager
+from packages.agent.model_cache import ModelCache
 from packages.data.provider import DataProvider
 from packages.shared.metrics import track_inference_latency
 from packages.shared.schemas import (
@@ -16,9 +22,18 @@ from packages.shared.schemas import (
     OrderSide,
 )
 
+if TYPE_CHECKING:
+    from packages.agent.registry import ModelWatcher
+    from packages.agent.replay_store import MemmapReplayBuffer
+    from packages.agent.shadow import ShadowEvaluator
+    from packages.agent.snapshot import AgentSnapshot
+
+logger = logging.getLogger(__name__)
+
 _MODEL_PATH = Path("models/ddqn_weights.pt")
 _STATE_DIM = 14
 _ACTION_DIM = 3  # 0=HOLD 1=BUY 2=SELL
+_SIDES = {0: OrderSide.HOLD, 1: OrderSide.BUY, 2: OrderSide.SELL}
 
 
 class AgentService:
@@ -26,7 +41,14 @@ class AgentService:
         self,
         provider: DataProvider,
         model_version: str = "ddqn-v1",
+        model_cache_bytes: int = 64 * 2**20,
+        inference_backend: str = "eager",
+        num_threads: int = 0,
+        interop_threads: int = 0,
+        replay_dir: str | Path | None = None,
+        replay_capacity: int = 50_000,
     ) -> None:
+        configure_threads(num_threads, interop_threads)
         self._provider = provider
         self._model_version = model_version
         self._state = AgentState.IDLE
@@ -34,13 +56,18 @@ class AgentService:
         self._agent = DDQNAgent(
             state_dim=_STATE_DIM,
             action_dim=_ACTION_DIM,
+            buffer_capacity=replay_capacity,
         )
+        self._replay_store: MemmapReplayBuffer | None = None
+        if replay_dir:
+            self._open_replay_store(replay_dir, replay_capacity)
         self._features = FeatureEngine()
 
         # Load saved weights if they exist
         if _MODEL_PATH.exists():
             self._agent.load(str(_MODEL_PATH))
             self._state = AgentState.IDLE
+        self._agent.set_inference_backend(inference_backend)
 
         self._last_action = AgentAction(
             symbol="AAPL",
@@ -48,10 +75,103 @@ class AgentService:
             confidence=0.0,
             generated_at=datetime.now(timezone.utc),
         )
+        self._snapshot: AgentSnapshot | None = None
+        self._watcher: ModelWatcher | None = None
+        self._shadow: ShadowEvaluator | None = None
+        # named registry models, loaded on first request
+        self.models = ModelCache(
+            model_cache_bytes, _STATE_DIM, _ACTION_DIM, device=self._agent.device
+        )
+        self.jobs = TrainingJobManager(
+            self._agent, checkpoint=_MODEL_PATH, on_checkpoint=self._checkpoint_saved
+        )
+
+    # -- Persistent replay buffer -----------------------------------
+    def _open_replay_store(self, directory: str | Path, capacity: int) -> None:
+        """Keep experience in memory-mapped files that survive restarts."""
+        from packages.agent.replay_store import MemmapReplayBuffer
+
+        try:
+            self._replay_store = MemmapReplayBuffer(directory, capacity, _STATE_DIM)
+        except RuntimeError as exc:  # another worker owns the files
+            logger.warning("%s; keeping this worker's experience in memory", exc)
+            return
+        except ValueError as exc:  # written with another capacity or state size
+            logger.warning(
+                "%s; keeping experience in memory (move the directory aside to start afresh)",
+                exc,
+            )
+            return
+        self._agent.replay = self._replay_store
+
+    # -- Shared snapshot mode ---------------------------------------
+    def enable_snapshot(self, name: str, capacity: int = 4_096) -> None:
+        """Read features/decisions from the cross-worker shared-memory table."""
+        from packages.agent.snapshot import AgentSnapshot
+
+        self._snapshot = AgentSnapshot(self._provider, self._agent, name=name, capacity=capacity)
+
+    # -- Hot model reload -------------------------------------------
+    def enable_model_watch(self, interval: float = 30.0, registry_name: str | None = None) -> None:
+        """Swap in new checkpoints (file or ``model_artifacts`` row) without restarting."""
+        from packages.agent.registry import ModelWatcher
+
+        self._watcher = ModelWatcher(
+            self._agent,
+            _MODEL_PATH,
+            interval=interval,
+            registry_name=registry_name,
+            install=self.jobs.install_model,
+            on_publish=self.models.invalidate,
+        )
+
+    # -- Shadow evaluation ------------------------------------------
+    def enable_shadow(
+        self,
+        models: list[str],
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ) -> None:
+        """Score every live decision with these registry models, off the request path."""
+        from packages.agent.shadow import ShadowEvaluator
+
+        self._shadow = ShadowEvaluator(
+            self.models,
+            models,
+            live_model=self._model_version,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+
+    def _checkpoint_saved(self, written: str) -> None:
+        # our own training job is about to replace the file; nothing to reload
+        if self._watcher is not None:
+            self._watcher.acknowledge(written)
+
+    async def start(self) -> None:
+        if self._snapshot is not None:
+            await self._snapshot.start()
+        if self._watcher is not None:
+            await self._watcher.start()
+        if self._shadow is not None:
+            await self._shadow.start()
+
+    async def stop(self) -> None:
+        if self._shadow is not None:
+            await self._shadow.stop()
+        if self._watcher is not None:
+            await self._watcher.stop()
+        if self._snapshot is not None:
+            await self._snapshot.stop()
+        await asyncio.to_thread(self.jobs.shutdown)
+        if self._replay_store is not None:
+            await asyncio.to_thread(self._replay_store.close)
 
     # -- Feed quote into feature engine -----------------------------
     def on_quote(self, quote: dict) -> None:
         """Call this from the WebSocket quote handler on every tick."""
+        if self._snapshot is not None:
+            return  # the snapshot writer already saw this tick
         self._features.update(quote)
 
     # -- Request a trading decision ---------------------------------
@@ -60,6 +180,9 @@ class AgentService:
         symbol: str,
         portfolio: dict,
     ) -> AgentAction:
+        if self._snapshot is not None:
+            return self._action_from_snapshot(symbol, portfolio)
+
         with track_inference_latency():
             state = self._features.get_state(portfolio)
 
@@ -75,18 +198,87 @@ class AgentService:
             action_idx = self._agent.act(state, training=False)
             q_vals = self._agent.q_values(state)
             conf = self._agent.confidence(q_vals)
+            if self._shadow is not None:
+                self._shadow.submit(
+                    symbol, self._features.last_price or 0.0, state, action_idx, q_vals
+                )
+
+            self._last_action = AgentAction(
+                symbol=symbol,
+                side=_SIDES[action_idx],
+                confidence=conf,
+                generated_at=datetime.now(timezone.utc),
+            )
+            self._state = AgentState.IDLE
+            return self._last_action
+
+    async def get_model_action(
+        self,
+        symbol: str,
+        portfolio: dict,
+        model: str,
+        version: str | None = None,
+    ) -> AgentAction:
+        """Decide with a named ``model_artifacts`` model instead of the live agent.
+
+        Raises :class:`ModelNotFound` for unknown models or versions.
+        """
+        cached = await self.models.get(model, version)
+        with track_inference_latency():
+            if self._snapshot is not None:
+                entry = self._snapshot.read(symbol)
+                state = None if entry is None else FeatureEngine.compose(entry.market, portfolio)
+            else:
+                state = self._features.get_state(portfolio)
+            if state is None:
+                return AgentAction(
+                    symbol=symbol,
+                    side=OrderSide.HOLD,
+                    confidence=0.0,
+                    generated_at=datetime.now(timezone.utc),
+                    model=f"{cached.name}@{cached.version}",
+                )
+            q_vals = cached.q_values(state)
+            return AgentAction(
+                symbol=symbol,
+                side=_SIDES[int(np.argmax(q_vals))],
+                confidence=self._agent.confidence(q_vals),
+                generated_at=datetime.now(timezone.utc),
+                model=f"{cached.name}@{cached.version}",
+            )
+
+    def _action_from_snapshot(self, symbol: str, portfolio: dict) -> AgentAction:
+        assert self._snapshot is not None
+        with track_inference_latency():
+            entry = self._snapshot.read(symbol)
+            if entry is None:
+                return AgentAction(
+                    symbol=symbol,
+                    side=OrderSide.HOLD,
+                    confidence=0.0,
+                    generated_at=datetime.now(timezone.utc),
+                )
+            state = FeatureEngine.compose(entry.market, portfolio)
+            if np.array_equal(state, entry.state):
+                action_idx, conf = entry.action, entry.confidence
+                q_vals = entry.q_values.tolist()
+            else:
+                # different portfolio: reuse the shared indicators, re-run the net
+                q_vals = self._agent.q_values(state)
+                action_idx, conf = int(np.argmax(q_vals)), self._agent.confidence(q_vals)
+            if self._shadow is not None:
+                self._shadow.submit(symbol, entry.price, state, action_idx, q_vals)
 
-            side_map = {0: OrderSide.HOLD, 1: OrderSide.BUY, 2: OrderSide.SELL}
             self._last_action = AgentAction(
                 symbol=symbol,
-                side=side_map[action_idx],
+                side=_SIDES[action_idx],
                 confidence=conf,
                 generated_at=datetime.now(timezone.utc),
             )
             self._state = AgentState.IDLE
             return self._last_action
 
-    # -- Training step (one batch from replay buffer) ---------------
+    # -- Training (queued on the job manager's worker thread) -------
     def train_step(
         self,
         state: np.ndarray,
@@ -94,13 +286,10 @@ class AgentService:
         reward: float,
         next_state: np.ndarray,
         done: bool,
-    ) -> float | None:
+    ) -> TrainingJob:
+        """Store one transition and queue a single gradient step."""
         self._agent.remember(state, action, reward, next_state, done)
-        loss = self._agent.train_step()
-        if loss is not None:
-            _MODEL_PATH.parent.mkdir(exist_ok=True)
-            self._agent.save(str(_MODEL_PATH))
-        return loss
+        return self.jobs.submit(steps=1)
 
     # -- Status (used by existing GET /agent/status route) ----------
     def get_status(self) -> AgentStatus:
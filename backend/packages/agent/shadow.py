@@ -0,0 +1,218 @@
+"""
+Shadow evaluation of challenger models against live traffic.
+
+Every decision the live agent makes is handed to :class:`ShadowEvaluator`
+with its state vector, Q-values and the symbol's price.  ``submit`` only
+appends to a bounded deque, so the request path pays nothing for it.  Every
+``flush_interval`` seconds a background task drains the deque in batches of
+``batch_size``.  Each challenger scores a whole batch in one forward pass on
+a dedicated executor thread.  The challengers' decisions are written next
+to the live ones with a single bulk insert per batch.
+
+Challengers are ``model_artifacts`` names, loaded through the agent's
+:class:`ModelCache`.  :func:`stored_reports` replays the logged decisions
+into an agreement rate and the return of following each side's decisions.
+When the deque is full, the oldest observations are dropped and counted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from packages.agent.model_cache import ModelCache
+from packages.shared.metrics import agent_shadow_decisions, agent_shadow_dropped
+from packages.shared.schemas import ShadowReport
+
+if TYPE_CHECKING:
+    from packages.db.repositories import ShadowDecisionRepository
+
+logger = logging.getLogger(__name__)
+
+_SIDES = ("HOLD", "BUY", "SELL")
+
+
+@dataclass(frozen=True, slots=True)
+class _Observation:
+    timestamp: datetime
+    symbol: str
+    price: float
+    state: np.ndarray
+    action: int
+    q_values: list[float]
+
+
+class ShadowEvaluator:
+    def __init__(
+        self,
+        cache: ModelCache,
+        challengers: Sequence[str],
+        live_model: str,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        self._cache = cache
+        self.challengers = list(challengers)
+        self.live_model = live_model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: deque[_Observation] = deque(maxlen=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._task: asyncio.Task[None] | None = None
+
+    def submit(
+        self,
+        symbol: str,
+        price: float,
+        state: np.ndarray,
+        action: int,
+        q_values: list[float],
+    ) -> None:
+        """Queue one live decision for the challengers; never blocks."""
+        if len(self._pending) == self._pending.maxlen:
+            agent_shadow_dropped()
+        self._pending.append(
+            _Observation(datetime.now(timezone.utc), symbol, price, state, action, q_values)
+        )
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    async def flush(self) -> int:
+        """Score and store everything queued so far; returns the rows written."""
+        written = 0
+        while self._pending:
+            size = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(size)]
+            rows = await self._score(batch)
+            if rows:
+                try:
+                    await self._write(rows)
+                except Exception:
+                    logger.exception("Failed to store %d shadow decisions", len(rows))
+                    continue
+                written += len(rows)
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _score(self, batch: list[_Observation]) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        states = np.stack([o.state for o in batch])
+        live_actions = np.array([o.action for o in batch])
+        rows: list[dict] = []
+        for name in self.challengers:
+            try:
+                model = await self._cache.get(name)
+                q = await loop.run_in_executor(self._executor, model.q_values_batch, states)
+            except Exception:
+                logger.exception("Shadow model %s failed to score a batch", name)
+                continue
+            actions = q.argmax(axis=1)
+            label = f"{model.name}@{model.version}"
+            agent_shadow_decisions(label, int((actions == live_actions).sum()), len(batch))
+            rows.extend(
+                {
+                    "model": label,
+                    "live_model": self.live_model,
+                    "symbol": o.symbol,
+                    "price": o.price,
+                    "side": _SIDES[a],
+                    "live_side": _SIDES[o.action],
+                    "q_values": qs,
+                    "live_q_values": o.q_values,
+                    "timestamp": o.timestamp,
+                }
+                for o, a, qs in zip(batch, actions.tolist(), q.tolist())
+            )
+        return rows
+
+    async def _write(self, rows: list[dict]) -> None:
+        from packages.db.engine import get_session_ctx
+        from packages.db.repositories import ShadowDecisionRepository
+
+        async with get_session_ctx() as session:
+            await ShadowDecisionRepository(session).log_batch(rows)
+
+
+# ── comparison ────────────────────────────────────────────────
+
+
+async def stored_reports(
+    repo: ShadowDecisionRepository,
+    model: str | None = None,
+    since: datetime | None = None,
+) -> list[ShadowReport]:
+    """Agreement and simulated return per challenger, from ``shadow_decisions``.
+
+    Agreement is counted by the database.  Each side is replayed long/flat
+    per symbol (BUY enters, SELL exits, no costs) from a stream of the
+    challenger's decisions, oldest first, so no rows are held in memory.
+    The return is the compounded price change while long, over all symbols.
+    """
+    reports = []
+    for name, live_model, decisions, agreed in await repo.agreement(model, since):
+        shadow, live = _LongFlat(), _LongFlat()
+        async for symbol, price, side, live_side in repo.stream_sides(name, since):
+            shadow.step(symbol, price, side)
+            live.step(symbol, price, live_side)
+        reports.append(
+            ShadowReport(
+                model=name,
+                live_model=live_model,
+                decisions=decisions,
+                agreement_rate=agreed / decisions,
+                shadow_return=shadow.total_return,
+                live_return=live.total_return,
+            )
+        )
+    return reports
+
+
+class _LongFlat:
+    """One side's decisions replayed long/flat per symbol, fed oldest first."""
+
+    __slots__ = ("_log_growth", "_last", "_long")
+
+    def __init__(self) -> None:
+        self._log_growth = 0.0
+        self._last: dict[str, float] = {}
+        self._long: set[str] = set()
+
+    def step(self, symbol: str, price: float, side: str) -> None:
+        prev = self._last.get(symbol)
+        if symbol in self._long and prev and price > 0:
+            self._log_growth += math.log(price / prev)
+        self._last[symbol] = price
+        if side == "BUY":
+            self._long.add(symbol)
+        elif side == "SELL":
+            self._long.discard(symbol)
+
+    @property
+    def total_return(self) -> float:
+        return math.expm1(self._log_growth)
@@ -0,0 +1,394 @@
+"""
+Shared-memory snapshot of per-symbol agent state across worker processes.
+
+In snapshot mode one worker (the holder of an exclusive ``flock``) listens to
+every tick its provider publishes, keeps one :class:`FeatureEngine` per
+symbol, runs a single batched forward pass per tick batch and writes the
+resulting state vector, Q-values and decision into a
+``multiprocessing.shared_memory`` table indexed by symbol slot.  The
+listener only queues the ticks; a writer task folds them in on a dedicated
+executor thread, so feature and inference work never runs on the event loop.  All other
+workers only read that table, so indicator and inference work per tick is
+independent of the number of HTTP/WebSocket workers.
+
+Each slot is guarded by a seqlock: the single writer bumps the slot's
+sequence number to odd, writes the fields, then bumps it to even; readers
+retry until they see the same even number before and after copying.  The
+stored decision assumes a flat portfolio (no position, all cash, no trades
+today); readers asking about another portfolio reuse the stored market
+features and run only the forward pass.
+
+Table layout: a 64-byte header (magic, capacity, symbol count, writer pid,
+random token) followed by ``capacity`` fixed-size slots.  Symbols are
+appended by the writer and never move, so readers cache name → slot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import secrets
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from packages.agent.ddqn import DDQNAgent
+from packages.agent.feature_engine import FeatureEngine
+from packages.data.provider import BaseAsyncProvider
+from packages.shared.locks import LeaderLock
+from packages.shared.schemas import Tick
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = 0x534E4150  # "SNAP"
+_HEADER_BYTES = 64
+_SYMBOL_BYTES = 16
+_READ_RETRIES = 100
+
+_HEADER = np.dtype([
+    ("magic", "<u4"),
+    ("capacity", "<u4"),
+    ("count", "<u4"),
+    ("writer_pid", "<u4"),
+    ("token", "<u8"),
+])
+
+_SLOT = np.dtype([
+    ("seq", "<u8"),
+    ("symbol", f"S{_SYMBOL_BYTES}"),
+    ("state", "<f4", (FeatureEngine.STATE_DIM,)),
+    ("q", "<f4", (3,)),
+    ("action", "<i4"),
+    ("confidence", "<f4"),
+    ("price", "<f8"),
+    ("updated", "<f8"),
+], align=True)
+
+# Portfolio the stored decisions are computed for.
+FLAT_PORTFOLIO = {
+    "position_flag": 0,
+    "unrealized_pnl_pct": 0.0,
+    "cash": 1.0,
+    "total_value": 1.0,
+    "trade_count_today": 0,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotEntry:
+    symbol: str
+    state: np.ndarray  # (14,) float32 for FLAT_PORTFOLIO
+    q_values: np.ndarray  # (3,) float32
+    action: int
+    confidence: float
+    price: float
+    updated_at: float  # epoch seconds
+
+    @property
+    def market(self) -> np.ndarray:
+        return self.state[: FeatureEngine.MARKET_DIM]
+
+
+class SnapshotTable:
+    """Seqlock-protected slot table in a named shared-memory segment."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        capacity = int(self._header["capacity"])
+        slots = np.ndarray((capacity,), dtype=_SLOT, buffer=shm.buf, offset=_HEADER_BYTES)
+        # per-field views avoid materialising records on every access
+        self._seq = slots["seq"]
+        self._symbol = slots["symbol"]
+        self._state = slots["state"]
+        self._q = slots["q"]
+        self._action = slots["action"]
+        self._confidence = slots["confidence"]
+        self._price = slots["price"]
+        self._updated = slots["updated"]
+        self._index: dict[str, int] = {}
+        self._full_warned = False
+
+    @classmethod
+    def create(cls, name: str, capacity: int = 4_096) -> SnapshotTable:
+        with contextlib.suppress(FileNotFoundError):
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        size = _HEADER_BYTES + capacity * _SLOT.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        header["capacity"] = capacity
+        header["count"] = 0
+        header["writer_pid"] = os.getpid()
+        header["token"] = secrets.randbits(63)
+        header["magic"] = _MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SnapshotTable:
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the writer's segment when they exit.
+        with contextlib.suppress(Exception):
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        if np.ndarray((), dtype=_HEADER, buffer=shm.buf)["magic"] != _MAGIC:
+            shm.close()
+            raise ValueError(f"Shared memory segment {name!r} is not an agent snapshot")
+        return cls(shm, owner=False)
+
+    @property
+    def token(self) -> int:
+        return int(self._header["token"])
+
+    @property
+    def symbols(self) -> list[str]:
+        count = int(self._header["count"])
+        return [self._symbol[i].decode() for i in range(count)]
+
+    def close(self) -> None:
+        # numpy views pin the buffer; drop them before closing the mapping
+        for attr in ("_header", "_seq", "_symbol", "_state", "_q",
+                     "_action", "_confidence", "_price", "_updated"):
+            setattr(self, attr, None)
+        self._shm.close()
+        if self._owner:
+            with contextlib.suppress(FileNotFoundError):
+                self._shm.unlink()
+
+    # ── slots ─────────────────────────────────────────────────
+
+    def _lookup(self, symbol: str) -> int | None:
+        slot = self._index.get(symbol)
+        if slot is None:
+            count = int(self._header["count"])
+            for i in range(len(self._index), count):
+                self._index[self._symbol[i].decode()] = i
+            slot = self._index.get(symbol)
+        return slot
+
+    def _allocate(self, symbol: str) -> int | None:
+        count = int(self._header["count"])
+        if count >= self._seq.shape[0]:
+            if not self._full_warned:
+                logger.warning("Agent snapshot full (%d symbols); %s not published", count, symbol)
+                self._full_warned = True
+            return None
+        self._symbol[count] = symbol.encode()[:_SYMBOL_BYTES]
+        self._seq[count] = 0
+        # publish the name before the slot becomes visible through count
+        self._header["count"] = count + 1
+        self._index[symbol] = count
+        return count
+
+    # ── writer ────────────────────────────────────────────────
+
+    def publish(
+        self,
+        symbol: str,
+        state: np.ndarray,
+        q_values: np.ndarray,
+        action: int,
+        confidence: float,
+        price: float,
+    ) -> None:
+        slot = self._lookup(symbol)
+        if slot is None:
+            slot = self._allocate(symbol)
+            if slot is None:
+                return
+        self._seq[slot] += 1  # odd: write in progress
+        self._state[slot] = state
+        self._q[slot] = q_values
+        self._action[slot] = action
+        self._confidence[slot] = confidence
+        self._price[slot] = price
+        self._updated[slot] = time.time()
+        self._seq[slot] += 1  # even: consistent
+
+    # ── reader ────────────────────────────────────────────────
+
+    def read(self, symbol: str) -> SnapshotEntry | None:
+        slot = self._lookup(symbol)
+        if slot is None:
+            return None
+        for attempt in range(_READ_RETRIES):
+            before = int(self._seq[slot])
+            if before == 0:
+                return None  # allocated but never written
+            if before % 2 == 0:
+                entry = SnapshotEntry(
+                    symbol=symbol,
+                    state=self._state[slot].copy(),
+                    q_values=self._q[slot].copy(),
+                    action=int(self._action[slot]),
+                    confidence=float(self._confidence[slot]),
+                    price=float(self._price[slot]),
+                    updated_at=float(self._updated[slot]),
+                )
+                if int(self._seq[slot]) == before:
+                    return entry
+            if attempt > 10:
+                time.sleep(0)  # let a descheduled writer finish
+        logger.debug("Snapshot read for %s kept racing the writer", symbol)
+        return None
+
+
+class AgentSnapshot:
+    """Per-worker coordinator: becomes the writer if it can, otherwise reads.
+
+    Every ``check_interval`` seconds a reader retries the writer lock (so a
+    reader takes over if the writer process dies) and re-attaches if the
+    segment was recreated.
+    """
+
+    def __init__(
+        self,
+        provider: BaseAsyncProvider,
+        agent: DDQNAgent,
+        name: str = "stocktrade-agent",
+        capacity: int = 4_096,
+        check_interval: float = 1.0,
+        max_pending: int = 100_000,
+    ) -> None:
+        self._provider = provider
+        self._agent = agent
+        self._name = name
+        self._capacity = capacity
+        self._check_interval = check_interval
+        self._lock = LeaderLock(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+        self._table: SnapshotTable | None = None
+        self._engines: dict[str, FeatureEngine] = {}
+        # oldest ticks are dropped if the writer thread falls this far behind
+        self._pending: deque[Tick] = deque(maxlen=max_pending)
+        self._wake = asyncio.Event()
+        self._executor: ThreadPoolExecutor | None = None
+        self._writer_task: asyncio.Task[None] | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.role = "stopped"
+
+    async def start(self) -> None:
+        self._refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.role == "writer":
+            self._provider.remove_listener(self._on_ticks)
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._writer_task
+            self._writer_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pending.clear()
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+        self._lock.release()
+        self.role = "stopped"
+
+    def read(self, symbol: str) -> SnapshotEntry | None:
+        if self._table is None:
+            return None
+        return self._table.read(symbol.upper())
+
+    # ── role management ───────────────────────────────────────
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._check_interval)
+            self._refresh()
+
+    def _refresh(self) -> None:
+        if self.role == "writer":
+            return
+        if self._lock.try_acquire():
+            self._swap(SnapshotTable.create(self._name, self._capacity))
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+            self._writer_task = asyncio.create_task(self._write_loop())
+            self._provider.add_listener(self._on_ticks)
+            self.role = "writer"
+            logger.info("Agent snapshot writer (pid %d): %s", os.getpid(), self._name)
+            return
+        try:
+            table = SnapshotTable.attach(self._name)
+        except (FileNotFoundError, ValueError):
+            return  # writer hasn't created the segment yet
+        if self._table is not None and table.token == self._table.token:
+            table.close()
+            return
+        self._swap(table)
+        self.role = "reader"
+
+    def _swap(self, table: SnapshotTable) -> None:
+        if self._table is not None:
+            self._table.close()
+        self._table = table
+
+    # ── writer path ───────────────────────────────────────────
+
+    def _on_ticks(self, ticks: list[Tick]) -> None:
+        """Provider listener: queue the batch for the writer thread."""
+        self._pending.extend(ticks)
+        self._wake.set()
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Fold every queued tick into the table."""
+        loop = asyncio.get_running_loop()
+        while self._pending and self._executor is not None:
+            self._wake.clear()
+            ticks = list(self._pending)
+            self._pending.clear()
+            # one thread, in submission order: the seqlock needs a single writer
+            await loop.run_in_executor(self._executor, self._process, ticks)
+
+    def _process(self, ticks: list[Tick]) -> None:
+        touched: dict[str, float] = {}
+        for tick in ticks:
+            engine = self._engines.get(tick.symbol)
+            if engine is None:
+                engine = self._engines[tick.symbol] = FeatureEngine()
+            close = tick.close or tick.price
+            engine.push(close, float(tick.volume), tick.high or close, tick.low or close)
+            touched[tick.symbol] = close
+
+        symbols, states = [], []
+        for symbol in touched:
+            market = self._engines[symbol].market_features()
+            if market is not None:
+                symbols.append(symbol)
+                states.append(FeatureEngine.compose(market, FLAT_PORTFOLIO))
+        if not symbols or self._table is None:
+            return
+
+        batch = np.stack(states)
+        q = self._agent.q_values_batch(batch)
+        actions = q.argmax(axis=1)
+        exp = np.exp(q - q.max(axis=1, keepdims=True))
+        confidence = exp.max(axis=1) / exp.sum(axis=1)
+        for i, symbol in enumerate(symbols):
+            self._table.publish(
+                symbol, batch[i], q[i], int(actions[i]), float(confidence[i]), touched[symbol]
+            )
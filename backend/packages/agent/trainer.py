@@ -0,0 +1,362 @@
+"""
+Offline DDQN training over historical OHLCV, tracked in ``training_runs``.
+
+Runs as its own process, so training never shares an event loop (or a GIL)
+with the API's live inference::
+
+    python -m packages.agent.trainer AAPL MSFT --episodes 200 --model-name ddqn-v2 \\
+        --start 2023-01-01 --end 2025-01-01 --output models/ddqn_v2.pt
+
+A training episode resets every environment of a :class:`VectorTradingEnv`
+and runs ``episode_length`` batched env steps.  Each step pushes the whole
+batch into the replay buffer, and every ``train_every`` steps one gradient
+update runs.  The episode's metrics are the mean per-environment return,
+the mean loss, the mean greedy Q-value and ε.  With ``actors`` > 0 the
+actor–learner trainer in :mod:`packages.agent.apex` is used instead.
+
+The training loop runs in a worker thread and hands per-episode metrics to
+an asyncio writer.  The writer stores them with one bulk insert per
+``flush_every`` episodes (or per ``flush_interval`` seconds, whichever
+comes first).  The same write also updates the run's ``total_episodes``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from packages.agent.ddqn import DDQNAgent
+from packages.agent.env import VectorTradingEnv, epsilon_greedy
+from packages.backtest.data import Bars, load_bars
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrainingConfig:
+    episodes: int = 200
+    num_envs: int = 64
+    episode_length: int = 500  # env steps per episode
+    train_every: int = 1  # env steps per gradient update
+    lr: float = 1e-4
+    gamma: float = 0.99
+    epsilon: float = 1.0
+    epsilon_min: float = 0.05
+    epsilon_decay: float = 0.995
+    batch_size: int = 256
+    target_update_freq: int = 500
+    buffer_capacity: int = 200_000
+    cost_bps: float = 1.0
+    reward_scale: float = 100.0
+    seed: int | None = None
+    # Ape-X actor–learner mode (packages.agent.apex) when actors > 0
+    actors: int = 0
+    actor_sync_every: int = 100  # actor env steps between weight pulls
+    publish_every: int = 50  # learner updates between weight publishes
+    learning_starts: int = 5_000  # transitions collected before learning
+
+
+@dataclass(frozen=True, slots=True)
+class EpisodeMetrics:
+    episode: int
+    reward: float
+    loss: float  # 0.0 until the first gradient update
+    q_value: float
+    epsilon: float
+
+    def as_row(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class TrainingResult:
+    episodes: int
+    best_reward: float | None
+    final_loss: float | None
+
+
+class DDQNTrainer:
+    """Synchronous training loop; call :meth:`run` from a thread or process."""
+
+    def __init__(
+        self,
+        bars: Sequence[Bars],
+        config: TrainingConfig | None = None,
+        agent: DDQNAgent | None = None,
+    ) -> None:
+        self.config = config = config or TrainingConfig()
+        self.env = VectorTradingEnv(
+            bars,
+            num_envs=config.num_envs,
+            episode_length=config.episode_length,
+            cost_bps=config.cost_bps,
+            reward_scale=config.reward_scale,
+            seed=config.seed,
+        )
+        self.agent = agent or DDQNAgent(
+            lr=config.lr,
+            gamma=config.gamma,
+            epsilon=config.epsilon,
+            epsilon_min=config.epsilon_min,
+            epsilon_decay=config.epsilon_decay,
+            batch_size=config.batch_size,
+            target_update_freq=config.target_update_freq,
+            buffer_capacity=config.buffer_capacity,
+        )
+        self._rng = np.random.default_rng(config.seed)
+
+    def run_episode(self, episode: int) -> EpisodeMetrics:
+        cfg, env, agent = self.config, self.env, self.agent
+        env.reset()
+        reward_sum = q_sum = loss_sum = 0.0
+        updates = 0
+        for step in range(cfg.episode_length):
+            states = env.states
+            q = agent.q_values_batch(states)
+            q_sum += float(q.max(axis=1).mean())
+            actions = epsilon_greedy(q, agent.epsilon, self._rng)
+            next_states, rewards, dones = env.step(actions)
+            agent.replay.push_batch(states, actions, rewards, next_states, dones)
+            reward_sum += float(rewards.sum())
+            if step % cfg.train_every == 0:
+                loss = agent.train_step()
+                if loss is not None:
+                    loss_sum += loss
+                    updates += 1
+        return EpisodeMetrics(
+            episode=episode,
+            reward=reward_sum / env.num_envs,
+            loss=loss_sum / updates if updates else 0.0,
+            q_value=q_sum / cfg.episode_length,
+            epsilon=agent.epsilon,
+        )
+
+    def run(
+        self,
+        on_episode: Callable[[EpisodeMetrics], None] | None = None,
+        stop: threading.Event | None = None,
+    ) -> TrainingResult:
+        """Train for ``config.episodes`` episodes (or until ``stop`` is set)."""
+        best: float | None = None
+        final_loss: float | None = None
+        done = 0
+        for episode in range(1, self.config.episodes + 1):
+            if stop is not None and stop.is_set():
+                break
+            metrics = self.run_episode(episode)
+            done = episode
+            best = metrics.reward if best is None else max(best, metrics.reward)
+            if metrics.loss:
+                final_loss = metrics.loss
+            if on_episode is not None:
+                on_episode(metrics)
+        return TrainingResult(done, best, final_loss)
+
+
+# ── database-tracked job ──────────────────────────────────────
+
+
+class _MetricsWriter:
+    """Batches per-episode metrics from the training thread into bulk inserts."""
+
+    def __init__(self, run_id: str, flush_every: int, flush_interval: float) -> None:
+        self._run_id = run_id
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._queue: asyncio.Queue[EpisodeMetrics | None] = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+
+    def put(self, metrics: EpisodeMetrics) -> None:
+        """Thread-safe; called from the training thread."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, metrics)
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    async def run(self) -> None:
+        finished = False
+        while not finished:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._flush_every:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: list[EpisodeMetrics]) -> None:
+        from packages.db.engine import get_session_ctx
+        from packages.db.repositories import TrainingRepository
+
+        async with get_session_ctx() as session:
+            repo = TrainingRepository(session)
+            await repo.log_metrics(self._run_id, [m.as_row() for m in batch])
+            await repo.update_progress(self._run_id, batch[-1].episode)
+
+
+async def run_training(
+    model_name: str,
+    symbols: list[str],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    config: TrainingConfig | None = None,
+    output: str | Path | None = None,
+    init_checkpoint: str | Path | None = None,
+    register: str | None = None,
+    flush_every: int = 20,
+    flush_interval: float = 5.0,
+) -> str:
+    """Create a ``training_runs`` row, train off the event loop and complete it.
+
+    The trained weights are saved to ``output`` (default
+    ``models/<model_name>-<run id>.pt``).  With ``register`` the weights
+    are published as that ``model_artifacts`` entry, which serving processes
+    watching it pick up without a restart.  Returns the run id.
+    """
+    from packages.db.engine import get_session_ctx
+    from packages.db.repositories import TrainingRepository
+
+    config = config or TrainingConfig()
+    hyperparameters = {
+        **asdict(config),
+        "symbols": symbols,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+    }
+    async with get_session_ctx() as session:
+        run = await TrainingRepository(session).create_run(model_name, hyperparameters)
+        run_id = run.id
+    logger.info("Training run %s started (%s on %s)", run_id, model_name, ",".join(symbols))
+
+    writer = _MetricsWriter(run_id, flush_every, flush_interval)
+    writer_task = asyncio.create_task(writer.run())
+    try:
+        async with get_session_ctx() as session:
+            bars = [await load_bars(session, s, start, end) for s in symbols]
+        if config.actors > 0:
+            from packages.agent.apex import ApexTrainer
+
+            trainer = ApexTrainer(bars, config)
+        else:
+            trainer = DDQNTrainer(bars, config)
+        if init_checkpoint is not None:
+            trainer.agent.load(str(init_checkpoint))
+        result = await asyncio.to_thread(trainer.run, writer.put)
+        writer.close()
+        await writer_task
+
+        path = Path(output or f"models/{model_name}-{run_id[:8]}.pt")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        trainer.agent.save(str(path))
+    except BaseException:
+        logger.exception("Training run %s failed", run_id)
+        writer_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await writer_task
+        async with get_session_ctx() as session:
+            await TrainingRepository(session).fail_run(run_id)
+        raise
+
+    async with get_session_ctx() as session:
+        await TrainingRepository(session).complete_run(
+            run_id,
+            best_reward=result.best_reward,
+            final_loss=result.final_loss,
+            total_episodes=result.episodes,
+        )
+    if register:
+        from packages.db.repositories import ModelArtifactRepository
+
+        async with get_session_ctx() as session:
+            await ModelArtifactRepository(session).publish(
+                register,
+                version=run_id[:8],
+                artifact_uri=str(path),
+                metrics={"best_reward": result.best_reward, "final_loss": result.final_loss},
+            )
+    logger.info(
+        "Training run %s completed: %d episodes, best reward %s, weights at %s",
+        run_id, result.episodes, result.best_reward, path,
+    )
+    return run_id
+
+
+def _date(text: str) -> datetime:
+    ts = datetime.fromisoformat(text)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from packages.db.engine import close_db, init_db
+
+    config = TrainingConfig(
+        episodes=args.episodes,
+        num_envs=args.envs,
+        episode_length=args.episode_length,
+        lr=args.lr,
+        gamma=args.gamma,
+        batch_size=args.batch_size,
+        cost_bps=args.cost_bps,
+        seed=args.seed,
+        actors=args.actors,
+    )
+    await init_db()
+    try:
+        run_id = await run_training(
+            args.model_name, args.symbols, args.start, args.end, config,
+            output=args.output, init_checkpoint=args.init, register=args.register,
+        )
+        print(run_id)
+    finally:
+        await close_db()
+
+
+def main(argv: list[str] | None = None) -> None:
+    defaults = TrainingConfig()
+    parser = argparse.ArgumentParser(description="Train a DDQN agent on stored ohlcv")
+    parser.add_argument("symbols", nargs="+", type=str.upper)
+    parser.add_argument("--model-name", default="ddqn")
+    parser.add_argument("--start", type=_date)
+    parser.add_argument("--end", type=_date)
+    parser.add_argument("--episodes", type=int, default=defaults.episodes)
+    parser.add_argument("--envs", type=int, default=defaults.num_envs)
+    parser.add_argument("--episode-length", type=int, default=defaults.episode_length)
+    parser.add_argument("--lr", type=float, default=defaults.lr)
+    parser.add_argument("--gamma", type=float, default=defaults.gamma)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--cost-bps", type=float, default=defaults.cost_bps)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--actors", type=int, default=defaults.actors,
+                        help="Ape-X actor processes (0 = single-process training)")
+    parser.add_argument("--init", help="checkpoint to continue training from")
+    parser.add_argument("--output", help="where to save the trained weights")
+    parser.add_argument("--register", metavar="NAME",
+                        help="publish the weights as this model_artifacts entry")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 
@@ -7,6 +9,7 @@ from fastapi import Body, Depends, FastAPI, Query, Request, Response, WebSocket
 from fastapi import WebSocketDisconnect, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from prometheus_fastapi_instrumentator import Instrumentator
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -16,10 +19,13 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 from typing import Annotated
 
+from packages.agent.jobs import TrainingJob
+from packages.agent.model_cache import ModelNotFound
 from packages.agent.service import AgentService
+from packages.agent.shadow import stored_reports
 from packages.data.provider import DataProvider, get_data_provider
 from packages.db.engine import get_session_ctx
-from packages.db.repositories import UserSettingsRepository
+from packages.db.repositories import ShadowDecisionRepository, UserSettingsRepository
 from packages.shared.config import Settings, get_settings
 from packages.shared.auth0 import AuthenticatedUser, get_current_user, verify_auth0_token
 from packages.shared.metrics import websocket_closed, websocket_connected, websocket_message_sent
@@ -27,7 +33,10 @@ from packages.shared.schemas import (
     AgentAction,
     AgentStatus,
     SaveSettingsPayload,
+    ShadowReport,
     StreamRequest,
+    TrainingJobStatus,
+    TrainRequest,
     UserSettingsResponse,
 )
 from packages.shared.security import (
@@ -67,15 +76,32 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     except Exception as exc:
         logger.warning("Database init skipped: %s", exc)
 
+    settings = get_settings()
+    retention = None
+    if settings.quote_retention_enabled:
+        from packages.db.retention import QuoteRetentionManager
+
+        retention = QuoteRetentionManager(
+            partition_days=settings.quote_partition_days,
+            retention_days=settings.quote_raw_retention_days,
+            rollup_seconds=settings.quote_rollup_seconds,
+            interval=settings.quote_retention_interval,
+        )
+        await retention.start()
+
     provider = get_data_provider()
     await provider.start()
     agent = get_agent_service()
+    await agent.start()
     try:
         app.state.data_provider = provider
         app.state.agent_service = agent
         yield
     finally:
+        await agent.stop()
         await provider.stop()
+        if retention is not None:
+            await retention.stop()
         reset_agent_service()
         # Close database connections
         try:
@@ -115,6 +141,7 @@ def create_app(settings: Settings | None = None) -> FastAPI:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["Authorization", "Content-Type"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     app.add_middleware(SecurityHeadersMiddleware)
@@ -184,7 +211,7 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
     @app.get("/api/v1/health/ready")
     async def api_v1_health_ready(
-        provider: DataProvider = Depends(get_data_provider),
+        provider: Annotated[DataProvider, Depends(get_data_provider)],
     ) -> dict[str, object]:
         return {
             "status": "ok",
@@ -199,8 +226,8 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     @limiter.limit("30/minute")
     async def get_quote(
         request: Request,
+        provider: Annotated[DataProvider, Depends(get_data_provider)],
         symbol: str = "AAPL",
-        provider: DataProvider = Depends(get_data_provider),
     ) -> dict:
         """
         Return a single-stock quote.
@@ -235,8 +262,8 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     async def request_stream(
         request: Request,
         stream_request: StreamRequest,
-        provider: DataProvider = Depends(get_data_provider),
-        current_user: AuthenticatedUser = Depends(get_current_user),
+        provider: Annotated[DataProvider, Depends(get_data_provider)],
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
     ) -> dict[str, str]:
         # Validate and sanitize input
         validated_data = validator.validate_stream_request({
@@ -255,23 +282,20 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
     @app.get("/api/v1/settings", response_model=UserSettingsResponse)
     async def get_settings_route(
-        userId: str = Query(...),
-        current_user: AuthenticatedUser = Depends(get_current_user),
+        userId: Annotated[str, Query()],
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
     ) -> UserSettingsResponse:
         if current_user.id != userId:
             raise HTTPException(status_code=403, detail="Forbidden")
 
         async with get_session_ctx() as session:
-            repo = UserSettingsRepository(session)
-            row = await repo.get(userId)
-            if row is None:
-                row = await repo.upsert(userId)
+            row = await UserSettingsRepository(session).get_or_create(userId)
             return UserSettingsResponse.from_db(row)
 
     @app.post("/api/v1/settings", response_model=UserSettingsResponse)
     async def save_settings_route(
         payload: SaveSettingsPayload,
-        current_user: AuthenticatedUser = Depends(get_current_user),
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
     ) -> UserSettingsResponse:
         if current_user.id != payload.userId:
             raise HTTPException(status_code=403, detail="Forbidden")
@@ -294,7 +318,7 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     @app.websocket("/ws/quotes")
     async def quotes_websocket(
         websocket: WebSocket,
-        provider: DataProvider = Depends(get_data_provider),
+        provider: Annotated[DataProvider, Depends(get_data_provider)],
     ) -> None:
         endpoint = "/ws/quotes"
         
@@ -324,13 +348,41 @@ def create_app(settings: Settings | None = None) -> FastAPI:
             await websocket.close(code=4001, reason="Authentication failed")
             return
             
+        agent_service = get_agent_service()
+        model = websocket.query_params.get("model")
+        if model:
+            try:
+                await agent_service.models.get(model)
+            except ModelNotFound as exc:
+                await websocket.accept()
+                await websocket.close(code=4004, reason=str(exc))
+                return
+
+        # ?symbols=AAPL,MSFT narrows the stream and marks those symbols as
+        # watched, so metered providers refresh them ahead of the rest
+        watched = {
+            s.strip().upper()
+            for s in (websocket.query_params.get("symbols") or "").split(",")
+            if 0 < len(s.strip()) <= 10
+        }
+        loop = asyncio.get_running_loop()
+        for symbol in watched:
+            await provider.subscribe(symbol, "quotes")
+        touched = loop.time()
+
         await websocket.accept()
         websocket_connected(endpoint)
-        agent_service = get_agent_service()
         try:
             async for quote in provider.stream_quotes():
-                quote_payload = quote.model_dump(mode="json")
+                if watched and loop.time() - touched >= _WATCH_REFRESH_SECONDS:
+                    for symbol in watched:
+                        await provider.subscribe(symbol, "quotes")
+                    touched = loop.time()
+
+                quote_payload = quote.as_dict()
                 agent_service.on_quote(quote_payload)
+                if watched and quote.symbol not in watched:
+                    continue
 
                 _default_portfolio = {
                     "position_flag": 0,
@@ -340,18 +392,23 @@ def create_app(settings: Settings | None = None) -> FastAPI:
                     "trade_count_today": 0,
                 }
 
-                agent_action = agent_service.get_action(
-                    symbol=quote_payload["symbol"],
-                    portfolio=_default_portfolio,
-                )
+                if model:
+                    agent_action = await agent_service.get_model_action(
+                        quote_payload["symbol"], _default_portfolio, model
+                    )
+                else:
+                    agent_action = agent_service.get_action(
+                        symbol=quote_payload["symbol"],
+                        portfolio=_default_portfolio,
+                    )
 
                 last_price = float(quote_payload.get("price", 0.0))
                 broadcast_payload = {
                     **quote_payload,
-                    "open": last_price,
-                    "high": last_price,
-                    "low": last_price,
-                    "close": last_price,
+                    "open": quote_payload.get("open") or last_price,
+                    "high": quote_payload.get("high") or last_price,
+                    "low": quote_payload.get("low") or last_price,
+                    "close": quote_payload.get("close") or last_price,
                     "action_signal": agent_action.side.value,
                     "confidence": round(agent_action.confidence, 4),
                     "signal_timestamp": agent_action.generated_at.isoformat(),
@@ -371,8 +428,8 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     @limiter.limit("30/minute")  # Rate limit agent status requests
     async def agent_status(
         request: Request,
-        agent: AgentService = Depends(get_agent_service),
-        current_user: AuthenticatedUser = Depends(get_current_user),
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
     ) -> AgentStatus:
         await audit_logger.log_user_action(
             user_id=current_user.id,
@@ -384,27 +441,89 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     @app.post("/api/v1/agent/action", response_model=AgentAction)
     async def get_agent_action(
         symbol: str,
-        portfolio: dict = Body(...),
-        current_user: AuthenticatedUser = Depends(get_current_user),
-        agent: AgentService = Depends(get_agent_service),
+        portfolio: Annotated[dict, Body()],
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+        model: str | None = None,
+        version: str | None = None,
     ) -> AgentAction:
-        return agent.get_action(symbol=symbol, portfolio=portfolio)
+        """Decide with the live agent, or with the named registry ``model``."""
+        if model is None:
+            return agent.get_action(symbol=symbol, portfolio=portfolio)
+        try:
+            return await agent.get_model_action(symbol, portfolio, model, version)
+        except ModelNotFound as exc:
+            raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    @app.get("/api/v1/agent/shadow", response_model=list[ShadowReport])
+    async def shadow_reports(
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        model: str | None = None,
+        hours: float = Query(24.0, gt=0, le=24 * 30),
+    ) -> list[ShadowReport]:
+        """Agreement rate and simulated return of each shadow model vs. the live one."""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        async with get_session_ctx() as session:
+            return await stored_reports(ShadowDecisionRepository(session), model, since)
 
-    @app.post("/api/v1/rl/train", response_model=dict)
+    @app.post(
+        "/api/v1/rl/train",
+        response_model=TrainingJobStatus,
+        status_code=status.HTTP_202_ACCEPTED,
+    )
     async def trigger_training(
-        current_user: AuthenticatedUser = Depends(get_current_user),
-        agent: AgentService = Depends(get_agent_service),
-    ) -> dict:
-        loss = agent._agent.train_step()
-        return {
-            "loss": loss,
-            "epsilon": round(agent._agent.epsilon, 4),
-            "steps": agent._agent.step_count,
-        }
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+        payload: TrainRequest | None = None,
+    ) -> TrainingJobStatus:
+        """Queue gradient steps on the replay buffer; poll the returned job."""
+        job = agent.jobs.submit(steps=(payload or TrainRequest()).steps)
+        return job.status()
+
+    @app.get("/api/v1/rl/jobs/{job_id}", response_model=TrainingJobStatus)
+    async def training_job_status(
+        job_id: str,
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+    ) -> TrainingJobStatus:
+        return _training_job(agent, job_id).status()
+
+    @app.delete("/api/v1/rl/jobs/{job_id}", response_model=TrainingJobStatus)
+    async def cancel_training_job(
+        job_id: str,
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+    ) -> TrainingJobStatus:
+        _training_job(agent, job_id)
+        return agent.jobs.cancel(job_id).status()
+
+    @app.get("/api/v1/rl/jobs/{job_id}/events")
+    async def training_job_events(
+        job_id: str,
+        current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+        agent: Annotated[AgentService, Depends(get_agent_service)],
+        interval: float = Query(0.5, ge=0.05, le=10.0),
+    ) -> StreamingResponse:
+        """Server-sent events: one ``progress`` event per status change."""
+        _training_job(agent, job_id)
+
+        async def events() -> AsyncIterator[str]:
+            async for snapshot in agent.jobs.events(job_id, interval):
+                yield f"event: progress\ndata: {snapshot.model_dump_json()}\n\n"
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     return app
 
 
+# WebSocket clients re-subscribe their symbols this often, well inside the
+# scheduler's active TTL, for as long as they stay connected
+_WATCH_REFRESH_SECONDS = 60.0
+
 _agent_service: AgentService | None = None
 
 
@@ -413,10 +532,42 @@ def get_agent_service() -> AgentService:
     if _agent_service is None:
         settings = get_settings()
         provider = get_data_provider()
-        _agent_service = AgentService(provider, model_version=settings.agent_model_name)
+        _agent_service = AgentService(
+            provider,
+            model_version=settings.agent_model_name,
+            model_cache_bytes=int(settings.agent_model_cache_mb * 2**20),
+            inference_backend=settings.agent_inference_backend,
+            num_threads=settings.torch_num_threads,
+            interop_threads=settings.torch_interop_threads,
+            replay_dir=settings.agent_replay_dir or None,
+            replay_capacity=settings.agent_replay_capacity,
+        )
+        if settings.agent_snapshot_enabled:
+            _agent_service.enable_snapshot(
+                settings.agent_snapshot_name, capacity=settings.agent_snapshot_capacity
+            )
+        if settings.agent_model_watch_interval > 0:
+            _agent_service.enable_model_watch(
+                settings.agent_model_watch_interval,
+                registry_name=settings.agent_model_registry_name or None,
+            )
+        shadow_models = [m.strip() for m in settings.agent_shadow_models.split(",") if m.strip()]
+        if shadow_models:
+            _agent_service.enable_shadow(
+                shadow_models,
+                batch_size=settings.agent_shadow_batch_size,
+                flush_interval=settings.agent_shadow_interval,
+            )
     return _agent_service
 
 
 def reset_agent_service() -> None:
     global _agent_service
     _agent_service = None
+
+
+def _training_job(agent: AgentService, job_id: str) -> TrainingJob:
+    job = agent.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
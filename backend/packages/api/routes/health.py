@@ -1,3 +1,5 @@
+from typing import Annotated
+
 from fastapi import APIRouter, Depends, Request
 
 from packages.shared.schemas import AgentStatus
@@ -15,8 +17,8 @@ async def live() -> dict[str, str]:
 
 @router.get("/ready")
 async def ready(
-    settings: Settings = Depends(get_settings),
-    provider: DataProvider = Depends(get_data_provider),
+    settings: Annotated[Settings, Depends(get_settings)],
+    provider: Annotated[DataProvider, Depends(get_data_provider)],
 ) -> dict[str, object]:
     summary = {
         "environment": settings.environment,
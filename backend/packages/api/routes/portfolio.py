@@ -1,11 +1,20 @@
+import base64
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from packages.db.engine import get_session
+from packages.db.dialects import get_or_create
+from packages.db.engine import get_session, get_session_ctx
 from packages.db.models import AgentActionDB, PortfolioStateDB
+from packages.db.repositories import AgentActionRepository
 from packages.shared.schemas import (
     LogTradePayload,
     PortfolioStateResponse,
@@ -16,22 +25,49 @@ from packages.shared.auth0 import AuthenticatedUser, get_current_user
 
 router = APIRouter(tags=["portfolio"])
 
+_EXPORT_FIELDS = (
+    "id", "user_id", "symbol", "side", "quantity", "price", "confidence", "executed_at",
+)
+_EXPORT_FLUSH_ROWS = 500
+
 
 async def _get_or_create_portfolio(
     session: AsyncSession,
     user_id: str,
 ) -> PortfolioStateDB:
-    stmt = select(PortfolioStateDB).where(PortfolioStateDB.user_id == user_id)
-    result = await session.execute(stmt)
-    row = result.scalar_one_or_none()
+    return await get_or_create(
+        session,
+        PortfolioStateDB,
+        {"user_id": user_id, "cash": 10_000.0},
+        conflict=["user_id"],
+    )
+
+
+def _to_trade_record(t: AgentActionDB, user_id: str) -> TradeRecord:
+    return TradeRecord(
+        id=int(t.id or 0),
+        user_id=t.user_id or user_id,
+        symbol=t.symbol,
+        side=t.side,
+        quantity=float(t.quantity or 0.0),
+        price=float(t.price or 0.0),
+        confidence=float(t.confidence or 0.0),
+        executed_at=t.executed_at,
+    )
+
+
+def _encode_cursor(t: AgentActionDB) -> str:
+    raw = f"{t.executed_at.isoformat()}|{t.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-    if row is None:
-        row = PortfolioStateDB(user_id=user_id, cash=10_000.0)
-        session.add(row)
-        await session.commit()
-        await session.refresh(row)
 
-    return row
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, _, trade_id = base64.urlsafe_b64decode(padded).decode().partition("|")
+        return datetime.fromisoformat(ts), int(trade_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
 
 
 def _build_positions(
@@ -92,8 +128,8 @@ def _build_positions(
 
 @router.get("/api/v1/portfolio", response_model=PortfolioStateResponse)
 async def get_portfolio(
-    session: AsyncSession = Depends(get_session),
-    current_user: AuthenticatedUser = Depends(get_current_user),
+    session: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
 ) -> PortfolioStateResponse:
     portfolio_row = await _get_or_create_portfolio(session, current_user.id)
 
@@ -126,39 +162,75 @@ async def get_portfolio(
 
 @router.get("/api/v1/trades", response_model=list[TradeRecord])
 async def get_trades(
+    response: Response,
+    session: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
     limit: int = 50,
-    session: AsyncSession = Depends(get_session),
-    current_user: AuthenticatedUser = Depends(get_current_user),
+    cursor: str | None = None,
 ) -> list[TradeRecord]:
-    stmt = (
-        select(AgentActionDB)
-        .where(AgentActionDB.user_id == current_user.id)
-        .order_by(AgentActionDB.executed_at.desc())
-        .limit(limit)
+    """Newest-first trade history.
+
+    When more rows may follow, the ``X-Next-Cursor`` response header carries
+    the value to pass as ``cursor`` for the next page.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    trades = await AgentActionRepository(session).get_user_page(
+        current_user.id, limit=limit, before=before
+    )
+    if trades and len(trades) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(trades[-1])
+
+    return [_to_trade_record(t, current_user.id) for t in trades]
+
+
+@router.get("/api/v1/trades/export")
+async def export_trades(
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
+    fmt: Annotated[Literal["csv", "ndjson"], Query(alias="format")] = "csv",
+) -> StreamingResponse:
+    """Stream the user's full trade history, oldest first, as CSV or NDJSON.
+
+    Rows are read through a server-side cursor and written as they arrive,
+    so memory stays flat regardless of history size.
+    """
+    user_id = current_user.id
+
+    async def rows() -> AsyncIterator[str]:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(_EXPORT_FIELDS)
+
+        pending = 0
+        async with get_session_ctx() as session:
+            async for t in AgentActionRepository(session).stream_user_actions(user_id):
+                record = _to_trade_record(t, user_id).model_dump(mode="json")
+                if fmt == "csv":
+                    writer.writerow(record[f] for f in _EXPORT_FIELDS)
+                else:
+                    buf.write(json.dumps(record) + "\n")
+                pending += 1
+                if pending >= _EXPORT_FLUSH_ROWS:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+                    pending = 0
+        if buf.tell():
+            yield buf.getvalue()
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="trades.{fmt}"'},
     )
-    result = await session.execute(stmt)
-    trades = list(result.scalars().all())
-
-    return [
-        TradeRecord(
-            id=int(t.id or 0),
-            user_id=t.user_id or current_user.id,
-            symbol=t.symbol,
-            side=t.side,
-            quantity=float(t.quantity or 0.0),
-            price=float(t.price or 0.0),
-            confidence=float(t.confidence or 0.0),
-            executed_at=t.executed_at,
-        )
-        for t in trades
-    ]
 
 
 @router.post("/api/v1/trades", response_model=TradeRecord)
 async def log_trade(
     payload: LogTradePayload,
-    session: AsyncSession = Depends(get_session),
-    current_user: AuthenticatedUser = Depends(get_current_user),
+    session: Annotated[AsyncSession, Depends(get_session)],
+    current_user: Annotated[AuthenticatedUser, Depends(get_current_user)],
 ) -> TradeRecord:
     portfolio_row = await _get_or_create_portfolio(session, current_user.id)
 
@@ -190,13 +262,4 @@ async def log_trade(
     await session.commit()
     await session.refresh(trade)
 
-    return TradeRecord(
-        id=int(trade.id or 0),
-        user_id=trade.user_id or current_user.id,
-        symbol=trade.symbol,
-        side=trade.side,
-        quantity=float(trade.quantity or 0.0),
-        price=float(trade.price or 0.0),
-        confidence=float(trade.confidence or 0.0),
-        executed_at=trade.executed_at,
-    )
+    return _to_trade_record(trade, current_user.id)
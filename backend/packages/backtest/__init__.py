@@ -0,0 +1,22 @@
+"""Vectorised backtesting of DDQN policies over stored OHLCV."""
+from .data import Bars, load_bars
+from .engine import BacktestConfig, BacktestResult, backtest, load_policy, run_backtest, simulate
+from .features import market_features
+from .sweep import SweepTask, grid, run_sweep, walk_forward, walk_forward_tasks
+
+__all__ = [
+    "BacktestConfig",
+    "BacktestResult",
+    "Bars",
+    "SweepTask",
+    "backtest",
+    "grid",
+    "load_bars",
+    "load_policy",
+    "market_features",
+    "run_backtest",
+    "run_sweep",
+    "simulate",
+    "walk_forward",
+    "walk_forward_tasks",
+]
@@ -0,0 +1,62 @@
+"""
+Usage::
+
+    python -m packages.backtest AAPL MSFT --user-id <id> --checkpoint models/ddqn_weights.pt \\
+        --start 2020-01-01 --end 2025-01-01 --cost-bps 1
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from packages.backtest.engine import BacktestConfig, run_backtest
+
+
+def _date(text: str) -> datetime:
+    ts = datetime.fromisoformat(text)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from packages.db.engine import close_db, get_session_ctx, init_db
+    from packages.db.repositories import BacktestRepository
+
+    await init_db()
+    try:
+        run_id = await run_backtest(
+            user_id=args.user_id,
+            model_name=args.model_name,
+            checkpoint=args.checkpoint,
+            symbols=args.symbols,
+            start=args.start,
+            end=args.end,
+            config=BacktestConfig(initial_capital=args.capital, cost_bps=args.cost_bps),
+        )
+        async with get_session_ctx() as session:
+            run = await BacktestRepository(session).get_run(run_id)
+        print(
+            f"{run.id}: return {run.total_return:.2%}  CAGR {run.cagr:.2%}  "
+            f"Sharpe {run.sharpe_ratio:.2f}  max DD {run.max_drawdown:.2%}  "
+            f"trades {run.total_trades}"
+        )
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest a DDQN checkpoint over ohlcv")
+    parser.add_argument("symbols", nargs="+", type=str.upper)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--checkpoint", default="models/ddqn_weights.pt")
+    parser.add_argument("--model-name", default="ddqn-v1")
+    parser.add_argument("--start", type=_date)
+    parser.add_argument("--end", type=_date)
+    parser.add_argument("--capital", type=float, default=100_000.0)
+    parser.add_argument("--cost-bps", type=float, default=1.0)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
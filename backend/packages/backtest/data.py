@@ -0,0 +1,84 @@
+"""
+OHLCV loading into contiguous NumPy arrays.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from packages.db.models import OHLCVDB
+
+_FETCH_ROWS = 50_000
+
+
+@dataclass
+class Bars:
+    """Column arrays for one symbol, sorted by time (``ts`` in epoch seconds)."""
+
+    symbol: str
+    ts: np.ndarray  # int64
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ts.size)
+
+    def slice(self, start: datetime | None = None, end: datetime | None = None) -> Bars:
+        """Bars in ``[start, end)``, so adjacent windows never share a bar."""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start.timestamp(), "left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.ts, end.timestamp(), "left"))
+        return Bars(
+            self.symbol, self.ts[lo:hi], self.open[lo:hi], self.high[lo:hi],
+            self.low[lo:hi], self.close[lo:hi], self.volume[lo:hi],
+        )
+
+    @classmethod
+    def from_columns(cls, symbol: str, rows: list[tuple]) -> Bars:
+        if not rows:
+            empty = np.empty(0)
+            return cls(symbol, np.empty(0, np.int64), empty, empty, empty, empty, empty)
+        ts, o, h, lo, c, v = zip(*rows)
+        stamps = np.array(
+            [(t if t.tzinfo else t.replace(tzinfo=timezone.utc)).timestamp() for t in ts],
+            dtype=np.float64,
+        ).astype(np.int64)
+        return cls(
+            symbol,
+            stamps,
+            np.asarray(o, np.float64),
+            np.asarray(h, np.float64),
+            np.asarray(lo, np.float64),
+            np.asarray(c, np.float64),
+            np.asarray(v, np.float64),
+        )
+
+
+async def load_bars(
+    session: AsyncSession,
+    symbol: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> Bars:
+    """Stream one symbol's candles from ``ohlcv`` straight into arrays."""
+    stmt = select(
+        OHLCVDB.timestamp, OHLCVDB.open, OHLCVDB.high, OHLCVDB.low, OHLCVDB.close, OHLCVDB.volume
+    ).where(OHLCVDB.symbol == symbol)
+    if start is not None:
+        stmt = stmt.where(OHLCVDB.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(OHLCVDB.timestamp <= end)
+    stmt = stmt.order_by(OHLCVDB.timestamp).execution_options(yield_per=_FETCH_ROWS)
+
+    rows: list[tuple] = []
+    result = await session.stream(stmt)
+    async for part in result.partitions():
+        rows.extend(tuple(r) for r in part)
+    return Bars.from_columns(symbol, rows)
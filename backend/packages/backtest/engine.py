@@ -0,0 +1,247 @@
+"""
+Vectorised DDQN backtester.
+
+Market features for the whole history come from one vectorised pass
+(:func:`market_features`).  The only sequential part is the portfolio half of
+the state (position, unrealised P&L, cash ratio, trades today), which depends
+on earlier actions.  That is resolved by *speculative chunked recurrence*:
+assume the position stays unchanged for the next ``chunk`` bars, build all
+their states at once, run one batched forward pass, and accept every bar up
+to and including the first one whose action would change the position.
+Decisions are therefore identical to a bar-by-bar replay while forward
+passes run over thousands of rows at a time; the chunk grows while the
+policy holds and shrinks after each trade.
+
+Execution model: long/flat, all-in, filled at the deciding bar's close with
+``cost_bps`` charged on traded notional.  ``time_of_day`` uses the bar's UTC
+hour.  Multiple symbols split the capital equally and are summed on the
+union of their timestamps.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from packages.agent.ddqn import DQNetwork
+from packages.agent.feature_engine import FeatureEngine
+from packages.backtest.data import Bars, load_bars
+from packages.backtest.features import WARMUP, market_features
+
+logger = logging.getLogger(__name__)
+
+_SECONDS_PER_YEAR = 365.25 * 86_400
+_HOLD, _BUY, _SELL = 0, 1, 2
+
+
+@dataclass
+class BacktestConfig:
+    initial_capital: float = 100_000.0
+    cost_bps: float = 1.0  # per trade, on traded notional
+    min_chunk: int = 256
+    max_chunk: int = 65_536
+
+
+@dataclass
+class SymbolResult:
+    symbol: str
+    ts: np.ndarray
+    equity: np.ndarray
+    actions: np.ndarray  # int8, -1 during warm-up
+    trades: int
+
+
+@dataclass
+class BacktestResult:
+    ts: np.ndarray
+    equity: np.ndarray
+    initial_capital: float
+    trades: int
+    per_symbol: dict[str, SymbolResult] = field(default_factory=dict)
+
+    @property
+    def final_value(self) -> float:
+        return float(self.equity[-1]) if self.equity.size else self.initial_capital
+
+    def metrics(self) -> dict[str, float | int]:
+        """Summary in ``backtest_runs`` column names."""
+        final = self.final_value
+        total_return = final / self.initial_capital - 1.0
+        years = (self.ts[-1] - self.ts[0]) / _SECONDS_PER_YEAR if self.ts.size > 1 else 0.0
+        cagr = 0.0
+        if years > 0 and final > 0:
+            cagr = (final / self.initial_capital) ** (1.0 / years) - 1.0
+
+        sharpe = 0.0
+        if self.equity.size > 2 and years > 0:
+            returns = np.diff(self.equity) / self.equity[:-1]
+            std = returns.std()
+            if std > 0:
+                sharpe = float(returns.mean() / std * np.sqrt((self.equity.size - 1) / years))
+
+        drawdown = 0.0
+        if self.equity.size:
+            drawdown = float(np.max(1.0 - self.equity / np.maximum.accumulate(self.equity)))
+
+        return {
+            "final_value": final,
+            "total_return": float(total_return),
+            "cagr": float(cagr),
+            "sharpe_ratio": sharpe,
+            "max_drawdown": drawdown,
+            "total_trades": int(self.trades),
+        }
+
+
+def load_policy(path: str | Path) -> DQNetwork:
+    """Online network from a ``DDQNAgent.save`` checkpoint (or a bare state dict)."""
+    ckpt = torch.load(path, map_location="cpu", weights_only=True)
+    state = ckpt.get("online", ckpt)
+    net = DQNetwork(FeatureEngine.STATE_DIM, 3)
+    net.load_state_dict(state)
+    net.eval()
+    return net
+
+
+def _q_values(net: torch.nn.Module, states: np.ndarray) -> np.ndarray:
+    with torch.no_grad():
+        return net(torch.from_numpy(states)).numpy()
+
+
+def simulate(
+    net: torch.nn.Module,
+    bars: Bars,
+    capital: float,
+    config: BacktestConfig | None = None,
+    market: np.ndarray | None = None,
+) -> SymbolResult:
+    """Run the policy over one symbol's bars; see the module docstring."""
+    config = config or BacktestConfig()
+    n = len(bars)
+    close = bars.close
+    equity = np.full(n, capital, dtype=np.float64)
+    actions = np.full(n, -1, dtype=np.int8)
+    if n <= WARMUP:
+        return SymbolResult(bars.symbol, bars.ts, equity, actions, 0)
+
+    if market is None:
+        market = market_features(close, bars.high, bars.low, bars.volume)
+    day = bars.ts // 86_400
+    time_of_day = ((bars.ts % 86_400) // 3_600 / 24.0).astype(np.float32)
+    cost = config.cost_bps / 10_000.0
+
+    cash, shares, entry = capital, 0.0, 0.0
+    trades, trade_day, trades_on_day = 0, -1, 0
+    chunk = config.min_chunk
+    t = WARMUP
+    states = np.empty((config.max_chunk, FeatureEngine.STATE_DIM), dtype=np.float32)
+
+    while t < n:
+        hi = min(n, t + chunk)
+        m = hi - t
+        long = shares > 0
+        block = states[:m]
+        block[:, : FeatureEngine.MARKET_DIM] = market[t:hi]
+        block[:, 9] = 1.0 if long else 0.0
+        block[:, 10] = close[t:hi] / entry - 1.0 if long else 0.0
+        block[:, 11] = 0.0 if long else 1.0
+        block[:, 12] = np.where(day[t:hi] == trade_day, trades_on_day, 0) / 10.0
+        block[:, 13] = time_of_day[t:hi]
+        np.clip(block, -10.0, 10.0, out=block)
+
+        chosen = _q_values(net, block).argmax(axis=1)
+        flips = np.flatnonzero(chosen == (_SELL if long else _BUY))
+        stop = int(flips[0]) if flips.size else m  # bars [t, t+stop) keep the position
+
+        actions[t : t + stop] = chosen[:stop]
+        equity[t : t + stop] = cash + shares * close[t : t + stop]
+        if stop == m:
+            t = hi
+            chunk = min(chunk * 2, config.max_chunk)
+            continue
+
+        i = t + stop
+        price = close[i]
+        if long:
+            cash, shares = shares * price * (1.0 - cost), 0.0
+        else:
+            cash, shares, entry = 0.0, cash * (1.0 - cost) / price, price
+        trades += 1
+        trades_on_day = trades_on_day + 1 if day[i] == trade_day else 1
+        trade_day = day[i]
+        actions[i] = chosen[stop]
+        equity[i] = cash + shares * price
+        t = i + 1
+        chunk = max(chunk // 2, config.min_chunk)
+
+    return SymbolResult(bars.symbol, bars.ts, equity, actions, trades)
+
+
+def backtest(
+    net: torch.nn.Module,
+    bars: dict[str, Bars],
+    config: BacktestConfig | None = None,
+) -> BacktestResult:
+    """Backtest every symbol on an equal capital split and combine the sleeves."""
+    config = config or BacktestConfig()
+    net.eval()
+    sleeves = [b for b in bars.values() if len(b)]
+    if not sleeves:
+        raise ValueError("No OHLCV bars to backtest")
+    capital = config.initial_capital / len(sleeves)
+    results = {b.symbol: simulate(net, b, capital, config) for b in sleeves}
+
+    timeline = np.unique(np.concatenate([r.ts for r in results.values()]))
+    total = np.zeros(timeline.size)
+    for r in results.values():
+        idx = np.searchsorted(r.ts, timeline, side="right") - 1
+        total += np.where(idx >= 0, r.equity[np.maximum(idx, 0)], capital)
+    trades = sum(r.trades for r in results.values())
+    return BacktestResult(timeline, total, config.initial_capital, trades, results)
+
+
+async def run_backtest(
+    user_id: str,
+    model_name: str,
+    checkpoint: str | Path,
+    symbols: list[str],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    config: BacktestConfig | None = None,
+) -> str:
+    """Load bars, backtest off the event loop and record the run; returns its id."""
+    from packages.db.engine import get_session_ctx
+    from packages.db.repositories import BacktestRepository
+
+    config = config or BacktestConfig()
+    async with get_session_ctx() as session:
+        run = await BacktestRepository(session).create(
+            user_id=user_id,
+            model_name=model_name,
+            symbols=",".join(symbols),
+            start_date=start,
+            end_date=end,
+            initial_capital=config.initial_capital,
+        )
+        run_id = run.id
+
+    try:
+        async with get_session_ctx() as session:
+            bars = {s: await load_bars(session, s, start, end) for s in symbols}
+        net = load_policy(checkpoint)
+        result = await asyncio.to_thread(backtest, net, bars, config)
+    except Exception:
+        logger.exception("Backtest %s failed", run_id)
+        async with get_session_ctx() as session:
+            await BacktestRepository(session).fail_run(run_id)
+        raise
+
+    async with get_session_ctx() as session:
+        await BacktestRepository(session).complete_run(run_id, **result.metrics())
+    return run_id
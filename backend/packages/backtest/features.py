@@ -0,0 +1,125 @@
+"""
+Vectorised state vectors for whole price histories.
+
+Produces, for every bar at once, exactly what :class:`FeatureEngine` would
+return after being fed the same bars one by one — including its 100-bar
+rolling window, whose EMAs restart at the oldest bar kept.  Full windows are
+handled with ``sliding_window_view`` and a fixed weight vector per EMA
+period; the short warm-up windows at the start fall back to a small loop.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from packages.agent.feature_engine import FeatureEngine
+
+WINDOW = FeatureEngine.WINDOW
+WARMUP = 25  # first bar index with a defined state (FeatureEngine needs 26 bars)
+
+
+def _ema_weights(period: int, length: int) -> np.ndarray:
+    """Weights reproducing FeatureEngine._ema over a window of ``length`` bars."""
+    k = 2.0 / (period + 1)
+    powers = (1.0 - k) ** np.arange(length - 1, -1, -1)
+    weights = k * powers
+    weights[0] = powers[0]  # the seed value is the window's first bar
+    return weights
+
+
+def windowed_ema(closes: np.ndarray, period: int, window: int = WINDOW) -> np.ndarray:
+    """EMA over the trailing ``window`` bars (seeded at the window's start) for every bar."""
+    n = closes.size
+    out = np.empty(n, dtype=np.float64)
+    for t in range(min(window - 1, n)):
+        out[t] = closes[: t + 1] @ _ema_weights(period, t + 1)
+    if n >= window:
+        out[window - 1:] = sliding_window_view(closes, window) @ _ema_weights(period, window)
+    return out
+
+
+def _rolling_mean(values: np.ndarray, length: int) -> np.ndarray:
+    """Mean of the trailing ``length`` values (fewer during warm-up)."""
+    csum = np.concatenate([[0.0], np.cumsum(values)])
+    idx = np.arange(values.size)
+    lo = np.maximum(idx + 1 - length, 0)
+    return (csum[idx + 1] - csum[lo]) / (idx + 1 - lo)
+
+
+def market_features(
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    volume: np.ndarray,
+) -> np.ndarray:
+    """(n, 9) float32 market features; rows before :data:`WARMUP` are undefined (NaN)."""
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    n = close.size
+    out = np.full((n, FeatureEngine.MARKET_DIM), np.nan, dtype=np.float32)
+    if n <= WARMUP:
+        return out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # [0] price position inside the all-time range seen so far
+        hi = np.maximum.accumulate(close)
+        lo = np.minimum.accumulate(close)
+        rng = hi - lo
+        p_norm = np.where(rng > 0, (close - lo) / rng, 0.5)
+
+        # [1] / [2] one- and five-bar returns
+        prev1 = np.concatenate([close[:1], close[:-1]])
+        prev5 = np.concatenate([np.full(5, close[0]), close[:-5]])
+        pc1 = np.where(prev1 != 0, (close - prev1) / prev1, 0.0)
+        pc5 = np.where(prev5 != 0, (close - prev5) / prev5, 0.0)
+
+        # [3] volume vs 20-bar average
+        vol_avg = _rolling_mean(volume, 20)
+        vol_ratio = np.where(vol_avg > 0, volume / vol_avg, 1.0)
+
+        # [4] RSI 14: means of the up and down moves among the last 14 deltas
+        deltas = np.diff(close)
+        win = sliding_window_view(deltas, 14)  # row j covers deltas[j : j + 14]
+        up = np.where(win > 0, win, 0.0)
+        down = np.where(win < 0, -win, 0.0)
+        n_up = (win > 0).sum(axis=1)
+        n_down = (win < 0).sum(axis=1)
+        gains = np.where(n_up > 0, up.sum(axis=1) / np.maximum(n_up, 1), 1e-9)
+        losses = np.where(n_down > 0, down.sum(axis=1) / np.maximum(n_down, 1), 1e-9)
+        rsi = np.full(n, 0.5)
+        rsi[14:] = 1 - 1 / (1 + gains / losses)
+
+        # [5] MACD line, normalised by price and clipped
+        macd = windowed_ema(close, 12) - windowed_ema(close, 26)
+        macd_hist = np.clip(macd / (close + 1e-9), -1, 1)
+
+        # [6] Bollinger position (population std, 20 bars)
+        bb = sliding_window_view(close, 20)
+        mid = bb.mean(axis=1)
+        std = bb.std(axis=1)
+        lower = mid - 2 * std
+        band = 4 * std
+        bb_pos = np.full(n, 0.5)
+        bb_pos[19:] = np.where(band > 0, (close[19:] - lower) / band, 0.5)
+
+        # [7] EMA 9 vs EMA 21
+        ema_cross = np.where(windowed_ema(close, 9) > windowed_ema(close, 21), 1.0, -1.0)
+
+        # [8] ATR 14 normalised by price
+        tr = np.maximum.reduce([
+            high[1:] - low[1:],
+            np.abs(high[1:] - close[:-1]),
+            np.abs(low[1:] - close[:-1]),
+        ])
+        atr = np.zeros(n)
+        atr[1:] = _rolling_mean(tr, 14)
+        atr_norm = np.where(close > 0, atr / close, 0.0)
+
+    features = np.stack(
+        [p_norm, pc1, pc5, vol_ratio, rsi, macd_hist, bb_pos, ema_cross, atr_norm], axis=1
+    )
+    out[WARMUP:] = features[WARMUP:]
+    return out
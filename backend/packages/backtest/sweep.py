@@ -0,0 +1,403 @@
+"""
+Parallel parameter sweeps and walk-forward evaluation.
+
+A sweep is a list of :class:`SweepTask` combinations (checkpoint, symbol set,
+date window, cost) fanned out over a ``ProcessPoolExecutor`` with one
+single-threaded worker per core.  OHLCV is loaded once in the parent and
+written to a :class:`BarStore`, a pair of ``.npy`` files that every worker
+opens with ``mmap_mode="r"``.  Workers then read the same pages from the OS
+page cache instead of unpickling or re-querying the bars.  Each worker keeps
+the policies it has loaded, so a checkpoint is read at most once per
+process.
+
+Walk-forward splits come from :func:`walk_forward`.  Each fold is evaluated
+in-sample (``split="train"``) and out-of-sample (``split="test"``), either
+with one checkpoint or with one checkpoint per fold.  Every task becomes one
+row of the result table; :func:`summarize` averages the folds.
+
+Usage::
+
+    python -m packages.backtest.sweep --symbols AAPL,MSFT --symbols NVDA \\
+        --checkpoint models/a.pt --checkpoint models/b.pt --cost-bps 1 5 \\
+        --start 2020-01-01 --end 2025-01-01 --train-days 365 --test-days 90
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, timezone
+from itertools import product
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from packages.backtest.data import Bars, load_bars
+from packages.backtest.engine import BacktestConfig, backtest, load_policy
+
+logger = logging.getLogger(__name__)
+
+_METRICS = ("total_return", "cagr", "sharpe_ratio", "max_drawdown", "total_trades")
+
+
+@dataclass(frozen=True)
+class SweepTask:
+    checkpoint: str
+    symbols: tuple[str, ...]
+    start: datetime | None = None
+    end: datetime | None = None
+    cost_bps: float = 1.0
+    fold: int | None = None
+    split: str = "full"  # "full", or "train" / "test" for walk-forward folds
+
+
+@dataclass(frozen=True)
+class Fold:
+    index: int
+    train_start: datetime
+    train_end: datetime
+    test_start: datetime
+    test_end: datetime
+
+
+def grid(
+    checkpoints: Iterable[str],
+    symbol_sets: Iterable[Sequence[str]],
+    windows: Iterable[tuple[datetime | None, datetime | None]] = ((None, None),),
+    cost_bps: Iterable[float] = (1.0,),
+) -> list[SweepTask]:
+    """Cartesian product of the sweep dimensions."""
+    return [
+        SweepTask(str(ckpt), tuple(symbols), start, end, float(cost))
+        for ckpt, symbols, (start, end), cost in product(
+            checkpoints, symbol_sets, list(windows), list(cost_bps)
+        )
+    ]
+
+
+def walk_forward(
+    start: datetime,
+    end: datetime,
+    train: timedelta,
+    test: timedelta,
+    step: timedelta | None = None,
+    anchored: bool = False,
+) -> list[Fold]:
+    """Consecutive train/test folds covering ``[start, end]``.
+
+    Each test window directly follows its train window.  Folds advance by
+    ``step`` (default: ``test``).  With ``anchored`` the train window always
+    begins at ``start`` and grows instead of rolling.
+    """
+    step = step or test
+    folds: list[Fold] = []
+    train_start = start
+    while True:
+        train_end = train_start + train if not anchored else start + train + step * len(folds)
+        test_end = train_end + test
+        if test_end > end:
+            break
+        folds.append(Fold(len(folds), train_start, train_end, train_end, test_end))
+        if not anchored:
+            train_start += step
+    return folds
+
+
+def walk_forward_tasks(
+    folds: Sequence[Fold],
+    checkpoints: str | Sequence[str],
+    symbol_sets: Iterable[Sequence[str]],
+    cost_bps: Iterable[float] = (1.0,),
+) -> list[SweepTask]:
+    """In- and out-of-sample tasks per fold.
+
+    ``checkpoints`` is either one path used for every fold or one path per
+    fold (e.g. a model trained on that fold's train window).
+    """
+    if isinstance(checkpoints, (str, Path)):
+        per_fold = [str(checkpoints)] * len(folds)
+    else:
+        per_fold = [str(c) for c in checkpoints]
+        if len(per_fold) != len(folds):
+            raise ValueError(f"Expected {len(folds)} checkpoints, got {len(per_fold)}")
+
+    tasks: list[SweepTask] = []
+    for fold, ckpt in zip(folds, per_fold):
+        for symbols, cost in product(list(symbol_sets), list(cost_bps)):
+            base = SweepTask(ckpt, tuple(symbols), cost_bps=float(cost), fold=fold.index)
+            tasks.append(replace(base, start=fold.train_start, end=fold.train_end, split="train"))
+            tasks.append(replace(base, start=fold.test_start, end=fold.test_end, split="test"))
+    return tasks
+
+
+# ── shared bars ───────────────────────────────────────────────
+
+
+class BarStore:
+    """Every symbol's bars concatenated into two memory-mapped ``.npy`` files.
+
+    ``ts.npy`` holds int64 timestamps and ``ohlcv.npy`` a (5, total) float64
+    matrix; ``index`` maps symbol → (offset, length).  Opening the store in
+    another process maps the files read-only without copying them.
+    """
+
+    def __init__(self, directory: str, index: dict[str, tuple[int, int]]) -> None:
+        self.directory = directory
+        self.index = index
+        self._ts = np.load(os.path.join(directory, "ts.npy"), mmap_mode="r")
+        self._values = np.load(os.path.join(directory, "ohlcv.npy"), mmap_mode="r")
+
+    @classmethod
+    def create(cls, bars: dict[str, Bars], directory: str) -> BarStore:
+        index: dict[str, tuple[int, int]] = {}
+        offset = 0
+        for symbol, b in bars.items():
+            index[symbol] = (offset, len(b))
+            offset += len(b)
+
+        ts = np.lib.format.open_memmap(
+            os.path.join(directory, "ts.npy"), mode="w+", dtype=np.int64, shape=(offset,)
+        )
+        values = np.lib.format.open_memmap(
+            os.path.join(directory, "ohlcv.npy"), mode="w+", dtype=np.float64, shape=(5, offset)
+        )
+        for symbol, b in bars.items():
+            lo, n = index[symbol]
+            ts[lo : lo + n] = b.ts
+            for row, column in enumerate((b.open, b.high, b.low, b.close, b.volume)):
+                values[row, lo : lo + n] = column
+        ts.flush()
+        values.flush()
+        del ts, values
+        return cls(directory, index)
+
+    def bars(self, symbol: str) -> Bars:
+        lo, n = self.index[symbol]
+        v = self._values[:, lo : lo + n]
+        return Bars(symbol, self._ts[lo : lo + n], v[0], v[1], v[2], v[3], v[4])
+
+
+# ── workers ───────────────────────────────────────────────────
+
+_store: BarStore | None = None
+_config = BacktestConfig()
+_policies: dict[str, Any] = {}
+
+
+def _init_worker(directory: str, index: dict[str, tuple[int, int]], config: BacktestConfig) -> None:
+    global _store, _config
+    import torch
+
+    # one process per core; intra-op threads would only oversubscribe them
+    torch.set_num_threads(1)
+    _store = BarStore(directory, index)
+    _config = config
+
+
+def _run_task(task: SweepTask) -> dict[str, Any]:
+    assert _store is not None
+    row: dict[str, Any] = asdict(task)
+    row["symbols"] = ",".join(task.symbols)
+    try:
+        net = _policies.get(task.checkpoint)
+        if net is None:
+            net = _policies[task.checkpoint] = load_policy(task.checkpoint)
+        bars = {s: _store.bars(s).slice(task.start, task.end) for s in task.symbols}
+        result = backtest(net, bars, replace(_config, cost_bps=task.cost_bps))
+    except Exception as exc:  # one bad combination must not sink the sweep
+        row.update(status="failed", error=str(exc))
+        return row
+    row.update(status="completed", bars=int(result.ts.size), **result.metrics())
+    return row
+
+
+def run_sweep(
+    bars: dict[str, Bars],
+    tasks: Sequence[SweepTask],
+    config: BacktestConfig | None = None,
+    max_workers: int | None = None,
+) -> list[dict[str, Any]]:
+    """Run every task in a process pool; rows come back in task order."""
+    config = config or BacktestConfig()
+    max_workers = max_workers or os.cpu_count() or 1
+    directory = tempfile.mkdtemp(prefix="stocktrade-sweep-")
+    try:
+        store = BarStore.create(bars, directory)
+        rows: list[dict[str, Any] | None] = [None] * len(tasks)
+        # spawn: forking a parent that already started torch's thread pool can deadlock
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tasks)) or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(directory, store.index, config),
+        ) as pool:
+            futures = {pool.submit(_run_task, task): i for i, task in enumerate(tasks)}
+            for done, future in enumerate(as_completed(futures), 1):
+                rows[futures[future]] = future.result()
+                if done % 50 == 0 or done == len(tasks):
+                    logger.info("Sweep progress: %d/%d tasks", done, len(tasks))
+        del store
+        return rows  # type: ignore[return-value]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def summarize(rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Average completed rows over folds, per (checkpoint, symbols, cost, split)."""
+    groups: dict[tuple, list[dict[str, Any]]] = {}
+    for row in rows:
+        if row.get("status") == "completed":
+            key = (row["checkpoint"], row["symbols"], row["cost_bps"], row["split"])
+            groups.setdefault(key, []).append(row)
+    summary = []
+    for (checkpoint, symbols, cost, split), members in groups.items():
+        entry: dict[str, Any] = {
+            "checkpoint": checkpoint, "symbols": symbols, "cost_bps": cost,
+            "split": split, "folds": len(members),
+        }
+        for name in _METRICS:
+            entry[name] = float(np.mean([m[name] for m in members]))
+        summary.append(entry)
+    return summary
+
+
+def format_table(rows: Sequence[dict[str, Any]], columns: Sequence[str] | None = None) -> str:
+    """Fixed-width text table of ``rows``."""
+    if not rows:
+        return ""
+    columns = list(columns or rows[0].keys())
+
+    def cell(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.4f}"
+        if isinstance(value, datetime):
+            return value.date().isoformat()
+        return "" if value is None else str(value)
+
+    cells = [[cell(row.get(c)) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in cells]
+    return "\n".join(lines)
+
+
+# ── database entry point ──────────────────────────────────────
+
+
+async def sweep_from_db(
+    tasks: Sequence[SweepTask],
+    config: BacktestConfig | None = None,
+    max_workers: int | None = None,
+    user_id: str | None = None,
+    model_name: str = "sweep",
+) -> list[dict[str, Any]]:
+    """Load every needed symbol once, run the sweep and optionally record runs.
+
+    With ``user_id`` each completed row is stored as a ``backtest_runs`` row.
+    """
+    from packages.db.engine import get_session_ctx
+    from packages.db.repositories import BacktestRepository
+
+    config = config or BacktestConfig()
+    symbols = sorted({s for t in tasks for s in t.symbols})
+    starts = [t.start for t in tasks]
+    ends = [t.end for t in tasks]
+    start = None if None in starts else min(starts)
+    end = None if None in ends else max(ends)
+    async with get_session_ctx() as session:
+        bars = {s: await load_bars(session, s, start, end) for s in symbols}
+
+    rows = await asyncio.to_thread(run_sweep, bars, tasks, config, max_workers)
+
+    if user_id is not None:
+        async with get_session_ctx() as session:
+            repo = BacktestRepository(session)
+            for row in rows:
+                if row["status"] != "completed":
+                    continue
+                run = await repo.create(
+                    user_id=user_id,
+                    model_name=f"{model_name}:{Path(row['checkpoint']).stem}",
+                    symbols=row["symbols"],
+                    start_date=row["start"],
+                    end_date=row["end"],
+                    initial_capital=config.initial_capital,
+                )
+                metrics = {k: row[k] for k in ("final_value", *_METRICS)}
+                await repo.complete_run(run.id, **metrics)
+                row["run_id"] = run.id
+    return rows
+
+
+def _date(text: str) -> datetime:
+    ts = datetime.fromisoformat(text)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from packages.db.engine import close_db, init_db
+
+    symbol_sets = [tuple(s.upper().split(",")) for s in args.symbols]
+    if args.train_days:
+        if args.start is None or args.end is None:
+            raise SystemExit("--train-days needs --start and --end")
+        folds = walk_forward(
+            args.start, args.end,
+            timedelta(days=args.train_days), timedelta(days=args.test_days),
+            anchored=args.anchored,
+        )
+        checkpoints = args.checkpoint if len(args.checkpoint) > 1 else args.checkpoint[0]
+        tasks = walk_forward_tasks(folds, checkpoints, symbol_sets, args.cost_bps)
+    else:
+        tasks = grid(args.checkpoint, symbol_sets, [(args.start, args.end)], args.cost_bps)
+
+    await init_db()
+    try:
+        rows = await sweep_from_db(
+            tasks,
+            BacktestConfig(initial_capital=args.capital),
+            max_workers=args.workers,
+            user_id=args.user_id,
+        )
+    finally:
+        await close_db()
+
+    columns = ["checkpoint", "symbols", "start", "end", "cost_bps", "fold", "split",
+               "status", *_METRICS]
+    print(format_table(rows, columns))
+    if args.train_days:
+        print()
+        print(format_table(summarize(rows)))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Parallel backtest sweep over ohlcv")
+    parser.add_argument("--symbols", action="append", required=True,
+                        help="comma-separated symbol set; repeat for more sets")
+    parser.add_argument("--checkpoint", action="append", required=True,
+                        help="repeat for more checkpoints (or one per walk-forward fold)")
+    parser.add_argument("--cost-bps", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--start", type=_date)
+    parser.add_argument("--end", type=_date)
+    parser.add_argument("--train-days", type=int, help="enable walk-forward with this train span")
+    parser.add_argument("--test-days", type=int, default=90)
+    parser.add_argument("--anchored", action="store_true", help="expanding train window")
+    parser.add_argument("--capital", type=float, default=100_000.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--user-id", help="record completed runs in backtest_runs")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
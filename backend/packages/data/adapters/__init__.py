@@ -1,4 +1,11 @@
 from .mock import MockDataProvider
+from .replay import ReplayDataProvider
+from .synthetic import SyntheticDataProvider
 from .twelvedata import TwelveDataProvider
 
-__all__ = ["MockDataProvider", "TwelveDataProvider"]
+__all__ = [
+    "MockDataProvider",
+    "ReplayDataProvider",
+    "SyntheticDataProvider",
+    "TwelveDataProvider",
+]
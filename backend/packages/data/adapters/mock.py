@@ -1,10 +1,10 @@
 import asyncio
 import random
-from collections.abc import AsyncIterator, Iterable
+from collections.abc import Iterable
 from datetime import datetime, timezone
 
 from packages.data.provider import BaseAsyncProvider
-from packages.shared.schemas import Quote
+from packages.shared.schemas import Tick
 
 
 class MockDataProvider(BaseAsyncProvider):
@@ -12,11 +12,15 @@ class MockDataProvider(BaseAsyncProvider):
 
     name = "mock"
 
-    def __init__(self, symbols: Iterable[str] | None = None, interval: float = 1.0) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        symbols: Iterable[str] | None = None,
+        interval: float = 1.0,
+        **queue_options,
+    ) -> None:
+        super().__init__(**queue_options)
         self._symbols: list[str] = [s.upper() for s in (symbols or ["AAPL"])]
         self._interval = max(interval, 0.2)
-        self._queue: asyncio.Queue[Quote] = asyncio.Queue()
         self._task: asyncio.Task[None] | None = None
         self._prices: dict[str, float] = {
             symbol: random.uniform(100.0, 300.0) for symbol in self._symbols
@@ -43,13 +47,6 @@ class MockDataProvider(BaseAsyncProvider):
             self._symbols.append(normalized)
             self._prices[normalized] = random.uniform(100.0, 300.0)
 
-    def stream_quotes(self) -> AsyncIterator[Quote]:
-        async def iterator() -> AsyncIterator[Quote]:
-            while True:
-                yield await self._queue.get()
-
-        return iterator()
-
     async def _run(self) -> None:
         while True:
             now = datetime.now(timezone.utc)
@@ -58,7 +55,7 @@ class MockDataProvider(BaseAsyncProvider):
                 step = random.uniform(-1.2, 1.2)
                 next_price = max(1.0, last + step)
                 self._prices[symbol] = next_price
-                await self._queue.put(
-                    Quote(symbol=symbol, price=round(next_price, 2), volume=random.randint(1000, 50000), timestamp=now)
+                await self._publish(
+                    Tick(symbol, round(next_price, 2), random.randint(1000, 50000), now)
                 )
             await asyncio.sleep(self._interval)
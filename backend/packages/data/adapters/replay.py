@@ -0,0 +1,284 @@
+"""
+Historical replay provider.
+
+Replays stored market data through the same ``stream_quotes()`` interface as
+the live providers, so the API, agent and WebSocket paths see
+production-shaped load and can be driven as a backtest.
+
+Sources (``source`` argument / ``REPLAY_SOURCE``):
+
+- ``db:ohlcv`` or ``db:quotes`` — rows streamed from the database with a
+  server-side cursor.
+- ``*.csv`` paths or globs — memory-mapped and parsed line by line.  Needs a
+  header with ``timestamp`` and ``price`` or ``close``; ``symbol`` defaults to
+  the file name up to its first ``_`` (``AAPL_1min.csv`` is ``AAPL``),
+  ``open``/``high``/``low``/``volume`` are optional.
+- ``*.parquet`` paths or globs — read in record batches via pyarrow (optional
+  dependency) with memory mapping.
+
+Each file must be sorted by timestamp; several files are merged into one
+timestamp-ordered stream across symbols.  ``speed`` is the replay rate
+relative to the recorded clock: ``1`` is real time, ``60`` is a minute per
+second and ``0`` replays as fast as consumers allow.  Pair it with
+``PROVIDER_BACKPRESSURE=block`` when every recorded row must be delivered.
+``REPLAY_SYMBOLS``, ``REPLAY_START`` and ``REPLAY_END`` narrow any source to
+some symbols and a time range.
+"""
+
+import asyncio
+import contextlib
+import csv
+import glob
+import heapq
+import io
+import logging
+import mmap
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+from packages.data.provider import BaseAsyncProvider
+from packages.shared.schemas import Tick
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_ROWS = 5_000
+# Don't bother sleeping for less than this; publish the batch instead.
+_MIN_SLEEP = 0.001
+
+
+def _parse_timestamp(raw) -> datetime:
+    if isinstance(raw, datetime):
+        ts = raw
+    else:
+        text = str(raw).strip()
+        try:
+            ts = datetime.fromtimestamp(float(text), tz=timezone.utc)
+        except ValueError:
+            ts = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _file_symbol(path: str | Path) -> str | None:
+    """Symbol implied by a file name: its stem up to the first ``_``."""
+    symbol = Path(path).stem.split("_", 1)[0].strip().upper()
+    return symbol if 1 <= len(symbol) <= 10 else None
+
+
+def _row_to_tick(row: dict, default_symbol: str | None = None) -> Tick:
+    symbol = row.get("symbol") or default_symbol
+    if not symbol:
+        raise ValueError("Replay row has no symbol column and the file name names no symbol")
+    close = row.get("close")
+    price = float(close if close not in (None, "") else row["price"])
+
+    def opt(key: str) -> float | None:
+        value = row.get(key)
+        return float(value) if value not in (None, "") else None
+
+    volume = row.get("volume")
+    return Tick(
+        symbol=symbol.strip().upper(),
+        price=price,
+        volume=int(float(volume)) if volume not in (None, "") else 0,
+        timestamp=_parse_timestamp(row["timestamp"]),
+        open=opt("open"),
+        high=opt("high"),
+        low=opt("low"),
+        close=opt("close"),
+    )
+
+
+# --------------------------------------------------------------------------- #
+#  File readers (synchronous; run off the event loop in chunks)
+# --------------------------------------------------------------------------- #
+
+def iter_csv(path: str | Path) -> Iterator[Tick]:
+    """Yield quotes from a CSV file through a read-only memory map."""
+    symbol = _file_symbol(path)
+    with open(path, "rb") as fh:
+        if fh.seek(0, io.SEEK_END) == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lines = (line.decode("utf-8") for line in iter(mm.readline, b""))
+            for row in csv.DictReader(lines):
+                yield _row_to_tick(row, symbol)
+
+
+def iter_parquet(path: str | Path) -> Iterator[Tick]:
+    """Yield quotes from a Parquet file one record batch at a time."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("Parquet replay requires pyarrow (pip install pyarrow)") from exc
+
+    symbol = _file_symbol(path)
+    parquet = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet.iter_batches(batch_size=_CHUNK_ROWS):
+        for row in batch.to_pylist():
+            yield _row_to_tick(row, symbol)
+
+
+def iter_files(paths: Iterable[str | Path]) -> Iterator[Tick]:
+    """Merge per-file, timestamp-sorted streams into one ordered stream."""
+    streams = []
+    for p in paths:
+        suffix = Path(p).suffix.lower()
+        if suffix == ".csv":
+            streams.append(iter_csv(p))
+        elif suffix in (".parquet", ".pq"):
+            streams.append(iter_parquet(p))
+        else:
+            raise ValueError(f"Unsupported replay file type: {p}")
+    return heapq.merge(*streams, key=lambda q: q.timestamp)
+
+
+# --------------------------------------------------------------------------- #
+#  Provider
+# --------------------------------------------------------------------------- #
+
+class ReplayDataProvider(BaseAsyncProvider):
+    """Replays recorded bars/ticks in timestamp order at a chosen speed."""
+
+    name = "replay"
+
+    def __init__(
+        self,
+        source: str,
+        symbols: Iterable[str] | None = None,
+        speed: float = 1.0,
+        loop: bool = False,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        **queue_options,
+    ) -> None:
+        super().__init__(**queue_options)
+        if not source:
+            raise ValueError("Replay source is required (db:ohlcv, db:quotes or file paths)")
+        self._source = source.strip()
+        self._symbols: set[str] = {s.upper() for s in (symbols or [])}
+        self._speed = max(speed, 0.0)
+        self._loop = loop
+        # naive bounds (e.g. REPLAY_START without an offset) are taken as UTC
+        self._start = _parse_timestamp(start) if start is not None else None
+        self._end = _parse_timestamp(end) if end is not None else None
+        self._task: asyncio.Task[None] | None = None
+        self.ticks_emitted = 0
+        self.finished = asyncio.Event()
+
+    async def start(self) -> None:
+        await super().start()
+        if self._task is None:
+            self.finished.clear()
+            self._task = asyncio.create_task(self._run())
+        logger.info("ReplayDataProvider started — %s at %sx", self._source, self._speed or "max")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await super().stop()
+
+    async def subscribe(self, symbol: str, channel: str) -> None:
+        # Replay is bounded by what was recorded; subscriptions only narrow
+        # the stream when a symbol filter was configured up front.
+        if self._symbols:
+            self._symbols.add(symbol.upper())
+
+    # ── sources ────────────────────────────────────────────────
+
+    def _paths(self) -> list[str]:
+        paths: list[str] = []
+        for part in self._source.split(","):
+            matches = sorted(glob.glob(part.strip()))
+            paths.extend(matches or [part.strip()])
+        return paths
+
+    async def _file_chunks(self) -> AsyncIterator[list[Tick]]:
+        merged = iter_files(self._paths())
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(islice(merged, _CHUNK_ROWS)))
+            if not chunk:
+                return
+            yield chunk
+
+    async def _db_chunks(self, table: str) -> AsyncIterator[list[Tick]]:
+        from sqlalchemy import select
+
+        from packages.db.engine import get_session_ctx
+        from packages.db.models import OHLCVDB, QuoteDB
+
+        model = {"ohlcv": OHLCVDB, "quotes": QuoteDB}.get(table)
+        if model is None:
+            raise ValueError(f"Unsupported replay table: {table!r}")
+        stmt = select(model)
+        if self._symbols:
+            stmt = stmt.where(model.symbol.in_(sorted(self._symbols)))
+        if self._start is not None:
+            stmt = stmt.where(model.timestamp >= self._start)
+        if self._end is not None:
+            stmt = stmt.where(model.timestamp <= self._end)
+        stmt = stmt.order_by(model.timestamp, model.id).execution_options(yield_per=_CHUNK_ROWS)
+
+        async with get_session_ctx() as session:
+            result = await session.stream_scalars(stmt)
+            async for rows in result.partitions():
+                yield [_row_to_tick(r.model_dump()) for r in rows]
+
+    def _chunks(self) -> AsyncIterator[list[Tick]]:
+        if self._source.startswith("db:"):
+            return self._db_chunks(self._source[3:])
+        return self._file_chunks()
+
+    def _keep(self, quote: Tick) -> bool:
+        if self._symbols and quote.symbol not in self._symbols:
+            return False
+        if self._start is not None and quote.timestamp < self._start:
+            return False
+        if self._end is not None and quote.timestamp > self._end:
+            return False
+        return True
+
+    # ── pacing ─────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._replay_once(loop)
+                if not self._loop:
+                    break
+        except Exception:
+            logger.exception("Replay of %s failed", self._source)
+        finally:
+            self.finished.set()
+
+    async def _replay_once(self, loop: asyncio.AbstractEventLoop) -> None:
+        wall_start: float | None = None
+        data_start: datetime | None = None
+        batch: list[Tick] = []
+
+        async for chunk in self._chunks():
+            for quote in chunk:
+                if not self._keep(quote):
+                    continue
+                if self._speed > 0:
+                    if data_start is None:
+                        wall_start, data_start = loop.time(), quote.timestamp
+                    due = wall_start + (quote.timestamp - data_start).total_seconds() / self._speed
+                    wait = due - loop.time()
+                    if wait > _MIN_SLEEP:
+                        await self._flush(batch)
+                        batch = []
+                        await asyncio.sleep(wait)
+                batch.append(quote)
+            await self._flush(batch)
+            batch = []
+
+    async def _flush(self, batch: list[Tick]) -> None:
+        if batch:
+            await self._publish_many(batch)
+            self.ticks_emitted += len(batch)
@@ -0,0 +1,224 @@
+"""
+Synthetic high-rate market for load tests.
+
+Generates correlated geometric Brownian motion with Merton-style jumps for
+thousands of symbols at once with NumPy, and paces emission to a target tick
+rate so the feature, inference and WebSocket fan-out paths can be stressed on
+a single machine.  Price paths are fully determined by the seed.
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+from collections.abc import Iterable
+from datetime import datetime, timezone
+
+import numpy as np
+
+from packages.data.provider import BaseAsyncProvider
+from packages.shared.schemas import Tick
+
+logger = logging.getLogger(__name__)
+
+# One simulated step is one second of a 6.5h, 252-day trading year.
+_STEP_YEARS = 1.0 / (252 * 6.5 * 3600)
+# Never try to catch up more than this much backlog after a stall.
+_MAX_BACKLOG_SECONDS = 1.0
+
+
+def synthetic_symbols(count: int, prefix: str = "S") -> list[str]:
+    """Deterministic alphabetic tickers: SAAAA, SAAAB, ... (valid ``Symbol`` values)."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    width = max(1, math.ceil(math.log(max(count, 2), 26)))
+    names = []
+    for i in range(count):
+        chars = []
+        for _ in range(width):
+            i, r = divmod(i, 26)
+            chars.append(letters[r])
+        names.append(prefix + "".join(reversed(chars)))
+    return names
+
+
+class SyntheticMarket:
+    """Vectorised price paths for many symbols.
+
+    Log returns follow a one-factor model — every symbol loads ``correlation``
+    on a shared market shock — plus compound-Poisson jumps.  Each call to
+    :meth:`step` advances all symbols and returns ``(steps, n_symbols)`` arrays.
+    """
+
+    def __init__(
+        self,
+        n_symbols: int,
+        seed: int = 42,
+        drift: float = 0.05,
+        volatility: float = 0.25,
+        correlation: float = 0.3,
+        jump_intensity: float = 25.0,
+        jump_mean: float = 0.0,
+        jump_std: float = 0.02,
+        base_volume: float = 5_000.0,
+    ) -> None:
+        if not 0.0 <= correlation < 1.0:
+            raise ValueError("correlation must be in [0, 1)")
+        self._rng = np.random.default_rng(seed)
+        self._drift = drift
+        self._base_vol = volatility
+        self._rho = correlation
+        self._jump_rate = jump_intensity * _STEP_YEARS
+        self._jump_mean = jump_mean
+        self._jump_std = jump_std
+        self._base_volume = base_volume
+        self._close = np.empty(0)
+        self._sigma = np.empty(0)
+        self.extend(n_symbols)
+
+    @property
+    def n_symbols(self) -> int:
+        return self._close.size
+
+    def extend(self, count: int) -> None:
+        """Add ``count`` symbols with fresh starting prices and volatilities."""
+        start = self._rng.uniform(20.0, 500.0, count)
+        sigma = self._base_vol * self._rng.lognormal(0.0, 0.3, count)
+        self._close = np.concatenate([self._close, start])
+        self._sigma = np.concatenate([self._sigma, sigma])
+
+    def step(self, steps: int = 1) -> dict[str, np.ndarray]:
+        n = self.n_symbols
+        rng = self._rng
+        dt = _STEP_YEARS
+        sd = self._sigma * math.sqrt(dt)
+
+        market = rng.standard_normal((steps, 1))
+        idio = rng.standard_normal((steps, n))
+        shock = math.sqrt(self._rho) * market + math.sqrt(1.0 - self._rho) * idio
+        log_ret = (self._drift - 0.5 * self._sigma**2) * dt + sd * shock
+
+        jumps = rng.poisson(self._jump_rate, (steps, n))
+        if jumps.any():
+            log_ret += jumps * self._jump_mean + np.sqrt(jumps) * self._jump_std * (
+                rng.standard_normal((steps, n))
+            )
+
+        log_close = np.log(self._close) + np.cumsum(log_ret, axis=0)
+        close = np.exp(log_close)
+        open_ = np.vstack([self._close[None, :], close[:-1]])
+        wick = np.abs(rng.standard_normal((2, steps, n))) * sd * 0.5
+        high = np.maximum(open_, close) * np.exp(wick[0])
+        low = np.minimum(open_, close) * np.exp(-wick[1])
+        volume = rng.lognormal(math.log(self._base_volume), 0.5, (steps, n)).astype(np.int64)
+
+        self._close = close[-1].copy()
+        return {"open": open_, "high": high, "low": low, "close": close, "volume": volume}
+
+
+class SyntheticDataProvider(BaseAsyncProvider):
+    """Streams OHLCV-rich quotes from :class:`SyntheticMarket` at a target rate."""
+
+    name = "synthetic"
+
+    def __init__(
+        self,
+        symbols: Iterable[str] | None = None,
+        n_symbols: int = 1_000,
+        tick_rate: float = 50_000.0,
+        seed: int = 42,
+        batch_interval: float = 0.02,
+        **queue_options,
+    ) -> None:
+        super().__init__(**queue_options)
+        named = [s.upper() for s in (symbols or [])]
+        extra = max(n_symbols - len(named), 0)
+        self._symbols: list[str] = named + [
+            s for s in synthetic_symbols(extra + len(named)) if s not in named
+        ][:extra]
+        self._index = {s: i for i, s in enumerate(self._symbols)}
+        self._market = SyntheticMarket(len(self._symbols), seed=seed)
+        self._tick_rate = max(tick_rate, 1.0)
+        self._batch_interval = batch_interval
+        self._task: asyncio.Task[None] | None = None
+        self._carry: dict[str, np.ndarray] | None = None
+        self._carry_pos = 0
+        self.ticks_emitted = 0
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    async def start(self) -> None:
+        await super().start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        logger.info(
+            "SyntheticDataProvider started — %d symbols at %.0f ticks/s",
+            len(self._symbols), self._tick_rate,
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await super().stop()
+
+    async def subscribe(self, symbol: str, channel: str) -> None:
+        normalized = symbol.upper()
+        if normalized not in self._index:
+            self._index[normalized] = len(self._symbols)
+            self._symbols.append(normalized)
+            self._market.extend(1)
+            # steps already generated don't cover the new symbol
+            self._carry = None
+
+    def take(self, count: int) -> list[Tick]:
+        """Generate the next ``count`` ticks, cycling through every symbol per step."""
+        now = datetime.now(timezone.utc)
+        quotes: list[Tick] = []
+        while count > 0:
+            if self._carry is None or self._carry_pos >= self._carry["symbol"].size:
+                n = self._market.n_symbols
+                bars = self._market.step(max(1, math.ceil(count / n)))
+                steps = bars["close"].shape[0]
+                self._carry = {k: v.ravel() for k, v in bars.items()}
+                self._carry["symbol"] = np.tile(np.arange(n), steps)
+                self._carry_pos = 0
+
+            lo = self._carry_pos
+            hi = min(lo + count, self._carry["symbol"].size)
+            cols = {
+                k: (v[lo:hi] if k in ("symbol", "volume") else v[lo:hi].round(4)).tolist()
+                for k, v in self._carry.items()
+            }
+            names = self._symbols
+            quotes.extend(
+                Tick(names[sym], c, vol, now, o, h, lo_, c)
+                for sym, o, h, lo_, c, vol in zip(
+                    cols["symbol"], cols["open"], cols["high"],
+                    cols["low"], cols["close"], cols["volume"],
+                )
+            )
+            self._carry_pos = hi
+            count -= hi - lo
+        return quotes
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        target_emitted = 0.0
+        while True:
+            now = loop.time()
+            due = (now - start) * self._tick_rate - target_emitted
+            backlog = self._tick_rate * _MAX_BACKLOG_SECONDS
+            if due > backlog:
+                target_emitted += due - backlog
+                due = backlog
+            count = int(due)
+            if count > 0:
+                await self._publish_many(self.take(count))
+                target_emitted += count
+                self.ticks_emitted += count
+            await asyncio.sleep(self._batch_interval)
@@ -4,24 +4,40 @@ Twelve Data market-data adapter.
 Polls the Twelve Data REST API for real-time price quotes and feeds
 them into the internal Quote stream that the WebSocket and agent consume.
 
+Polling is paced by the plan's per-minute credit budget (1 credit per symbol
+on /price): each request carries a small rotating batch of the stalest
+symbols, symbols with recent subscribers are refreshed more often, and a 429
+halves the budget and pauses for ``Retry-After`` before recovering.
+
 Docs: https://twelvedata.com/docs
 """
 
 import asyncio
 import contextlib
 import logging
-from collections.abc import AsyncIterator, Iterable
+from collections.abc import Iterable
 from datetime import datetime, timezone
 from typing import Any
 
 import httpx
 
 from packages.data.provider import BaseAsyncProvider
-from packages.shared.schemas import Quote
+from packages.data.scheduling import (
+    CreditBudget,
+    PollScheduler,
+    RateLimited,
+    raise_for_rate_limit,
+)
+from packages.shared.schemas import Tick
 
 logger = logging.getLogger(__name__)
 
 _BASE_URL = "https://api.twelvedata.com"
+# Documented upper bound on symbols per batched /price request.
+_MAX_BATCH = 120
+# Pause after a network error, doubled per consecutive failure up to the cap.
+_ERROR_BACKOFF = 1.0
+_ERROR_BACKOFF_MAX = 60.0
 
 
 class TwelveDataProvider(BaseAsyncProvider):
@@ -33,27 +49,44 @@ class TwelveDataProvider(BaseAsyncProvider):
         self,
         api_key: str,
         symbols: Iterable[str] | None = None,
-        interval: float = 5.0,
+        interval: float = 0.0,
+        credits_per_minute: float = 8.0,
+        max_batch: int = 8,
+        base_url: str = _BASE_URL,
+        transport: httpx.AsyncBaseTransport | None = None,
+        **queue_options,
     ) -> None:
-        super().__init__()
+        super().__init__(**queue_options)
         if not api_key:
             raise ValueError("Twelve Data API key is required")
         self._api_key = api_key
-        self._symbols: set[str] = {s.upper() for s in (symbols or ["AAPL"])}
-        self._interval = max(interval, 60.0)  # free tier: 8 credits/min, 1 credit per symbol
-        self._queue: asyncio.Queue[Quote] = asyncio.Queue()
+        self._base_url = base_url.rstrip("/")
+        self._transport = transport
+        # interval: minimum seconds between refreshes of one symbol (0 = budget-bound)
+        self._scheduler = PollScheduler(
+            symbols or ["AAPL"],
+            max_batch=min(max(max_batch, 1), _MAX_BATCH),
+            min_interval=interval,
+        )
+        self._budget = CreditBudget(credits_per_minute)
         self._task: asyncio.Task[None] | None = None
         self._client: httpx.AsyncClient | None = None
 
+    @property
+    def budget(self) -> CreditBudget:
+        return self._budget
+
     # ── lifecycle ──────────────────────────────────────────────
 
     async def start(self) -> None:
         await super().start()
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0))
+        self._ensure_client()
         if self._task is None:
             self._task = asyncio.create_task(self._run())
-        logger.info("TwelveDataProvider started for %s", self._symbols)
+        logger.info(
+            "TwelveDataProvider started for %s (%.0f credits/min)",
+            self._scheduler.symbols, self._budget.rate,
+        )
 
     async def stop(self) -> None:
         if self._task:
@@ -67,101 +100,87 @@ class TwelveDataProvider(BaseAsyncProvider):
         await super().stop()
 
     async def subscribe(self, symbol: str, channel: str) -> None:
-        self._symbols.add(symbol.upper())
+        # A subscription both adds the symbol and marks it as actively watched.
+        self._scheduler.touch(symbol)
 
     def _ensure_client(self) -> httpx.AsyncClient:
         """Lazily create the httpx client if it doesn't exist yet."""
         if self._client is None:
-            self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0))
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                transport=self._transport,
+            )
         return self._client
 
-    def stream_quotes(self) -> AsyncIterator[Quote]:
-        async def iterator() -> AsyncIterator[Quote]:
-            while True:
-                quote = await self._queue.get()
-                yield quote
-
-        return iterator()
-
     # ── internal polling loop ─────────────────────────────────
 
     async def _run(self) -> None:
-        client = self._ensure_client()
-        cooldown_until = 0.0
+        failures = 0
         try:
             while True:
-                now = asyncio.get_event_loop().time()
-                if now < cooldown_until:
-                    await asyncio.sleep(cooldown_until - now)
-                    continue
-
-                if not self._symbols:
-                    await asyncio.sleep(self._interval)
+                size = self._scheduler.batch_size(self._budget.rate)
+                batch = self._scheduler.next_batch(size)
+                if not batch:
+                    await asyncio.sleep(max(self._scheduler.seconds_until_due(), 0.05))
                     continue
 
-                # Twelve Data allows a comma-separated batch in /price
-                batch = ",".join(sorted(self._symbols))
+                await self._budget.acquire(len(batch))
                 try:
-                    quotes = await self._fetch_prices(batch)
-                    for q in quotes:
-                        await self._queue.put(q)
+                    quotes = await self._fetch_prices(",".join(batch))
+                    self._scheduler.mark_polled(batch)
+                    self._budget.reward()
+                    failures = 0
+                    await self._publish_many(quotes)
+                except RateLimited as exc:
+                    self._budget.penalize(exc.retry_after)
+                    logger.warning(
+                        "Twelve Data rate limit hit; backing off to %.1f credits/min",
+                        self._budget.rate,
+                    )
                 except httpx.HTTPStatusError as exc:
-                    status_code = exc.response.status_code
-                    logger.warning("Twelve Data HTTP %s", status_code)
-                    if status_code == 429:
-                        retry_after = exc.response.headers.get("Retry-After")
-                        wait = float(retry_after) if retry_after else 60.0
-                        cooldown_until = asyncio.get_event_loop().time() + wait
-                except httpx.HTTPError as exc:
-                    logger.debug("Twelve Data HTTP error: %s", exc)
+                    logger.warning("Twelve Data HTTP %s", exc.response.status_code)
+                    self._scheduler.mark_polled(batch)
+                except httpx.HTTPError as exc:  # unreachable: back off instead of spinning
+                    self._scheduler.mark_polled(batch)
+                    failures += 1
+                    delay = min(_ERROR_BACKOFF * 2 ** (failures - 1), _ERROR_BACKOFF_MAX)
+                    logger.warning("Twelve Data request failed (%s); retrying in %.0fs", exc, delay)
+                    await asyncio.sleep(delay)
                 except Exception as exc:
                     logger.debug("Twelve Data fetch failed: %s", exc)
-
-                await asyncio.sleep(self._interval)
+                    self._scheduler.mark_polled(batch)
         except asyncio.CancelledError:
             return
 
     # ── REST helpers ──────────────────────────────────────────
 
-    async def _fetch_prices(self, symbols_csv: str) -> list[Quote]:
+    async def _fetch_prices(self, symbols_csv: str) -> list[Tick]:
         """
         GET /price?symbol=AAPL,MSFT&apikey=xxx
         Single symbol → {"price":"150.42"}
         Multiple symbols → {"AAPL":{"price":"150.42"}, "MSFT":{"price":"310.11"}}
         """
         client = self._ensure_client()
-        url = f"{_BASE_URL}/price"
+        url = f"{self._base_url}/price"
         resp = await client.get(url, params={"symbol": symbols_csv, "apikey": self._api_key})
+        raise_for_rate_limit(resp)
         resp.raise_for_status()
         data = resp.json()
+        raise_for_rate_limit(resp, data)
 
-        results: list[Quote] = []
+        results: list[Tick] = []
         now = datetime.now(timezone.utc)
 
         if "price" in data:
             # Single symbol response
             symbol = symbols_csv.split(",")[0]
-            results.append(
-                Quote(
-                    symbol=symbol,
-                    price=float(data["price"]),
-                    volume=0,
-                    timestamp=now,
-                )
-            )
+            results.append(Tick(symbol.strip().upper(), float(data["price"]), 0, now))
         else:
             # Multi-symbol response
             for sym, payload in data.items():
                 if not isinstance(payload, dict) or "price" not in payload:
                     continue
-                results.append(
-                    Quote(
-                        symbol=sym.upper(),
-                        price=float(payload["price"]),
-                        volume=0,
-                        timestamp=now,
-                    )
-                )
+                results.append(Tick(sym.upper(), float(payload["price"]), 0, now))
 
         return results
 
@@ -172,7 +191,7 @@ class TwelveDataProvider(BaseAsyncProvider):
         Used by the /api/quote REST endpoint.
         """
         client = self._ensure_client()
-        url = f"{_BASE_URL}/quote"
+        url = f"{self._base_url}/quote"
         resp = await client.get(url, params={"symbol": symbol.upper(), "apikey": self._api_key})
         resp.raise_for_status()
         return resp.json()
@@ -189,7 +208,7 @@ class TwelveDataProvider(BaseAsyncProvider):
         Returns list of all available stock symbols.
         """
         client = self._ensure_client()
-        url = f"{_BASE_URL}/stocks"
+        url = f"{self._base_url}/stocks"
         params: dict[str, str] = {"apikey": self._api_key}
         if symbol:
             params["symbol"] = symbol.upper()
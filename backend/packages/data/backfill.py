@@ -0,0 +1,330 @@
+"""
+Historical OHLCV backfill from Twelve Data.
+
+Splits each ``(symbol, start, end)`` request into windows of roughly one
+``time_series`` page, fetches windows concurrently over a shared
+``httpx.AsyncClient`` (bounded by a semaphore and by the plan's credit
+budget) and writes every page into ``ohlcv`` as it arrives.  A window that
+fails cancels the others.  Progress is
+checkpointed per window to a JSON file after each committed page, so an
+interrupted run resumes where it stopped.  Each page replaces its own time
+range, which keeps re-runs idempotent.
+
+Usage::
+
+    python -m packages.data.backfill AAPL MSFT --start 2024-01-01 --end 2024-03-01 \\
+        --interval 1min --checkpoint backfill.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from packages.data.scheduling import CreditBudget, RateLimited, raise_for_rate_limit
+
+logger = logging.getLogger(__name__)
+
+_BASE_URL = "https://api.twelvedata.com"
+# Largest page the time_series endpoint returns.
+_MAX_OUTPUTSIZE = 5_000
+_MAX_RETRIES = 5
+
+_INTERVALS = {
+    "1min": timedelta(minutes=1),
+    "5min": timedelta(minutes=5),
+    "15min": timedelta(minutes=15),
+    "30min": timedelta(minutes=30),
+    "45min": timedelta(minutes=45),
+    "1h": timedelta(hours=1),
+    "2h": timedelta(hours=2),
+    "4h": timedelta(hours=4),
+    "1day": timedelta(days=1),
+    "1week": timedelta(weeks=1),
+}
+
+
+def _fmt(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse(text: str) -> datetime:
+    ts = datetime.fromisoformat(text)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class BackfillWindow:
+    """One independently fetchable slice of a backfill request."""
+
+    symbol: str
+    interval: str
+    start: datetime
+    end: datetime
+
+    @property
+    def key(self) -> str:
+        return f"{self.symbol}:{self.interval}:{self.start.isoformat()}:{self.end.isoformat()}"
+
+
+def plan_windows(
+    symbol: str,
+    start: datetime,
+    end: datetime,
+    interval: str = "1min",
+    outputsize: int = _MAX_OUTPUTSIZE,
+) -> list[BackfillWindow]:
+    """Cut ``[start, end]`` into windows of at most ``outputsize`` bars each."""
+    if interval not in _INTERVALS:
+        raise ValueError(f"Unsupported interval {interval!r}")
+    step = _INTERVALS[interval]
+    span = step * outputsize
+    windows = []
+    cursor = start
+    while cursor <= end:
+        upper = min(cursor + span - step, end)
+        windows.append(BackfillWindow(symbol.upper(), interval, cursor, upper))
+        cursor = upper + step
+    return windows
+
+
+class BackfillCheckpoint:
+    """Per-window progress persisted as JSON (``{key: {"cursor", "done", "rows"}}``)."""
+
+    def __init__(self, path: str | Path | None) -> None:
+        self._path = Path(path) if path else None
+        self._state: dict[str, dict[str, Any]] = {}
+        if self._path is not None and self._path.exists():
+            self._state = json.loads(self._path.read_text())
+
+    def get(self, window: BackfillWindow) -> dict[str, Any]:
+        return self._state.get(window.key, {})
+
+    def update(self, window: BackfillWindow, **fields: Any) -> None:
+        self._state.setdefault(window.key, {}).update(fields)
+        self._save()
+
+    def _save(self) -> None:
+        if self._path is None:
+            return
+        tmp = self._path.with_suffix(self._path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._state, indent=1, sort_keys=True))
+        os.replace(tmp, self._path)
+
+
+class TwelveDataBackfill:
+    """Concurrent, throttled, resumable ``time_series`` → ``ohlcv`` loader."""
+
+    def __init__(
+        self,
+        api_key: str,
+        concurrency: int = 4,
+        credits_per_minute: float = 8.0,
+        outputsize: int = _MAX_OUTPUTSIZE,
+        checkpoint: str | Path | None = None,
+        base_url: str = _BASE_URL,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        if not api_key:
+            raise ValueError("Twelve Data API key is required")
+        self._api_key = api_key
+        self._concurrency = max(1, concurrency)
+        self._outputsize = min(max(outputsize, 1), _MAX_OUTPUTSIZE)
+        self._budget = CreditBudget(credits_per_minute)
+        self._checkpoint = BackfillCheckpoint(checkpoint)
+        self._base_url = base_url.rstrip("/")
+        self._transport = transport
+        self.rows_written = 0
+
+    async def run(
+        self,
+        symbols: Iterable[str],
+        start: datetime,
+        end: datetime,
+        interval: str = "1min",
+    ) -> int:
+        """Backfill every symbol over ``[start, end]``; returns rows written."""
+        windows = [
+            w
+            for symbol in symbols
+            for w in plan_windows(symbol, start, end, interval, self._outputsize)
+        ]
+        pending = [w for w in windows if not self._checkpoint.get(w).get("done")]
+        logger.info(
+            "Backfill: %d windows (%d already done), concurrency %d",
+            len(windows), len(windows) - len(pending), self._concurrency,
+        )
+        semaphore = asyncio.Semaphore(self._concurrency)
+        limits = httpx.Limits(max_connections=self._concurrency)
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=limits,
+            transport=self._transport,
+        ) as client:
+
+            async def bounded(window: BackfillWindow) -> None:
+                async with semaphore:
+                    await self._fill_window(client, window)
+
+            # the first failing window cancels the rest; finished pages stay checkpointed
+            tasks = [asyncio.create_task(bounded(w)) for w in pending]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        return self.rows_written
+
+    # ── per-window paging ─────────────────────────────────────
+
+    async def _fill_window(self, client: httpx.AsyncClient, window: BackfillWindow) -> None:
+        """Page backwards from the window's end (time_series returns newest first)."""
+        state = self._checkpoint.get(window)
+        cursor = _parse(state["cursor"]) if "cursor" in state else window.end
+        rows = state.get("rows", 0)
+        step = _INTERVALS[window.interval]
+
+        while cursor >= window.start:
+            candles = await self._fetch_page(client, window, cursor)
+            if not candles:
+                break
+            oldest = candles[-1]["timestamp"]
+            await self._store(window.symbol, oldest, cursor, candles)
+            rows += len(candles)
+            cursor = oldest - step
+            self._checkpoint.update(window, cursor=cursor.isoformat(), rows=rows)
+            if len(candles) < self._outputsize:
+                break
+
+        self._checkpoint.update(window, done=True, rows=rows)
+        logger.debug("Backfilled %s: %d rows", window.key, rows)
+
+    async def _fetch_page(
+        self,
+        client: httpx.AsyncClient,
+        window: BackfillWindow,
+        end: datetime,
+    ) -> list[dict]:
+        params = {
+            "symbol": window.symbol,
+            "interval": window.interval,
+            "start_date": _fmt(window.start),
+            "end_date": _fmt(end),
+            "outputsize": str(self._outputsize),
+            "timezone": "UTC",
+            "order": "desc",
+            "apikey": self._api_key,
+        }
+        # Rate limiting is waited out on the credit budget and does not use up
+        # attempts; only transport errors and 5xx responses count.
+        attempt = 0
+        while attempt < _MAX_RETRIES:
+            await self._budget.acquire(1)
+            try:
+                resp = await client.get(f"{self._base_url}/time_series", params=params)
+                raise_for_rate_limit(resp)
+                resp.raise_for_status()
+                data = resp.json()
+                raise_for_rate_limit(resp, data)
+            except RateLimited as exc:
+                self._budget.penalize(exc.retry_after)
+                logger.warning("Backfill rate limited on %s; backing off", window.symbol)
+                continue
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500:
+                    raise
+                logger.warning("Backfill request failed for %s: %s", window.symbol, exc)
+                await asyncio.sleep(2**attempt)
+                attempt += 1
+                continue
+
+            if data.get("status") == "error":
+                # "No data is available" marks an empty (e.g. market-closed) range;
+                # any other 400 (bad symbol, bad interval, ...) is a real error.
+                if data.get("code") == 400 and "no data is available" in str(
+                    data.get("message", "")
+                ).lower():
+                    return []
+                raise RuntimeError(f"Twelve Data error for {window.symbol}: {data.get('message')}")
+            return [self._to_candle(window.symbol, v) for v in data.get("values", [])]
+        raise RuntimeError(f"Giving up on {window.key} after {_MAX_RETRIES} attempts")
+
+    @staticmethod
+    def _to_candle(symbol: str, value: dict) -> dict:
+        return {
+            "symbol": symbol,
+            "open": float(value["open"]),
+            "high": float(value["high"]),
+            "low": float(value["low"]),
+            "close": float(value["close"]),
+            "volume": int(float(value.get("volume") or 0)),
+            "timestamp": _parse(value["datetime"]),
+        }
+
+    async def _store(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        candles: list[dict],
+    ) -> None:
+        from packages.db.engine import get_session_ctx
+        from packages.db.repositories import OHLCVRepository
+
+        async with get_session_ctx() as session:
+            await OHLCVRepository(session).replace_range(symbol, start, end, candles)
+        self.rows_written += len(candles)
+
+
+# --------------------------------------------------------------------------- #
+#  CLI
+# --------------------------------------------------------------------------- #
+
+async def _main(args: argparse.Namespace) -> None:
+    from packages.db.engine import close_db, init_db
+    from packages.shared.config import get_settings
+
+    settings = get_settings()
+    await init_db()
+    try:
+        backfill = TwelveDataBackfill(
+            api_key=settings.twelvedata_api_key,
+            concurrency=args.concurrency,
+            credits_per_minute=args.credits or settings.twelvedata_credits_per_minute,
+            checkpoint=args.checkpoint,
+            base_url=settings.twelvedata_base_url,
+        )
+        rows = await backfill.run(args.symbols, _parse(args.start), _parse(args.end), args.interval)
+        logger.info("Backfill complete: %d rows", rows)
+    finally:
+        await close_db()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill ohlcv from Twelve Data time_series")
+    parser.add_argument("symbols", nargs="+", type=str.upper)
+    parser.add_argument("--start", required=True, help="ISO date/time (UTC)")
+    parser.add_argument("--end", required=True, help="ISO date/time (UTC)")
+    parser.add_argument("--interval", default="1min", choices=sorted(_INTERVALS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--credits", type=float, default=None, help="credits per minute")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
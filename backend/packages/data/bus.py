@@ -0,0 +1,231 @@
+"""
+Single-producer quote bus for multi-worker deployments.
+
+With several gunicorn/uvicorn workers every process would otherwise start its
+own provider, multiplying upstream polling and API credits by the worker
+count.  ``BusProvider`` wraps the real provider instead:
+
+- the worker that wins an exclusive ``flock`` on ``<path>.lock`` becomes the
+  leader: it runs the upstream provider, fans every batch out to the other
+  workers over a Unix domain socket (mode ``0600``) and then consumes it
+  locally.  Its own queue never blocks the fan-out: under ``BLOCK`` a full
+  local queue drops the overflow;
+- every other worker is a follower: it connects to the socket and republishes
+  the received ticks into its own queue, so ``stream_quotes()`` behaves the
+  same in every process.  ``subscribe()`` calls are forwarded to the leader.
+
+Frames are newline-delimited JSON arrays of :meth:`Tick.as_row` tuples, one
+per upstream batch.  A subscriber that falls behind has its oldest frames
+dropped rather than stalling the leader.  If the leader exits, its lock is
+released and the first follower to reconnect takes over.  POSIX only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import socket
+from collections.abc import Callable
+
+from packages.data.provider import BaseAsyncProvider
+from packages.shared.locks import LeaderLock
+from packages.shared.metrics import quote_bus_frame_dropped, quote_bus_subscribers
+from packages.shared.schemas import Tick
+
+logger = logging.getLogger(__name__)
+
+# Largest single frame a follower will accept (one upstream batch).
+_READ_LIMIT = 16 * 1024 * 1024
+
+
+def encode_frame(ticks: list[Tick]) -> bytes:
+    return json.dumps([t.as_row() for t in ticks], separators=(",", ":")).encode() + b"\n"
+
+
+def decode_frame(line: bytes) -> list[Tick]:
+    return [Tick.from_row(row) for row in json.loads(line)]
+
+
+class _Subscriber:
+    """Leader-side state for one follower connection."""
+
+    def __init__(self, writer: asyncio.StreamWriter, max_pending: int) -> None:
+        self.writer = writer
+        self._frames: asyncio.Queue[bytes] = asyncio.Queue(max_pending)
+
+    def send(self, frame: bytes) -> None:
+        if self._frames.full():
+            self._frames.get_nowait()
+            quote_bus_frame_dropped()
+        self._frames.put_nowait(frame)
+
+    async def pump(self) -> None:
+        while True:
+            frame = await self._frames.get()
+            self.writer.write(frame)
+            await self.writer.drain()
+
+
+class BusProvider(BaseAsyncProvider):
+    """Shares one upstream provider between worker processes."""
+
+    name = "bus"
+
+    def __init__(
+        self,
+        upstream_factory: Callable[[], BaseAsyncProvider],
+        path: str,
+        max_pending_frames: int = 1_024,
+        reconnect_delay: float = 0.5,
+        **queue_options,
+    ) -> None:
+        super().__init__(**queue_options)
+        self._factory = upstream_factory
+        self._path = path
+        self._lock = LeaderLock(f"{path}.lock")
+        self._max_pending = max_pending_frames
+        self._reconnect_delay = reconnect_delay
+        self._subscriptions: dict[str, str] = {}
+        self._subscribers: set[_Subscriber] = set()
+        self._upstream: BaseAsyncProvider | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.role = "stopped"
+
+    async def start(self) -> None:
+        await super().start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.role = "stopped"
+        await super().stop()
+
+    async def subscribe(self, symbol: str, channel: str) -> None:
+        symbol = symbol.upper()
+        # remembered so a reconnecting or promoted worker can replay them
+        self._subscriptions[symbol] = channel
+        if self._upstream is not None:
+            await self._upstream.subscribe(symbol, channel)
+        elif self._writer is not None:
+            self._send_control(symbol, channel)
+
+    def _send_control(self, symbol: str, channel: str) -> None:
+        assert self._writer is not None
+        message = {"subscribe": symbol, "channel": channel}
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    # ── role selection ────────────────────────────────────────
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                try:
+                    if self._lock.try_acquire():
+                        await self._lead()
+                    else:
+                        await self._follow()
+                except Exception:
+                    logger.exception("Quote bus %s failed; retrying", self.role)
+                    self._lock.release()  # let another worker take the lead
+                await asyncio.sleep(self._reconnect_delay)
+        finally:
+            self._lock.release()
+
+    # ── leader ────────────────────────────────────────────────
+
+    async def _lead(self) -> None:
+        upstream = self._factory()
+        await upstream.start()
+        for symbol, channel in self._subscriptions.items():
+            await upstream.subscribe(symbol, channel)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._path)  # stale socket from a crashed leader
+        server = await asyncio.start_unix_server(self._serve, sock=self._bind())
+        self._upstream = upstream
+        self.role = "leader"
+        logger.info("Quote bus leader (pid %d) serving %s", os.getpid(), self._path)
+        try:
+            async for batch in upstream.stream_batches():
+                # followers first, and never wait on this worker's own consumers:
+                # with no local reader a BLOCK queue would stall every follower
+                if self._subscribers:
+                    frame = encode_frame(batch)
+                    for subscriber in self._subscribers:
+                        subscriber.send(frame)
+                self._publish_many_nowait(batch)
+        finally:
+            self._upstream = None
+            server.close()
+            for subscriber in list(self._subscribers):
+                subscriber.writer.close()
+            await server.wait_closed()
+            await upstream.stop()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._path)
+            self._lock.release()
+
+    def _bind(self) -> socket.socket:
+        """Listening socket at ``path``, readable and writable by this user only."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self._path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        os.chmod(self._path, 0o600)
+        return sock
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscriber = _Subscriber(writer, self._max_pending)
+        self._subscribers.add(subscriber)
+        quote_bus_subscribers(len(self._subscribers))
+        pump = asyncio.create_task(subscriber.pump())
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if "subscribe" in message and self._upstream is not None:
+                    await self._upstream.subscribe(
+                        message["subscribe"], message.get("channel", "quotes")
+                    )
+        except (ConnectionError, ValueError) as exc:
+            logger.debug("Quote bus subscriber error: %s", exc)
+        finally:
+            self._subscribers.discard(subscriber)
+            quote_bus_subscribers(len(self._subscribers))
+            pump.cancel()
+            with contextlib.suppress(asyncio.CancelledError, ConnectionError):
+                await pump
+            writer.close()
+
+    # ── follower ──────────────────────────────────────────────
+
+    async def _follow(self) -> None:
+        try:
+            reader, writer = await asyncio.open_unix_connection(self._path, limit=_READ_LIMIT)
+        except OSError:
+            return  # no leader yet (or it just died); retry, possibly as leader
+        self._writer = writer
+        self.role = "follower"
+        logger.info("Quote bus follower (pid %d) attached to %s", os.getpid(), self._path)
+        try:
+            for symbol, channel in self._subscriptions.items():
+                self._send_control(symbol, channel)
+            while line := await reader.readline():
+                await self._publish_many(decode_frame(line))
+        except (ConnectionError, ValueError) as exc:
+            logger.debug("Quote bus connection lost: %s", exc)
+        finally:
+            self._writer = None
+            writer.close()
@@ -1,11 +1,12 @@
 import asyncio
 import warnings
-from abc import ABC, abstractmethod
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Callable
+from enum import Enum
 from typing import Protocol, cast
 
-from packages.shared.config import get_settings
-from packages.shared.schemas import Quote
+from packages.shared.config import Settings, get_settings
+from packages.shared.metrics import provider_queue_depth, provider_quote_dropped
+from packages.shared.schemas import Tick
 
 
 class DataProvider(Protocol):
@@ -17,14 +18,144 @@ class DataProvider(Protocol):
 
     async def subscribe(self, symbol: str, channel: str) -> None: ...
 
-    def stream_quotes(self) -> AsyncIterator[Quote]: ...
+    def stream_quotes(self) -> AsyncIterator[Tick]: ...
 
 
-class BaseAsyncProvider(ABC):
+class BackpressurePolicy(str, Enum):
+    """What a full provider queue does with the next quote."""
+
+    BLOCK = "block"              # producer waits for a consumer
+    DROP_OLDEST = "drop_oldest"  # evict the oldest buffered quote
+    CONFLATE = "conflate"        # keep only the latest quote per symbol
+
+
+class QuoteQueue:
+    """Bounded hand-off between a provider's producer task and its consumers.
+
+    Memory is capped at ``maxsize`` quotes whatever the consumer does.  Under
+    ``CONFLATE`` the buffer holds at most one pending quote per symbol (and at
+    most ``maxsize`` symbols): a newer quote replaces the pending one in place,
+    so consumers that fall behind skip straight to the latest price.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        policy: BackpressurePolicy | str = BackpressurePolicy.DROP_OLDEST,
+        provider: str = "base",
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("Quote queue maxsize must be >= 1")
+        self._maxsize = maxsize
+        self._policy = BackpressurePolicy(policy)
+        self._provider = provider
+        self._queue: asyncio.Queue[Tick] = asyncio.Queue(maxsize)
+        self._latest: dict[str, Tick] = {}
+        self._ready = asyncio.Event()
+
+    @property
+    def policy(self) -> BackpressurePolicy:
+        return self._policy
+
+    def qsize(self) -> int:
+        if self._policy is BackpressurePolicy.CONFLATE:
+            return len(self._latest)
+        return self._queue.qsize()
+
+    async def put(self, quote: Tick) -> None:
+        if self._policy is BackpressurePolicy.BLOCK:
+            await self._queue.put(quote)
+        elif self._policy is BackpressurePolicy.DROP_OLDEST:
+            while self._queue.full():
+                self._queue.get_nowait()
+                provider_quote_dropped(self._provider, self._policy.value)
+            self._queue.put_nowait(quote)
+        else:
+            self._put_conflated(quote)
+        provider_queue_depth(self._provider, self.qsize())
+
+    async def put_many(self, quotes: list[Tick]) -> None:
+        """Enqueue a batch; only ``BLOCK`` ever yields to the event loop."""
+        if self._policy is BackpressurePolicy.BLOCK:
+            for quote in quotes:
+                await self._queue.put(quote)
+            provider_queue_depth(self._provider, self.qsize())
+        else:
+            self.put_many_nowait(quotes)
+
+    def put_many_nowait(self, quotes: list[Tick]) -> None:
+        """Enqueue a batch without waiting; a full ``BLOCK`` queue drops the overflow."""
+        if self._policy is BackpressurePolicy.BLOCK:
+            room = self._maxsize - self._queue.qsize()
+            for quote in quotes[:room]:
+                self._queue.put_nowait(quote)
+            if len(quotes) > room:
+                provider_quote_dropped(self._provider, self._policy.value, len(quotes) - room)
+        elif self._policy is BackpressurePolicy.DROP_OLDEST:
+            queue = self._queue
+            # a batch larger than the whole queue keeps only its tail
+            dropped = max(len(quotes) - self._maxsize, 0)
+            if dropped:
+                quotes = quotes[-self._maxsize:]
+            while queue.qsize() + len(quotes) > self._maxsize:
+                queue.get_nowait()
+                dropped += 1
+            for quote in quotes:
+                queue.put_nowait(quote)
+            if dropped:
+                provider_quote_dropped(self._provider, self._policy.value, dropped)
+        else:
+            for quote in quotes:
+                self._put_conflated(quote)
+        provider_queue_depth(self._provider, self.qsize())
+
+    def _put_conflated(self, quote: Tick) -> None:
+        if quote.symbol in self._latest:
+            provider_quote_dropped(self._provider, self._policy.value)
+        elif len(self._latest) >= self._maxsize:
+            del self._latest[next(iter(self._latest))]
+            provider_quote_dropped(self._provider, self._policy.value)
+        # re-assigning an existing key keeps its place in line
+        self._latest[quote.symbol] = quote
+        self._ready.set()
+
+    async def get(self) -> Tick:
+        if self._policy is BackpressurePolicy.CONFLATE:
+            while not self._latest:
+                self._ready.clear()
+                await self._ready.wait()
+            quote = self._latest.pop(next(iter(self._latest)))
+        else:
+            quote = await self._queue.get()
+        provider_queue_depth(self._provider, self.qsize())
+        return quote
+
+    async def get_many(self, max_items: int) -> list[Tick]:
+        """Wait for one quote, then take whatever else is already buffered."""
+        quotes = [await self.get()]
+        if self._policy is BackpressurePolicy.CONFLATE:
+            while self._latest and len(quotes) < max_items:
+                quotes.append(self._latest.pop(next(iter(self._latest))))
+        else:
+            while not self._queue.empty() and len(quotes) < max_items:
+                quotes.append(self._queue.get_nowait())
+        provider_queue_depth(self._provider, self.qsize())
+        return quotes
+
+
+class BaseAsyncProvider:
+    """Shared queue and listener plumbing; subclasses feed it from a producer task."""
+
     name: str = "base"
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        queue_maxsize: int = 10_000,
+        backpressure: BackpressurePolicy | str = BackpressurePolicy.DROP_OLDEST,
+    ) -> None:
         self._started = asyncio.Event()
+        self._queue = QuoteQueue(queue_maxsize, backpressure, provider=self.name)
+        self._listeners: list[Callable[[list[Tick]], None]] = []
 
     async def start(self) -> None:
         self._started.set()
@@ -35,9 +166,50 @@ class BaseAsyncProvider(ABC):
     async def subscribe(self, symbol: str, channel: str) -> None:
         raise NotImplementedError
 
-    @abstractmethod
-    def stream_quotes(self) -> AsyncIterator[Quote]:
-        raise NotImplementedError
+    def add_listener(self, listener: Callable[[list[Tick]], None]) -> None:
+        """Call ``listener`` synchronously with every published batch.
+
+        Listeners see every tick regardless of queue backpressure, which makes
+        them the place for once-per-tick work shared by all consumers.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[list[Tick]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def _publish(self, quote: Tick) -> None:
+        """Hand a quote to consumers, applying the queue's backpressure policy."""
+        for listener in self._listeners:
+            listener([quote])
+        await self._queue.put(quote)
+
+    async def _publish_many(self, quotes: list[Tick]) -> None:
+        """Batch form of :meth:`_publish` for high-rate producers."""
+        for listener in self._listeners:
+            listener(quotes)
+        await self._queue.put_many(quotes)
+
+    def _publish_many_nowait(self, quotes: list[Tick]) -> None:
+        """:meth:`_publish_many` that never waits, dropping overflow even under ``BLOCK``."""
+        for listener in self._listeners:
+            listener(quotes)
+        self._queue.put_many_nowait(quotes)
+
+    def stream_quotes(self) -> AsyncIterator[Tick]:
+        async def iterator() -> AsyncIterator[Tick]:
+            while True:
+                yield await self._queue.get()
+
+        return iterator()
+
+    def stream_batches(self, max_batch: int = 512) -> AsyncIterator[list[Tick]]:
+        """Like :meth:`stream_quotes` but yields everything buffered at once."""
+        async def iterator() -> AsyncIterator[list[Tick]]:
+            while True:
+                yield await self._queue.get_many(max_batch)
+
+        return iterator()
 
 
 _provider: DataProvider | None = None
@@ -48,42 +220,91 @@ def set_data_provider(provider: DataProvider) -> None:
     _provider = provider
 
 
-def get_data_provider() -> DataProvider:
-    global _provider
-    if _provider is None:
-        settings = get_settings()
-        symbols = [s.strip().upper() for s in settings.symbols.split(",") if s.strip()]
-        if not symbols:
-            symbols = ["AAPL"]
+def _queue_options(settings: Settings) -> dict:
+    return {
+        "queue_maxsize": settings.provider_queue_maxsize,
+        "backpressure": settings.provider_backpressure.strip().lower(),
+    }
+
+
+def create_provider(settings: Settings) -> BaseAsyncProvider:
+    """Build the upstream provider selected by ``DATA_PROVIDER``."""
+    symbols = [s.strip().upper() for s in settings.symbols.split(",") if s.strip()]
+    if not symbols:
+        symbols = ["AAPL"]
+
+    provider_name = (settings.data_provider or "mock").strip().lower()
+    queue_options = _queue_options(settings)
+    if provider_name == "mock":
+        from .adapters.mock import MockDataProvider
 
-        provider_name = (settings.data_provider or "mock").strip().lower()
-        if provider_name == "mock":
+        return MockDataProvider(
+            symbols=symbols,
+            interval=settings.mock_stream_interval,
+            **queue_options,
+        )
+    elif provider_name == "synthetic":
+        from .adapters.synthetic import SyntheticDataProvider
+
+        return SyntheticDataProvider(
+            symbols=symbols,
+            n_symbols=settings.synthetic_symbols,
+            tick_rate=settings.synthetic_tick_rate,
+            seed=settings.synthetic_seed,
+            **queue_options,
+        )
+    elif provider_name == "replay":
+        from .adapters.replay import ReplayDataProvider
+
+        return ReplayDataProvider(
+            source=settings.replay_source,
+            symbols=[s.strip() for s in settings.replay_symbols.split(",") if s.strip()],
+            speed=settings.replay_speed,
+            loop=settings.replay_loop,
+            start=settings.replay_start,
+            end=settings.replay_end,
+            **queue_options,
+        )
+    elif provider_name == "twelvedata":
+        if not settings.twelvedata_api_key:
+            warnings.warn(
+                "TWELVEDATA_API_KEY not set - falling back to mock provider",
+                RuntimeWarning,
+            )
             from .adapters.mock import MockDataProvider
 
-            _provider = MockDataProvider(
+            return MockDataProvider(
                 symbols=symbols,
                 interval=settings.mock_stream_interval,
+                **queue_options,
             )
-        elif provider_name == "twelvedata":
-            if not settings.twelvedata_api_key:
-                warnings.warn(
-                    "TWELVEDATA_API_KEY not set - falling back to mock provider",
-                    RuntimeWarning,
-                )
-                from .adapters.mock import MockDataProvider
-
-                _provider = MockDataProvider(
-                    symbols=symbols,
-                    interval=settings.mock_stream_interval,
-                )
-                return cast(DataProvider, _provider)
-            from .adapters.twelvedata import TwelveDataProvider
-
-            _provider = TwelveDataProvider(
-                api_key=settings.twelvedata_api_key,
-                symbols=symbols,
-                interval=settings.twelvedata_poll_interval,
+        from .adapters.twelvedata import TwelveDataProvider
+
+        return TwelveDataProvider(
+            api_key=settings.twelvedata_api_key,
+            symbols=symbols,
+            interval=settings.twelvedata_min_refresh_interval,
+            credits_per_minute=settings.twelvedata_credits_per_minute,
+            max_batch=settings.twelvedata_max_batch,
+            base_url=settings.twelvedata_base_url,
+            **queue_options,
+        )
+    raise ValueError(f"Unsupported DATA_PROVIDER={provider_name!r}")
+
+
+def get_data_provider() -> DataProvider:
+    global _provider
+    if _provider is None:
+        settings = get_settings()
+        if settings.quote_bus_enabled:
+            # One worker runs the real provider; the rest subscribe to it.
+            from .bus import BusProvider
+
+            _provider = BusProvider(
+                lambda: create_provider(settings),
+                path=settings.quote_bus_path,
+                **_queue_options(settings),
             )
         else:
-            raise ValueError(f"Unsupported DATA_PROVIDER={provider_name!r}")
+            _provider = create_provider(settings)
     return cast(DataProvider, _provider)
@@ -0,0 +1,190 @@
+"""
+API credit budgeting and poll scheduling for metered market-data APIs.
+
+``CreditBudget`` is a per-minute token bucket that backs off multiplicatively
+when the upstream answers 429 and recovers additively on success.
+``PollScheduler`` decides which symbols to refresh next so that every credit
+goes to the stalest symbol, with watched symbols weighted ahead of the rest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import httpx
+
+
+class RateLimited(Exception):
+    """Raised by a client when the upstream rejects a call for rate limiting."""
+
+    def __init__(self, retry_after: float | None = None) -> None:
+        super().__init__(f"rate limited (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def raise_for_rate_limit(resp: httpx.Response, data: Any = None) -> None:
+    """Raise :class:`RateLimited` for HTTP 429 or a JSON ``{"code": 429}`` body.
+
+    Twelve Data reports exhausted credits either way depending on the plan.
+    """
+    if resp.status_code == 429:
+        raise RateLimited(_retry_after(resp))
+    if isinstance(data, dict) and data.get("status") == "error" and data.get("code") == 429:
+        raise RateLimited(_retry_after(resp))
+
+
+class CreditBudget:
+    """Token bucket of API credits refilled at ``credits_per_minute``.
+
+    The bucket holds at most one minute of credits.  :meth:`penalize` empties
+    it, pauses until ``Retry-After`` and halves the effective rate;
+    :meth:`reward` grows the rate back by one credit per minute per success,
+    never above the configured plan limit.
+    """
+
+    def __init__(
+        self,
+        credits_per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if credits_per_minute <= 0:
+            raise ValueError("credits_per_minute must be positive")
+        self._max_rate = float(credits_per_minute)
+        self._rate = self._max_rate
+        self._clock = clock
+        self._tokens = self._max_rate
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current effective credits per minute."""
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self._rate, self._tokens + (now - start) * self._rate / 60.0)
+        self._updated = max(now, self._updated)
+
+    def wait_time(self, credits: float) -> float:
+        """Seconds until ``credits`` can be spent (0 when available now)."""
+        now = self._clock()
+        self._refill(now)
+        credits = min(credits, self._rate)
+        pause = max(self._paused_until - now, 0.0)
+        deficit = max(credits - self._tokens, 0.0)
+        return pause + deficit * 60.0 / self._rate
+
+    async def acquire(self, credits: float = 1.0) -> None:
+        """Wait until ``credits`` are available and spend them.
+
+        Requests larger than the current rate are clamped to it so a shrunken
+        budget can never deadlock a caller.
+        """
+        async with self._lock:
+            while True:
+                wait = self.wait_time(credits)
+                if wait <= 0:
+                    self._tokens -= min(credits, self._rate)
+                    return
+                await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: float | None = None) -> None:
+        now = self._clock()
+        self._refill(now)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + (retry_after or 60.0))
+        self._rate = max(1.0, self._rate / 2.0)
+
+    def reward(self) -> None:
+        self._rate = min(self._max_rate, self._rate + 1.0)
+
+
+class PollScheduler:
+    """Rotating, priority-weighted choice of which symbols to poll next.
+
+    Each symbol's urgency is ``weight * seconds since last poll``; a symbol
+    that was subscribed to within ``active_ttl`` seconds gets
+    ``active_weight``, everything else weight 1.  Never-polled symbols go
+    first.  Symbols polled less than ``min_interval`` ago are not due.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str] = (),
+        max_batch: int = 8,
+        active_weight: float = 4.0,
+        active_ttl: float = 300.0,
+        min_interval: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_batch = max(1, max_batch)
+        self._active_weight = active_weight
+        self._active_ttl = active_ttl
+        self._min_interval = max(min_interval, 0.0)
+        self._clock = clock
+        self._last_polled: dict[str, float] = {}
+        self._active_at: dict[str, float] = {}
+        for symbol in symbols:
+            self.add(symbol)
+
+    @property
+    def symbols(self) -> list[str]:
+        return sorted(self._last_polled)
+
+    def add(self, symbol: str) -> None:
+        self._last_polled.setdefault(symbol.upper(), -math.inf)
+
+    def touch(self, symbol: str) -> None:
+        """Record subscriber interest; the symbol is prioritised for ``active_ttl``."""
+        symbol = symbol.upper()
+        self.add(symbol)
+        self._active_at[symbol] = self._clock()
+
+    def is_active(self, symbol: str, now: float | None = None) -> bool:
+        at = self._active_at.get(symbol)
+        now = self._clock() if now is None else now
+        return at is not None and now - at <= self._active_ttl
+
+    def batch_size(self, budget_rate: float) -> int:
+        """Symbols per request: bounded by the batch cap and one minute of credits."""
+        return max(1, min(len(self._last_polled), self._max_batch, int(budget_rate)))
+
+    def next_batch(self, size: int) -> list[str]:
+        now = self._clock()
+        due = []
+        for symbol, last in self._last_polled.items():
+            age = now - last
+            if age < self._min_interval:
+                continue
+            weight = self._active_weight if self.is_active(symbol, now) else 1.0
+            due.append((weight * age, symbol))
+        due.sort(key=lambda item: (-item[0], item[1]))
+        return [symbol for _, symbol in due[:size]]
+
+    def seconds_until_due(self) -> float:
+        """How long until at least one symbol is due again."""
+        if not self._last_polled:
+            return self._min_interval or 1.0
+        now = self._clock()
+        oldest = min(self._last_polled.values())
+        return max(self._min_interval - (now - oldest), 0.0)
+
+    def mark_polled(self, symbols: Iterable[str]) -> None:
+        now = self._clock()
+        for symbol in symbols:
+            self._last_polled[symbol.upper()] = now
@@ -0,0 +1,204 @@
+"""
+Dialect-specific write paths shared by the repositories.
+
+PostgreSQL (asyncpg) and SQLite (aiosqlite) both support
+``INSERT ... ON CONFLICT``, but through their own ``insert`` constructs, and
+PostgreSQL additionally offers ``COPY`` for large append-only batches.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from typing import Any, TypeVar
+
+from sqlalchemy import Table, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.dml import Insert
+
+T = TypeVar("T")
+
+# Below this many rows a multi-row INSERT beats the COPY protocol set-up cost.
+_COPY_MIN_ROWS = 500
+
+
+def _table(model: Any) -> Table:
+    return model if isinstance(model, Table) else model.__table__
+
+
+def dialect_name(session: AsyncSession) -> str:
+    return session.bind.dialect.name
+
+
+def insert_for(session: AsyncSession, model: Any) -> Insert:
+    """Return the dialect's ``insert`` construct (supports ``on_conflict_*``).
+
+    Pass the mapped class rather than its table to get ORM objects back from
+    ``RETURNING``.
+    """
+    name = dialect_name(session)
+    if name == "postgresql":
+        return postgresql.insert(model)
+    if name == "sqlite":
+        return sqlite.insert(model)
+    return insert(model)
+
+
+async def upsert(
+    session: AsyncSession,
+    model: type[T],
+    values: dict[str, Any],
+    *,
+    conflict: Sequence[str],
+    update: Iterable[str] | None = None,
+) -> T:
+    """Insert-or-update one row and return it, in a single round trip.
+
+    Emits ``INSERT ... ON CONFLICT (conflict) DO UPDATE ... RETURNING *``.
+    ``update`` names the columns overwritten from ``values`` when the row
+    already exists (default: every non-conflict key in ``values``).  This
+    always writes the row; reads that only need a row to exist go through
+    :func:`get_or_create`.
+
+    Keys that are not columns of ``model`` are ignored.  The returned object
+    is attached to the session and refreshed from the database row.
+    """
+    columns = _table(model).columns
+    values = {k: v for k, v in values.items() if k in columns}
+    if update is None:
+        update = [k for k in values if k not in conflict]
+    stmt = insert_for(session, model).values(**values)
+
+    # DO NOTHING would skip RETURNING for existing rows, so an empty
+    # ``update`` rewrites the conflict key with itself instead.
+    set_ = {k: stmt.excluded[k] for k in update if k in values}
+    if not set_:
+        set_ = {conflict[0]: stmt.excluded[conflict[0]]}
+    stmt = stmt.on_conflict_do_update(index_elements=list(conflict), set_=set_)
+
+    result = await session.execute(
+        stmt.returning(model),
+        execution_options={"populate_existing": True},
+    )
+    return result.scalar_one()
+
+
+async def get_or_create(
+    session: AsyncSession,
+    model: type[T],
+    values: dict[str, Any],
+    *,
+    conflict: Sequence[str],
+) -> T:
+    """Return the row matching ``values`` on ``conflict``, inserting it if missing.
+
+    An existing row costs one ``SELECT`` and no write.  A missing one is
+    inserted with ``ON CONFLICT DO NOTHING`` and selected again, so a
+    concurrent insert of the same key is not an error.
+    """
+    stmt = select(model).where(*(getattr(model, k) == values[k] for k in conflict))
+    row = (await session.execute(stmt)).scalar_one_or_none()
+    if row is not None:
+        return row
+    columns = _table(model).columns
+    insert_stmt = insert_for(session, model).values(
+        **{k: v for k, v in values.items() if k in columns}
+    )
+    await session.execute(insert_stmt.on_conflict_do_nothing(index_elements=list(conflict)))
+    return (await session.execute(stmt)).scalar_one()
+
+
+def _with_defaults(table: Table, rows: list[dict]) -> list[dict]:
+    """Fill Python-side column defaults so every row has the same keys.
+
+    ``executemany`` and ``COPY`` both need a uniform column list; columns
+    left out are only those with server defaults or an auto-increment key.
+    """
+    keys = set().union(*rows)
+    fill = {
+        col.name: col.default
+        for col in table.columns
+        if col.name not in keys
+        and col.default is not None
+        and (col.default.is_scalar or col.default.is_callable)
+    }
+    if not fill and all(len(r) == len(keys) for r in rows):
+        return rows
+
+    out = []
+    for row in rows:
+        full = {k: row.get(k) for k in keys}
+        for name, default in fill.items():
+            full[name] = default.arg(None) if default.is_callable else default.arg
+        out.append(full)
+    return out
+
+
+async def bulk_insert(
+    session: AsyncSession,
+    model: Any,
+    rows: list[dict],
+    *,
+    ignore_conflicts: bool = False,
+) -> None:
+    """Append ``rows`` in as few round trips as the dialect allows.
+
+    - PostgreSQL: ``COPY ... FROM STDIN`` over the session's own connection
+      (so it joins the current transaction) for batches of ``_COPY_MIN_ROWS``
+      or more; a batched multi-row ``INSERT`` otherwise.
+    - SQLite: a single prepared ``INSERT`` run through ``executemany``.
+
+    With ``ignore_conflicts`` rows violating a unique constraint are skipped
+    via ``ON CONFLICT DO NOTHING`` (COPY is not used in that case).
+    """
+    if not rows:
+        return
+    table = _table(model)
+    rows = _with_defaults(table, rows)
+
+    if ignore_conflicts:
+        await session.execute(insert_for(session, table).on_conflict_do_nothing(), rows)
+        return
+
+    if dialect_name(session) == "postgresql" and len(rows) >= _COPY_MIN_ROWS:
+        columns = list(rows[0])
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name,
+            records=[tuple(r[c] for c in columns) for r in rows],
+            columns=columns,
+        )
+        return
+
+    await session.execute(insert(table), rows)
+
+
+async def bulk_upsert(
+    session: AsyncSession,
+    model: Any,
+    rows: list[dict],
+    *,
+    conflict: Sequence[str],
+    update: Iterable[str] | None = None,
+) -> None:
+    """Insert ``rows``, overwriting the ones that already exist on ``conflict``.
+
+    The many-row form of :func:`upsert`: one ``INSERT ... ON CONFLICT DO
+    UPDATE`` run through ``executemany``, without ``RETURNING``.  ``update``
+    defaults to every non-conflict column present in the rows; when empty,
+    existing rows are kept as they are.
+    """
+    if not rows:
+        return
+    table = _table(model)
+    rows = _with_defaults(table, rows)
+    if update is None:
+        update = [k for k in rows[0] if k not in conflict and k in table.columns]
+    stmt = insert_for(session, table)
+    set_ = {k: stmt.excluded[k] for k in update}
+    if set_:
+        stmt = stmt.on_conflict_do_update(index_elements=list(conflict), set_=set_)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict))
+    await session.execute(stmt, rows)
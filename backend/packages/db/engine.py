@@ -1,7 +1,9 @@
 """
 Async database engine and session management.
 
-Connects to Neon PostgreSQL (free tier) via asyncpg.
+Connects to Neon PostgreSQL (free tier) via asyncpg, or to a local SQLite
+file via aiosqlite when DATABASE_URL starts with ``sqlite`` — handy for
+benchmarks and CI runs without outside services.
 Falls back gracefully when DATABASE_URL is not configured.
 """
 
@@ -9,17 +11,23 @@ from __future__ import annotations
 
 import logging
 from contextlib import asynccontextmanager
+from time import perf_counter
 from typing import AsyncGenerator
 
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from sqlmodel import SQLModel
 
-from packages.shared.config import get_settings
+from packages.shared.config import Settings, get_settings
+from packages.shared.metrics import db_pool_checkout, db_pool_usage
 
 logger = logging.getLogger(__name__)
 
@@ -30,17 +38,78 @@ logger = logging.getLogger(__name__)
 _engine: AsyncEngine | None = None
 _session_factory: async_sessionmaker[AsyncSession] | None = None
 
+# Applied to every new SQLite connection.  WAL lets readers run alongside the
+# single writer; NORMAL sync is durable across app crashes (not power loss),
+# which is the right trade-off for a local benchmark / CI database.
+_SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("foreign_keys", "ON"),
+    ("busy_timeout", "5000"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-65536"),      # 64 MiB page cache
+    ("mmap_size", "268435456"),    # 256 MiB memory-mapped I/O
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited.
+
+    The timing covers both waiting for a free slot and opening a new
+    connection, i.e. everything between asking for and holding a connection.
+    """
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout(perf_counter() - start)
+
+
+def _pool_kwargs(settings: Settings) -> dict:
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _track_pool_usage(engine: AsyncEngine) -> None:
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return
+
+    def _publish(*_args) -> None:
+        db_pool_usage(pool.checkedout(), pool.overflow())
+
+    event.listen(engine.sync_engine, "checkout", _publish)
+    event.listen(engine.sync_engine, "checkin", _publish)
+
+
+def is_sqlite_url(url: str) -> bool:
+    return url.strip().startswith("sqlite")
+
 
 def _build_connection_url(raw_url: str) -> str:
     """Convert a standard postgresql:// URL to asyncpg format.
 
     Also strips ``sslmode`` from the query string because asyncpg does not
     recognise it — we pass ``ssl`` via ``connect_args`` instead.
+    SQLite URLs are switched to the ``aiosqlite`` driver.
     """
     from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
     url = raw_url.strip()
 
+    if is_sqlite_url(url):
+        if url.startswith("sqlite://"):
+            url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        return url
+
     # --- driver prefix ---------------------------------------------------
     if url.startswith("postgres://"):
         url = url.replace("postgres://", "postgresql+asyncpg://", 1)
@@ -71,25 +140,61 @@ def get_engine() -> AsyncEngine:
     if not raw_url:
         raise RuntimeError(
             "DATABASE_URL is not set. "
-            "Get a free PostgreSQL database at https://neon.tech and set DATABASE_URL in your .env"
+            "Get a free PostgreSQL database at https://neon.tech and set DATABASE_URL "
+            "in your .env, "
+            "or use a local file with DATABASE_URL=sqlite+aiosqlite:///./stocktrade.db"
         )
 
     url = _build_connection_url(raw_url)
 
+    if is_sqlite_url(url):
+        _engine = _create_sqlite_engine(url, settings)
+        _track_pool_usage(_engine)
+        logger.info("Database engine created — %s", url)
+        return _engine
+
     _engine = create_async_engine(
         url,
         echo=settings.log_level.upper() == "DEBUG",
-        pool_size=5,
-        max_overflow=10,
-        pool_pre_ping=True,
+        **_pool_kwargs(settings),
         # Neon serverless uses SSL by default
         connect_args={"ssl": "require"} if "neon.tech" in url else {},
     )
+    _track_pool_usage(_engine)
 
     logger.info("Database engine created — %s", url.split("@")[-1] if "@" in url else "(local)")
     return _engine
 
 
+def _create_sqlite_engine(url: str, settings: Settings) -> AsyncEngine:
+    """Build an aiosqlite engine with WAL and tuned pragmas.
+
+    In-memory databases live and die with their connection, so they share a
+    single one through ``StaticPool``; file databases use the regular pool.
+    """
+    in_memory = url.endswith(":memory:") or url.rstrip("/").endswith("aiosqlite:")
+    kwargs: dict = {
+        "echo": settings.log_level.upper() == "DEBUG",
+        "connect_args": {"timeout": 30},
+    }
+    if in_memory:
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(_pool_kwargs(settings))
+    engine = create_async_engine(url, **kwargs)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_conn, _record) -> None:
+        cursor = dbapi_conn.cursor()
+        for name, value in _SQLITE_PRAGMAS:
+            if in_memory and name in ("journal_mode", "mmap_size"):
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
 def get_session_factory() -> async_sessionmaker[AsyncSession]:
     """Return the global async session factory."""
     global _session_factory
@@ -143,13 +248,41 @@ async def init_db() -> None:
     # Import models so SQLModel registers them
     import packages.db.models  # noqa: F401
 
+    settings = get_settings()
     engine = get_engine()
     async with engine.begin() as conn:
+        if settings.quote_retention_enabled:
+            from packages.db.retention import create_partitioned_quotes
+
+            await create_partitioned_quotes(conn)
         await conn.run_sync(SQLModel.metadata.create_all)
+        await _ensure_ohlcv_key(conn)
+        if settings.quote_retention_enabled:
+            from packages.db.retention import QuoteRetentionManager, is_partitioned
+
+            # the first ticks must not wait for the retention task's first pass
+            if await is_partitioned(conn):
+                manager = QuoteRetentionManager(partition_days=settings.quote_partition_days)
+                await manager.ensure_partitions(conn)
 
     logger.info("✅ Database tables verified / created.")
 
 
+async def _ensure_ohlcv_key(conn: AsyncConnection) -> None:
+    """Give an ``ohlcv`` table created before its unique key the key's index."""
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_ohlcv_symbol_ts ON ohlcv (symbol, timestamp)"
+            ))
+            await conn.execute(text("DROP INDEX IF EXISTS ix_ohlcv_symbol_ts"))
+    except DBAPIError as exc:
+        logger.warning(
+            "ohlcv holds duplicate (symbol, timestamp) bars; delete them so bar writes "
+            "can upsert: %s", exc,
+        )
+
+
 async def close_db() -> None:
     """Dispose the engine connection pool."""
     global _engine, _session_factory
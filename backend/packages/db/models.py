@@ -10,7 +10,7 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from sqlmodel import Field, SQLModel, Column, Relationship
-from sqlalchemy import Text, DateTime, Index, JSON, BigInteger, func
+from sqlalchemy import Text, DateTime, Index, JSON, BigInteger, Integer, func
 
 
 # --------------------------------------------------------------------------- #
@@ -25,6 +25,11 @@ def new_uuid() -> str:
     return str(uuid.uuid4())
 
 
+# SQLite only auto-increments an ``INTEGER PRIMARY KEY`` (rowid alias), so the
+# BIGINT surrogate keys of the time-series tables fall back to INTEGER there.
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
+
 # --------------------------------------------------------------------------- #
 #  Users & Auth
 # --------------------------------------------------------------------------- #
@@ -81,7 +86,7 @@ class QuoteDB(SQLModel, table=True):
 
     id: Optional[int] = Field(
         default=None,
-        sa_column=Column(BigInteger, primary_key=True, autoincrement=True),
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
     )
     symbol: str = Field(max_length=10, index=True)
     price: float
@@ -96,12 +101,13 @@ class OHLCVDB(SQLModel, table=True):
 
     __tablename__ = "ohlcv"
     __table_args__ = (
-        Index("ix_ohlcv_symbol_ts", "symbol", "timestamp"),
+        # one bar per symbol and bucket; rollups and loaders upsert on it
+        Index("ux_ohlcv_symbol_ts", "symbol", "timestamp", unique=True),
     )
 
     id: Optional[int] = Field(
         default=None,
-        sa_column=Column(BigInteger, primary_key=True, autoincrement=True),
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
     )
     symbol: str = Field(max_length=10, index=True)
     open: float
@@ -183,11 +189,13 @@ class AgentActionDB(SQLModel, table=True):
     __tablename__ = "agent_actions"
     __table_args__ = (
         Index("ix_agent_actions_ts", "timestamp"),
+        # keyset pagination of a user's trade history on (executed_at, id)
+        Index("ix_agent_actions_user_exec", "user_id", "executed_at", "id"),
     )
 
     id: Optional[int] = Field(
         default=None,
-        sa_column=Column(BigInteger, primary_key=True, autoincrement=True),
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
     )
     user_id: Optional[str] = Field(default=None, index=True)
     symbol: str = Field(max_length=10, index=True)
@@ -206,6 +214,32 @@ class AgentActionDB(SQLModel, table=True):
     )
 
 
+class ShadowDecisionDB(SQLModel, table=True):
+    """A challenger model's decision on a state the live model also scored."""
+
+    __tablename__ = "shadow_decisions"
+    __table_args__ = (
+        Index("ix_shadow_decisions_model_ts", "model", "timestamp"),
+    )
+
+    id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
+    )
+    model: str = Field(max_length=100)  # challenger name@version
+    live_model: str = Field(max_length=100)
+    symbol: str = Field(max_length=10)
+    price: float
+    side: str = Field(max_length=4)  # challenger's HOLD | BUY | SELL
+    live_side: str = Field(max_length=4)
+    q_values: list = Field(sa_column=Column(JSON))
+    live_q_values: list = Field(sa_column=Column(JSON))
+    timestamp: datetime = Field(
+        default_factory=utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now()),
+    )
+
+
 class ModelArtifactDB(SQLModel, table=True):
     """Metadata for a trained model artifact (weights in object storage)."""
 
@@ -255,7 +289,7 @@ class TrainingMetricDB(SQLModel, table=True):
 
     id: Optional[int] = Field(
         default=None,
-        sa_column=Column(BigInteger, primary_key=True, autoincrement=True),
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
     )
     run_id: str = Field(foreign_key="training_runs.id", index=True)
     episode: int
@@ -309,7 +343,7 @@ class AuditLogDB(SQLModel, table=True):
 
     id: Optional[int] = Field(
         default=None,
-        sa_column=Column(BigInteger, primary_key=True, autoincrement=True),
+        sa_column=Column(BigIntPK, primary_key=True, autoincrement=True),
     )
     event_type: str = Field(max_length=50, index=True)  # AUTH | API_ACCESS | TRADE | etc.
     user_id: Optional[str] = Field(default=None, max_length=100)
@@ -1,18 +1,23 @@
 """
-Repository layer — async CRUD helpers backed by PostgreSQL.
+Repository layer — async CRUD helpers backed by PostgreSQL or SQLite.
 
-Each repository receives an ``AsyncSession`` and is stateless.
+Each repository receives an ``AsyncSession`` and is stateless.  Public
+coroutine methods are timed into ``app_db_query_duration_seconds`` under
+``Repository.method`` labels via :func:`instrumented`.
 """
 
 from __future__ import annotations
 
+import functools
+import inspect
 import logging
 from datetime import datetime, timezone
-from typing import Optional, Sequence
+from typing import AsyncIterator, Optional, Sequence, TypeVar
 
-from sqlalchemy import select, update, delete
+from sqlalchemy import case, func, select, tuple_, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from packages.db.dialects import bulk_insert, bulk_upsert, get_or_create, upsert
 from packages.db.models import (
     AuditLogDB,
     UserDB,
@@ -23,20 +28,43 @@ from packages.db.models import (
     PositionDB,
     AgentActionDB,
     ModelArtifactDB,
+    ShadowDecisionDB,
     TrainingRunDB,
     TrainingMetricDB,
     BacktestRunDB,
     new_uuid,
     utcnow,
 )
+from packages.shared.metrics import track_db_query
 
 logger = logging.getLogger(__name__)
 
+R = TypeVar("R")
+
+
+def instrumented(cls: type[R]) -> type[R]:
+    """Class decorator recording the duration of each public coroutine method."""
+    for name, fn in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(fn):
+            continue
+        setattr(cls, name, _timed(f"{cls.__name__}.{name}", fn))
+    return cls
+
+
+def _timed(operation: str, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with track_db_query(operation):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
 
 # --------------------------------------------------------------------------- #
 #  User Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class UserRepository:
     """CRUD for the ``users`` table."""
 
@@ -74,6 +102,7 @@ class UserRepository:
 #  User Settings Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class UserSettingsRepository:
 
     def __init__(self, session: AsyncSession):
@@ -84,27 +113,25 @@ class UserSettingsRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def get_or_create(self, user_id: str) -> UserSettingsDB:
+        return await get_or_create(
+            self.session, UserSettingsDB, {"user_id": user_id}, conflict=["user_id"]
+        )
+
     async def upsert(self, user_id: str, **kwargs) -> UserSettingsDB:
-        existing = await self.get(user_id)
-        if existing:
-            for k, v in kwargs.items():
-                if hasattr(existing, k):
-                    setattr(existing, k, v)
-            existing.updated_at = utcnow()
-            self.session.add(existing)
-            await self.session.flush()
-            return existing
-
-        settings = UserSettingsDB(user_id=user_id, **kwargs)
-        self.session.add(settings)
-        await self.session.flush()
-        return settings
+        return await upsert(
+            self.session,
+            UserSettingsDB,
+            {**kwargs, "user_id": user_id, "updated_at": utcnow()},
+            conflict=["user_id"],
+        )
 
 
 # --------------------------------------------------------------------------- #
 #  Quote Repository (time-series)
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class QuoteRepository:
 
     def __init__(self, session: AsyncSession):
@@ -115,8 +142,7 @@ class QuoteRepository:
         self.session.add(quote)
 
     async def insert_batch(self, quotes: list[dict]) -> None:
-        objects = [QuoteDB(**q) for q in quotes]
-        self.session.add_all(objects)
+        await bulk_insert(self.session, QuoteDB, quotes)
 
     async def get_latest(self, symbol: str, limit: int = 100) -> Sequence[QuoteDB]:
         stmt = (
@@ -133,14 +159,37 @@ class QuoteRepository:
 #  OHLCV Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class OHLCVRepository:
 
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def insert_batch(self, candles: list[dict]) -> None:
-        objects = [OHLCVDB(**c) for c in candles]
-        self.session.add_all(objects)
+        """Write ``candles``, replacing bars already stored for the same symbol and time."""
+        await bulk_upsert(self.session, OHLCVDB, candles, conflict=("symbol", "timestamp"))
+
+    async def replace_range(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        candles: list[dict],
+    ) -> None:
+        """Swap every bar for ``symbol`` in ``[start, end]`` for ``candles``.
+
+        Bars the provider no longer returns are dropped too, so loaders that
+        re-fetch a whole range (e.g. a resumed backfill) use this instead of
+        ``insert_batch``.
+        """
+        await self.session.execute(
+            delete(OHLCVDB).where(
+                OHLCVDB.symbol == symbol,
+                OHLCVDB.timestamp >= start,
+                OHLCVDB.timestamp <= end,
+            )
+        )
+        await bulk_insert(self.session, OHLCVDB, candles)
 
     async def get_range(
         self,
@@ -165,6 +214,7 @@ class OHLCVRepository:
 #  Order Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class OrderRepository:
 
     def __init__(self, session: AsyncSession):
@@ -203,6 +253,7 @@ class OrderRepository:
 #  Position Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class PositionRepository:
 
     def __init__(self, session: AsyncSession):
@@ -214,31 +265,19 @@ class PositionRepository:
         return result.scalars().all()
 
     async def upsert(self, user_id: str, symbol: str, **kwargs) -> PositionDB:
-        stmt = select(PositionDB).where(
-            PositionDB.user_id == user_id, PositionDB.symbol == symbol
+        return await upsert(
+            self.session,
+            PositionDB,
+            {**kwargs, "user_id": user_id, "symbol": symbol, "updated_at": utcnow()},
+            conflict=["user_id", "symbol"],
         )
-        result = await self.session.execute(stmt)
-        pos = result.scalar_one_or_none()
-
-        if pos:
-            for k, v in kwargs.items():
-                if hasattr(pos, k):
-                    setattr(pos, k, v)
-            pos.updated_at = utcnow()
-            self.session.add(pos)
-            await self.session.flush()
-            return pos
-
-        pos = PositionDB(user_id=user_id, symbol=symbol, **kwargs)
-        self.session.add(pos)
-        await self.session.flush()
-        return pos
 
 
 # --------------------------------------------------------------------------- #
 #  Agent Action Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class AgentActionRepository:
 
     def __init__(self, session: AsyncSession):
@@ -262,11 +301,44 @@ class AgentActionRepository:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def get_user_page(
+        self,
+        user_id: str,
+        limit: int = 50,
+        before: tuple[datetime, int] | None = None,
+    ) -> Sequence[AgentActionDB]:
+        """Newest-first page of a user's actions, keyset-paginated on ``(executed_at, id)``.
+
+        ``before`` is the ``(executed_at, id)`` of the last row of the previous
+        page; each page is an index range scan regardless of its depth.
+        """
+        stmt = select(AgentActionDB).where(AgentActionDB.user_id == user_id)
+        if before is not None:
+            stmt = stmt.where(tuple_(AgentActionDB.executed_at, AgentActionDB.id) < before)
+        stmt = stmt.order_by(AgentActionDB.executed_at.desc(), AgentActionDB.id.desc()).limit(limit)
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
+    async def stream_user_actions(
+        self, user_id: str, batch_size: int = 1_000
+    ) -> AsyncIterator[AgentActionDB]:
+        """Yield all of a user's actions oldest-first through a server-side cursor."""
+        stmt = (
+            select(AgentActionDB)
+            .where(AgentActionDB.user_id == user_id)
+            .order_by(AgentActionDB.executed_at, AgentActionDB.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream_scalars(stmt)
+        async for action in result:
+            yield action
+
 
 # --------------------------------------------------------------------------- #
 #  Model Artifact Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class ModelArtifactRepository:
 
     def __init__(self, session: AsyncSession):
@@ -280,6 +352,19 @@ class ModelArtifactRepository:
         await self.session.flush()
         return artifact
 
+    async def publish(
+        self, name: str, version: str, artifact_uri: str, metrics: dict | None = None
+    ) -> ModelArtifactDB:
+        """Point ``name`` at a new version, creating the entry if needed."""
+        artifact = await self.get_by_name(name)
+        if artifact is None:
+            return await self.register(name, version, artifact_uri, metrics)
+        artifact.version = version
+        artifact.artifact_uri = artifact_uri
+        artifact.metrics = metrics
+        await self.session.flush()
+        return artifact
+
     async def get_by_name(self, name: str) -> ModelArtifactDB | None:
         stmt = select(ModelArtifactDB).where(ModelArtifactDB.name == name)
         result = await self.session.execute(stmt)
@@ -291,10 +376,63 @@ class ModelArtifactRepository:
         return result.scalars().all()
 
 
+# --------------------------------------------------------------------------- #
+#  Shadow Decision Repository
+# --------------------------------------------------------------------------- #
+
+@instrumented
+class ShadowDecisionRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def log_batch(self, rows: list[dict]) -> None:
+        await bulk_insert(self.session, ShadowDecisionDB, rows)
+
+    async def agreement(
+        self, model: str | None = None, since: datetime | None = None
+    ) -> list[tuple[str, str, int, int]]:
+        """``(model, live_model, decisions, agreed)`` per challenger, counted in SQL."""
+        stmt = select(
+            ShadowDecisionDB.model,
+            func.max(ShadowDecisionDB.live_model),
+            func.count(),
+            func.sum(case((ShadowDecisionDB.side == ShadowDecisionDB.live_side, 1), else_=0)),
+        ).group_by(ShadowDecisionDB.model)
+        if model is not None:
+            stmt = stmt.where(ShadowDecisionDB.model == model)
+        if since is not None:
+            stmt = stmt.where(ShadowDecisionDB.timestamp >= since)
+        result = await self.session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def stream_sides(
+        self, model: str, since: datetime | None = None, batch_size: int = 10_000
+    ) -> AsyncIterator[tuple[str, float, str, str]]:
+        """Yield ``(symbol, price, side, live_side)`` of ``model``'s decisions, oldest first."""
+        stmt = (
+            select(
+                ShadowDecisionDB.symbol,
+                ShadowDecisionDB.price,
+                ShadowDecisionDB.side,
+                ShadowDecisionDB.live_side,
+            )
+            .where(ShadowDecisionDB.model == model)
+            .order_by(ShadowDecisionDB.timestamp, ShadowDecisionDB.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if since is not None:
+            stmt = stmt.where(ShadowDecisionDB.timestamp >= since)
+        result = await self.session.stream(stmt)
+        async for row in result:
+            yield tuple(row)
+
+
 # --------------------------------------------------------------------------- #
 #  Training Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class TrainingRepository:
 
     def __init__(self, session: AsyncSession):
@@ -310,15 +448,53 @@ class TrainingRepository:
         metric = TrainingMetricDB(run_id=run_id, episode=episode, loss=loss, reward=reward, **kwargs)
         self.session.add(metric)
 
-    async def complete_run(self, run_id: str, best_reward: float | None = None, final_loss: float | None = None) -> None:
+    async def log_metrics(self, run_id: str, metrics: list[dict]) -> None:
+        """Append many per-episode rows (``episode``, ``loss``, ``reward``, ...) in one write."""
+        rows = [{"run_id": run_id, **m} for m in metrics]
+        await bulk_insert(self.session, TrainingMetricDB, rows)
+
+    async def update_progress(self, run_id: str, total_episodes: int) -> None:
+        stmt = (
+            update(TrainingRunDB)
+            .where(TrainingRunDB.id == run_id)
+            .values(total_episodes=total_episodes)
+        )
+        await self.session.execute(stmt)
+
+    async def complete_run(
+        self,
+        run_id: str,
+        best_reward: float | None = None,
+        final_loss: float | None = None,
+        total_episodes: int | None = None,
+    ) -> None:
         values = {"status": "completed", "completed_at": utcnow()}
         if best_reward is not None:
             values["best_reward"] = best_reward
         if final_loss is not None:
             values["final_loss"] = final_loss
+        if total_episodes is not None:
+            values["total_episodes"] = total_episodes
         stmt = update(TrainingRunDB).where(TrainingRunDB.id == run_id).values(**values)
         await self.session.execute(stmt)
 
+    async def fail_run(self, run_id: str) -> None:
+        stmt = (
+            update(TrainingRunDB)
+            .where(TrainingRunDB.id == run_id)
+            .values(status="failed", completed_at=utcnow())
+        )
+        await self.session.execute(stmt)
+
+    async def get_metrics(self, run_id: str) -> Sequence[TrainingMetricDB]:
+        stmt = (
+            select(TrainingMetricDB)
+            .where(TrainingMetricDB.run_id == run_id)
+            .order_by(TrainingMetricDB.episode)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
     async def get_run(self, run_id: str) -> TrainingRunDB | None:
         stmt = select(TrainingRunDB).where(TrainingRunDB.id == run_id)
         result = await self.session.execute(stmt)
@@ -334,6 +510,7 @@ class TrainingRepository:
 #  Backtest Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class BacktestRepository:
 
     def __init__(self, session: AsyncSession):
@@ -345,6 +522,24 @@ class BacktestRepository:
         await self.session.flush()
         return run
 
+    async def complete_run(self, run_id: str, **metrics) -> None:
+        """Store summary metrics (``final_value``, ``sharpe_ratio``, ...) and mark completed."""
+        stmt = (
+            update(BacktestRunDB)
+            .where(BacktestRunDB.id == run_id)
+            .values(status="completed", **metrics)
+        )
+        await self.session.execute(stmt)
+
+    async def fail_run(self, run_id: str) -> None:
+        stmt = update(BacktestRunDB).where(BacktestRunDB.id == run_id).values(status="failed")
+        await self.session.execute(stmt)
+
+    async def get_run(self, run_id: str) -> BacktestRunDB | None:
+        stmt = select(BacktestRunDB).where(BacktestRunDB.id == run_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
     async def get_user_backtests(self, user_id: str, limit: int = 20) -> Sequence[BacktestRunDB]:
         stmt = (
             select(BacktestRunDB)
@@ -360,6 +555,7 @@ class BacktestRepository:
 #  Audit Log Repository
 # --------------------------------------------------------------------------- #
 
+@instrumented
 class AuditLogRepository:
 
     def __init__(self, session: AsyncSession):
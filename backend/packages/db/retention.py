@@ -0,0 +1,437 @@
+"""
+Quote retention — time-range partitions and OHLCV rollups.
+
+On PostgreSQL the ``quotes`` table is declared ``PARTITION BY RANGE (timestamp)``
+with one child table per window (``quotes_p20261019``) and a
+``quotes_default`` partition catching ticks outside every window.  A
+partition whose upper bound is older than ``quote_raw_retention_days`` is
+rolled up into ``ohlcv`` bars and dropped in the same transaction, so ingest
+and ``get_latest`` only ever touch a bounded number of small partitions.
+Expiry reads each partition's bounds from the catalog, not its name, so
+partitions made under an earlier ``quote_partition_days`` still expire.
+Old ticks in ``quotes_default`` are rolled up and deleted window by window.
+
+SQLite has no declarative partitioning; there the same windows are rolled up
+and deleted one window at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import column, delete, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from packages.db.dialects import bulk_upsert
+from packages.db.models import OHLCVDB, QuoteDB
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_PARTITION_PREFIX = "quotes_p"
+_DEFAULT_PARTITION = "quotes_default"
+_BOUNDS_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+_INSERT_CHUNK = 5_000
+_BAR_KEY = ("symbol", "timestamp")  # a rollup overwrites a bar already stored for its bucket
+# pg_advisory_xact_lock key serialising partition DDL and rollups between processes
+_RETENTION_LOCK_KEY = 0x71756F74
+
+# Same columns as ``QuoteDB`` — the primary key must include the partition key.
+_PARTITIONED_QUOTES_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS quotes (
+        id BIGSERIAL NOT NULL,
+        symbol VARCHAR(10) NOT NULL,
+        price DOUBLE PRECISION NOT NULL,
+        volume INTEGER NOT NULL,
+        timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_quotes_symbol ON quotes (symbol)",
+    "CREATE INDEX IF NOT EXISTS ix_quotes_symbol_ts ON quotes (symbol, timestamp)",
+)
+
+
+# --------------------------------------------------------------------------- #
+#  Window helpers
+# --------------------------------------------------------------------------- #
+
+def window_start(ts: datetime, days: int = 1) -> datetime:
+    """Align ``ts`` down to the start of its ``days``-wide UTC window."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    elapsed = (ts.astimezone(timezone.utc) - _EPOCH).days
+    return _EPOCH + timedelta(days=elapsed - elapsed % days)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{_PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def parse_partition_bounds(expr: str) -> tuple[datetime, datetime] | None:
+    """``(lo, hi)`` of a ``pg_get_expr(relpartbound)`` range; ``None`` for ``DEFAULT``."""
+    match = _BOUNDS_RE.search(expr)
+    if match is None:
+        return None
+    try:
+        lo, hi = (datetime.fromisoformat(v) for v in match.groups())
+    except ValueError:  # MINVALUE / MAXVALUE / infinity
+        return None
+    return (
+        lo if lo.tzinfo else lo.replace(tzinfo=timezone.utc),
+        hi if hi.tzinfo else hi.replace(tzinfo=timezone.utc),
+    )
+
+
+def bucket_start(ts: datetime, bucket_seconds: int) -> datetime:
+    """Align ``ts`` down to the start of its ``bucket_seconds``-wide bar."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    offset = int((ts - _EPOCH).total_seconds()) // bucket_seconds * bucket_seconds
+    return _EPOCH + timedelta(seconds=offset)
+
+
+class _BarBuilder:
+    """Folds ticks ordered by ``(symbol, timestamp)`` into OHLCV bars one at a time."""
+
+    def __init__(self, bucket_seconds: int) -> None:
+        self._bucket_seconds = bucket_seconds
+        self._bar: dict | None = None
+
+    def add(self, symbol: str, price: float, volume: int, ts: datetime) -> dict | None:
+        """Add a tick; returns the previous bar once it is closed."""
+        bucket = bucket_start(ts, self._bucket_seconds)
+        bar = self._bar
+        if bar is not None and bar["symbol"] == symbol and bar["timestamp"] == bucket:
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += volume
+            return None
+
+        self._bar = {
+            "symbol": symbol,
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "volume": volume,
+            "timestamp": bucket,
+        }
+        return bar
+
+    def flush(self) -> dict | None:
+        bar, self._bar = self._bar, None
+        return bar
+
+
+def rollup_bars(
+    ticks: Iterable[tuple[str, float, int, datetime]],
+    bucket_seconds: int = 60,
+) -> Iterator[dict]:
+    """Fold ``(symbol, price, volume, timestamp)`` ticks into OHLCV bars.
+
+    Ticks must arrive ordered by ``(symbol, timestamp)``; each bar is yielded
+    as soon as its bucket closes, so memory use is one bar regardless of input.
+    """
+    builder = _BarBuilder(bucket_seconds)
+    for tick in ticks:
+        bar = builder.add(*tick)
+        if bar is not None:
+            yield bar
+    bar = builder.flush()
+    if bar is not None:
+        yield bar
+
+
+# --------------------------------------------------------------------------- #
+#  Schema
+# --------------------------------------------------------------------------- #
+
+async def create_partitioned_quotes(conn: AsyncConnection) -> None:
+    """Create ``quotes`` as a range-partitioned parent (PostgreSQL only).
+
+    Must run before ``SQLModel.metadata.create_all`` so the plain table is
+    skipped.  An existing unpartitioned ``quotes`` table is left untouched;
+    :class:`QuoteRetentionManager` falls back to window deletes for it.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    for ddl in _PARTITIONED_QUOTES_DDL:
+        await conn.execute(text(ddl))
+    if await is_partitioned(conn):
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_DEFAULT_PARTITION} PARTITION OF quotes DEFAULT"
+        ))
+
+
+def _dialect_name(conn: AsyncConnection | AsyncSession) -> str:
+    return (conn.bind.dialect if isinstance(conn, AsyncSession) else conn.dialect).name
+
+
+async def is_partitioned(conn: AsyncConnection | AsyncSession) -> bool:
+    """Whether ``quotes`` is a partitioned PostgreSQL table."""
+    if _dialect_name(conn) != "postgresql":
+        return False
+    result = await conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'quotes'"
+    ))
+    return result.scalar_one_or_none() is not None
+
+
+async def _lock_retention(conn: AsyncConnection | AsyncSession) -> None:
+    """Wait for other processes' retention work; held until this transaction ends.
+
+    Every worker runs the retention task, so without it two of them could
+    create the same partition or roll the same window up twice.
+    """
+    if _dialect_name(conn) == "postgresql":
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": _RETENTION_LOCK_KEY}
+        )
+
+
+def _quotes_table(name: str):
+    """``quotes`` columns addressed as ``name`` (the parent or one partition)."""
+    if name == "quotes":
+        return QuoteDB.__table__
+    return table(name, *(column(c.name, c.type) for c in QuoteDB.__table__.columns))
+
+
+class _Window(NamedTuple):
+    table: str
+    start: datetime
+    end: datetime
+    drop: bool  # drop ``table`` instead of deleting the window's rows
+
+
+# --------------------------------------------------------------------------- #
+#  Retention manager
+# --------------------------------------------------------------------------- #
+
+class QuoteRetentionManager:
+    """Keeps ``quotes`` bounded: pre-creates partitions, rolls up and drops old ones."""
+
+    def __init__(
+        self,
+        partition_days: int = 1,
+        retention_days: int = 7,
+        rollup_seconds: int = 60,
+        interval: float = 3600.0,
+        premake: int = 2,
+    ) -> None:
+        if partition_days < 1 or retention_days < 1 or rollup_seconds < 1:
+            raise ValueError("partition_days, retention_days and rollup_seconds must be >= 1")
+        self._partition_days = partition_days
+        self._retention_days = retention_days
+        self._rollup_seconds = rollup_seconds
+        self._interval = max(interval, 1.0)
+        self._premake = premake
+        self._task: asyncio.Task[None] | None = None
+
+    # ── lifecycle ──────────────────────────────────────────────
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Quote retention pass failed")
+            await asyncio.sleep(self._interval)
+
+    async def run_once(self, now: datetime | None = None) -> int:
+        """Ensure upcoming partitions exist and expire old windows.
+
+        Each expired window is rolled up and dropped in its own transaction.
+        Returns the number of windows expired.
+        """
+        from packages.db.engine import get_session_ctx
+
+        now = now or datetime.now(timezone.utc)
+        async with get_session_ctx() as session:
+            partitioned = await is_partitioned(session)
+            if partitioned:
+                await self.ensure_partitions(session, now)
+            windows = await self._expired_windows(session, now, partitioned)
+
+        for window in windows:
+            async with get_session_ctx() as session:
+                await self.expire_window(session, *window)
+        return len(windows)
+
+    # ── partitions ─────────────────────────────────────────────
+
+    async def ensure_partitions(
+        self,
+        conn: AsyncConnection | AsyncSession,
+        now: datetime | None = None,
+    ) -> None:
+        """Create the current and next ``premake`` windows' partitions.
+
+        A window overlapping an existing partition is skipped; its ticks land
+        in that partition or in ``quotes_default``.  Ticks already sitting in
+        ``quotes_default`` for a new window are moved into its partition
+        before it is attached.
+        """
+        now = now or datetime.now(timezone.utc)
+        await _lock_retention(conn)
+        existing = [(lo, hi) for _, lo, hi in await self._partitions(conn) if lo is not None]
+        width = timedelta(days=self._partition_days)
+        start = window_start(now, self._partition_days)
+        for i in range(self._premake + 1):
+            lo = start + i * width
+            hi = lo + width
+            if any(a < hi and lo < b for a, b in existing):
+                continue
+            name = partition_name(lo)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} (LIKE quotes INCLUDING DEFAULTS)"
+            ))
+            await conn.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {_DEFAULT_PARTITION} "
+                    "WHERE timestamp >= :lo AND timestamp < :hi RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                ),
+                {"lo": lo, "hi": hi},
+            )
+            await conn.execute(text(
+                f"ALTER TABLE quotes ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+            ))
+            existing.append((lo, hi))
+
+    async def expire_window(
+        self,
+        session: AsyncSession,
+        table_name: str,
+        start: datetime,
+        end: datetime,
+        drop: bool = False,
+    ) -> int:
+        """Roll ``[start, end)`` of ``table_name`` up into ``ohlcv`` and remove its raw ticks.
+
+        ``drop`` drops the table (a partition holding exactly this window)
+        instead of deleting the window's rows from it.  A window another
+        process expired first writes nothing.
+        """
+        await _lock_retention(session)
+        if drop:
+            exists = await session.execute(text("SELECT to_regclass(:name)"), {"name": table_name})
+            if exists.scalar_one_or_none() is None:
+                return 0
+        quotes = _quotes_table(table_name)
+        stmt = (
+            select(quotes.c.symbol, quotes.c.price, quotes.c.volume, quotes.c.timestamp)
+            .where(quotes.c.timestamp >= start, quotes.c.timestamp < end)
+            .order_by(quotes.c.symbol, quotes.c.timestamp)
+            .execution_options(yield_per=_INSERT_CHUNK)
+        )
+        result = await session.stream(stmt)
+
+        builder = _BarBuilder(self._rollup_seconds)
+        written = 0
+        chunk: list[dict] = []
+        async for symbol, price, volume, ts in result:
+            bar = builder.add(symbol, price, volume, ts)
+            if bar is not None:
+                chunk.append(bar)
+            if len(chunk) >= _INSERT_CHUNK:
+                await bulk_upsert(session, OHLCVDB, chunk, conflict=_BAR_KEY)
+                written += len(chunk)
+                chunk = []
+        bar = builder.flush()
+        if bar is not None:
+            chunk.append(bar)
+        if chunk:
+            await bulk_upsert(session, OHLCVDB, chunk, conflict=_BAR_KEY)
+            written += len(chunk)
+
+        if drop:
+            await session.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        else:
+            await session.execute(
+                delete(quotes).where(quotes.c.timestamp >= start, quotes.c.timestamp < end)
+            )
+        logger.info(
+            "Expired %s window %s – %s — %d bars written",
+            table_name, start.date(), end.date(), written,
+        )
+        return written
+
+    # ── introspection ──────────────────────────────────────────
+
+    async def _partitions(
+        self,
+        conn: AsyncConnection | AsyncSession,
+    ) -> list[tuple[str, datetime | None, datetime | None]]:
+        """``(name, lo, hi)`` of every ``quotes`` partition; ``DEFAULT`` has no bounds."""
+        result = await conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'quotes'"
+        ))
+        partitions = []
+        for name, bound in result.all():
+            lo, hi = parse_partition_bounds(bound or "") or (None, None)
+            partitions.append((name, lo, hi))
+        return partitions
+
+    async def _expired_windows(
+        self,
+        session: AsyncSession,
+        now: datetime,
+        partitioned: bool,
+    ) -> list[_Window]:
+        if not partitioned:
+            return await self._expired_rows(session, "quotes", now)
+
+        cutoff = now - timedelta(days=self._retention_days)
+        windows: list[_Window] = []
+        for name, lo, hi in await self._partitions(session):
+            if hi is not None and hi <= cutoff:
+                windows.append(_Window(name, lo, hi, True))
+            elif name == _DEFAULT_PARTITION:
+                windows.extend(await self._expired_rows(session, name, now))
+        return sorted(windows, key=lambda w: w.start)
+
+    async def _expired_rows(
+        self,
+        session: AsyncSession,
+        table_name: str,
+        now: datetime,
+    ) -> list[_Window]:
+        """Whole windows of ``table_name`` older than the retention period."""
+        cutoff = window_start(now - timedelta(days=self._retention_days), self._partition_days)
+        quotes = _quotes_table(table_name)
+        oldest = (await session.execute(select(func.min(quotes.c.timestamp)))).scalar_one_or_none()
+        if oldest is None:
+            return []
+        width = timedelta(days=self._partition_days)
+        windows: list[_Window] = []
+        start = window_start(oldest, self._partition_days)
+        while start < cutoff:
+            windows.append(_Window(table_name, start, start + width, False))
+            start += width
+        return windows
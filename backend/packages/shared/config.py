@@ -1,3 +1,4 @@
+from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
 import secrets as _secrets
@@ -26,16 +27,66 @@ class Settings(BaseSettings):
     environment: str = "development"
     port: int = 8001
     database_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = -1  # seconds; -1 keeps connections indefinitely
+    db_pool_pre_ping: bool = True
     twelvedata_api_key: str = ""
     data_provider: str = ""
     symbols: str = "AAPL,MSFT,TSLA"
     mock_stream_interval: float = 1.0
-    twelvedata_poll_interval: float = 60.0  # free tier: 8 credits/min
+    twelvedata_min_refresh_interval: float = 0.0  # min seconds between refreshes of one symbol
+    twelvedata_poll_interval: float | None = None  # deprecated, see _migrate_poll_interval
+    twelvedata_credits_per_minute: float = 8.0  # free tier: 8 credits/min, 1 per symbol
+    twelvedata_max_batch: int = 8  # symbols per /price request (API max 120)
+    twelvedata_base_url: str = "https://api.twelvedata.com"
+    synthetic_symbols: int = 1_000
+    synthetic_tick_rate: float = 50_000.0
+    synthetic_seed: int = 42
+    replay_source: str = ""  # db:ohlcv | db:quotes | CSV/Parquet paths or globs
+    replay_speed: float = 1.0  # 0 = as fast as possible
+    replay_loop: bool = False
+    replay_symbols: str = ""  # comma-separated filter; empty replays every symbol
+    replay_start: datetime | None = None  # ISO timestamps bounding the replay
+    replay_end: datetime | None = None
+    provider_queue_maxsize: int = 10_000
+    provider_backpressure: str = "drop_oldest"  # block | drop_oldest | conflate
+    # Multi-worker: one process polls upstream and fans ticks out over a Unix socket
+    quote_bus_enabled: bool = False
+    quote_bus_path: str = "/tmp/stocktrade-quotes.sock"
     firebase_project_id: str = ""
     firebase_auth_audience: str = ""
     pubsub_topic: str | None = None
     model_bucket: str | None = None
     agent_model_name: str = "ppo-default"
+    # Multi-worker: one process computes features/decisions into shared memory
+    agent_snapshot_enabled: bool = False
+    agent_snapshot_name: str = "stocktrade-agent"
+    agent_snapshot_capacity: int = 4_096
+    # Hot model reload: poll the checkpoint file, or a model_artifacts row by name
+    agent_model_watch_interval: float = 30.0  # seconds; 0 disables
+    agent_model_registry_name: str = ""
+    # Named models requested per decision, LRU-evicted beyond this budget
+    agent_model_cache_mb: float = 64.0
+    # Shadow evaluation: comma-separated model_artifacts names scored on live traffic
+    agent_shadow_models: str = ""
+    agent_shadow_batch_size: int = 256
+    agent_shadow_interval: float = 1.0
+    agent_inference_backend: str = "eager"  # eager | torchscript | int8 | compile
+    # torch thread pools per worker process (scripts/bench_threads.py)
+    torch_num_threads: int = 0  # 0 = CPU cores / WEB_CONCURRENCY
+    torch_interop_threads: int = 0  # 0 = torch default
+    # Replay buffer in memory-mapped files that survive restarts ("" = in memory)
+    agent_replay_dir: str = ""
+    agent_replay_capacity: int = 50_000
+
+    # Quote retention (raw ticks → ohlcv rollups)
+    quote_retention_enabled: bool = False
+    quote_partition_days: int = 1
+    quote_raw_retention_days: int = 7
+    quote_rollup_seconds: int = 60
+    quote_retention_interval: float = 3600.0
     
     # Security Configuration
     jwt_secret: str = ""
@@ -60,6 +111,24 @@ class Settings(BaseSettings):
             self.data_provider = "mock"
         return self
 
+    @model_validator(mode="after")
+    def _migrate_poll_interval(self) -> "Settings":
+        # TWELVEDATA_POLL_INTERVAL used to be the fixed delay between polling
+        # rounds; the credit budget paces polling now.
+        if self.twelvedata_poll_interval is not None:
+            import warnings
+
+            warnings.warn(
+                "TWELVEDATA_POLL_INTERVAL is deprecated: polling follows "
+                "TWELVEDATA_CREDITS_PER_MINUTE. Its value is used as "
+                "TWELVEDATA_MIN_REFRESH_INTERVAL; set that instead.",
+                FutureWarning,
+                stacklevel=2,
+            )
+            if not self.twelvedata_min_refresh_interval:
+                self.twelvedata_min_refresh_interval = self.twelvedata_poll_interval
+        return self
+
     @model_validator(mode="after")
     def _check_jwt_secret(self) -> "Settings":
         if not self.jwt_secret:
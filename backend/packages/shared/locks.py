@@ -0,0 +1,38 @@
+"""
+Cross-process locks on local files.
+
+:class:`LeaderLock` elects one process per lock file: the quote bus leader,
+the agent snapshot writer and the replay buffer's single writer all hold
+one.  POSIX only.
+"""
+
+from __future__ import annotations
+
+import os
+
+
+class LeaderLock:
+    """Non-blocking exclusive ``flock``; released by the OS if the holder dies."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._fd: int | None = None
+
+    def try_acquire(self) -> bool:
+        import fcntl
+
+        if self._fd is not None:
+            return True
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
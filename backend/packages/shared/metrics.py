@@ -43,6 +43,91 @@ AGENT_INFERENCE_ERRORS = Counter(
     "Count of agent inference errors raised.",
 )
 
+AGENT_MODEL_SWAPS = Counter(
+    "app_agent_model_swaps_total",
+    "Checkpoints hot-loaded into the serving agent.",
+    labelnames=("result",),
+)
+
+AGENT_MODEL_CACHE_REQUESTS = Counter(
+    "app_agent_model_cache_requests_total",
+    "Named-model lookups served from (hit) or loaded into (miss) the model cache.",
+    labelnames=("result",),
+)
+
+AGENT_MODEL_CACHE_BYTES = Gauge(
+    "app_agent_model_cache_bytes",
+    "Parameter bytes of the models held in the model cache.",
+)
+
+AGENT_MODEL_LOAD_LATENCY = Histogram(
+    "app_agent_model_load_seconds",
+    "Time to load a named model into the model cache.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+AGENT_SHADOW_DECISIONS = Counter(
+    "app_agent_shadow_decisions_total",
+    "Live decisions scored by a shadow model, by whether it agreed.",
+    labelnames=("model", "agreed"),
+)
+
+AGENT_SHADOW_DROPPED = Counter(
+    "app_agent_shadow_dropped_total",
+    "Live decisions dropped before shadow scoring because the queue was full.",
+)
+
+PROVIDER_QUEUE_DEPTH = Gauge(
+    "app_provider_queue_depth",
+    "Quotes buffered between a data provider and its consumers.",
+    labelnames=("provider",),
+)
+
+PROVIDER_QUOTES_DROPPED = Counter(
+    "app_provider_quotes_dropped_total",
+    "Quotes discarded by a provider queue's backpressure policy.",
+    labelnames=("provider", "policy"),
+)
+
+QUOTE_BUS_SUBSCRIBERS = Gauge(
+    "app_quote_bus_subscribers",
+    "Worker processes subscribed to this process's quote bus.",
+)
+
+QUOTE_BUS_FRAMES_DROPPED = Counter(
+    "app_quote_bus_frames_dropped_total",
+    "Quote bus frames discarded because a subscriber fell behind.",
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "app_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the database pool.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "app_db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool.",
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "app_db_pool_overflow_connections",
+    "Database connections open beyond pool_size (max_overflow headroom in use).",
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "app_db_query_duration_seconds",
+    "Duration of repository methods, labelled Repository.method.",
+    labelnames=("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+DB_QUERY_ERRORS = Counter(
+    "app_db_query_errors_total",
+    "Count of repository methods that raised.",
+    labelnames=("operation",),
+)
+
 
 def websocket_connected(endpoint: str) -> None:
     """Track a new connection for the provided endpoint."""
@@ -61,6 +146,76 @@ def websocket_message_sent(endpoint: str) -> None:
     WEBSOCKET_MESSAGES_OUT.labels(endpoint=endpoint).inc()
 
 
+def agent_model_swap(result: str) -> None:
+    """Track a hot model reload (``swapped`` or ``failed``)."""
+    AGENT_MODEL_SWAPS.labels(result=result).inc()
+
+
+def agent_model_cache_request(result: str) -> None:
+    """Track a model cache lookup (``hit`` or ``miss``)."""
+    AGENT_MODEL_CACHE_REQUESTS.labels(result=result).inc()
+
+
+def agent_model_cache_bytes(nbytes: int) -> None:
+    """Publish the model cache's current size."""
+    AGENT_MODEL_CACHE_BYTES.set(nbytes)
+
+
+def agent_shadow_decisions(model: str, agreed: int, total: int) -> None:
+    """Track a scored shadow batch and how many decisions matched the live model."""
+    AGENT_SHADOW_DECISIONS.labels(model=model, agreed="true").inc(agreed)
+    AGENT_SHADOW_DECISIONS.labels(model=model, agreed="false").inc(total - agreed)
+
+
+def agent_shadow_dropped(count: int = 1) -> None:
+    """Track live decisions the shadow queue had no room for."""
+    AGENT_SHADOW_DROPPED.inc(count)
+
+
+def provider_queue_depth(provider: str, depth: int) -> None:
+    """Publish the current depth of a provider's quote queue."""
+    PROVIDER_QUEUE_DEPTH.labels(provider=provider).set(depth)
+
+
+def provider_quote_dropped(provider: str, policy: str, count: int = 1) -> None:
+    """Track quotes discarded (or superseded) under backpressure."""
+    PROVIDER_QUOTES_DROPPED.labels(provider=provider, policy=policy).inc(count)
+
+
+def quote_bus_subscribers(count: int) -> None:
+    """Publish how many workers are attached to the quote bus."""
+    QUOTE_BUS_SUBSCRIBERS.set(count)
+
+
+def quote_bus_frame_dropped(count: int = 1) -> None:
+    """Track bus frames shed for a slow subscriber."""
+    QUOTE_BUS_FRAMES_DROPPED.inc(count)
+
+
+def db_pool_checkout(wait_seconds: float) -> None:
+    """Record how long a caller waited for a pooled connection."""
+    DB_POOL_CHECKOUT_WAIT.observe(wait_seconds)
+
+
+def db_pool_usage(checked_out: int, overflow: int) -> None:
+    """Publish the pool's current checked-out and overflow connection counts."""
+    DB_POOL_CHECKED_OUT.set(checked_out)
+    DB_POOL_OVERFLOW.set(max(overflow, 0))
+
+
+@contextmanager
+def track_db_query(operation: str) -> Generator[None, None, None]:
+    """Context manager that records repository query duration and errors."""
+    start = perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_QUERY_ERRORS.labels(operation=operation).inc()
+        raise
+    finally:
+        DB_QUERY_LATENCY.labels(operation=operation).observe(perf_counter() - start)
+
+
 @contextmanager
 def track_inference_latency() -> Generator[None, None, None]:
     """Context manager that records inference latency and errors."""
@@ -71,4 +226,12 @@ def track_inference_latency() -> Generator[None, None, None]:
         AGENT_INFERENCE_ERRORS.inc()
         raise
     else:
-        AGENT_INFERENCE_LATENCY.observe(perf_counter() - start)
\ No newline at end of file
+        AGENT_INFERENCE_LATENCY.observe(perf_counter() - start)
+
+
+@contextmanager
+def track_model_load() -> Generator[None, None, None]:
+    """Context manager that records how long a model cache load took."""
+    start = perf_counter()
+    yield
+    AGENT_MODEL_LOAD_LATENCY.observe(perf_counter() - start)
@@ -1,6 +1,9 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Annotated, Literal
+from functools import lru_cache
+from typing import Annotated, Any, Literal
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -34,6 +37,11 @@ class Quote(BaseModel):
     price: float = Field(..., ge=0)
     volume: int = Field(..., ge=0)
     timestamp: datetime
+    # Optional bar fields for providers that emit OHLCV-rich ticks.
+    open: float | None = None
+    high: float | None = None
+    low: float | None = None
+    close: float | None = None
 
     @field_validator("symbol", mode="before")
     @classmethod
@@ -41,6 +49,71 @@ class Quote(BaseModel):
         return v.strip().upper()
 
 
+_last_timestamp: tuple[datetime | None, str] = (None, "")
+
+
+def _json_timestamp(ts: datetime) -> str:
+    # Same wire format pydantic uses for ``Quote.model_dump(mode="json")``.
+    # Providers stamp a whole batch with one datetime, so remember the last one.
+    global _last_timestamp
+    cached, text = _last_timestamp
+    if ts is cached:
+        return text
+    text = ts.isoformat()
+    if text.endswith("+00:00"):
+        text = text[:-6] + "Z"
+    _last_timestamp = (ts, text)
+    return text
+
+
+# Rows in one transport frame share a handful of timestamps.
+_parse_timestamp = lru_cache(maxsize=256)(datetime.fromisoformat)
+
+
+@dataclass(slots=True)
+class Tick:
+    """Trusted, unvalidated quote used on the provider → consumer hot path.
+
+    Providers build these directly (symbols already upper-case, prices
+    already numeric) so per-tick cost is a plain object allocation.
+    :meth:`as_dict` gives the JSON payload a validated :class:`Quote` would.
+    """
+
+    symbol: str
+    price: float
+    volume: int
+    timestamp: datetime
+    open: float | None = None
+    high: float | None = None
+    low: float | None = None
+    close: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """JSON-ready dict identical to ``Quote(...).model_dump(mode="json")``."""
+        return {
+            "symbol": self.symbol,
+            "price": self.price,
+            "volume": self.volume,
+            "timestamp": _json_timestamp(self.timestamp),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+        }
+
+    def as_row(self) -> tuple:
+        """Compact positional form for inter-process transport (JSON-safe)."""
+        return (
+            self.symbol, self.price, self.volume, _json_timestamp(self.timestamp),
+            self.open, self.high, self.low, self.close,
+        )
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "Tick":
+        symbol, price, volume, ts, o, h, lo, c = row
+        return cls(symbol, price, volume, _parse_timestamp(ts), o, h, lo, c)
+
+
 class Order(BaseModel):
     symbol: str
     quantity: int = Field(..., gt=0)
@@ -58,6 +131,7 @@ class AgentAction(BaseModel):
     side: OrderSide
     confidence: float = Field(..., ge=0, le=1)
     generated_at: datetime
+    model: str | None = None  # "name@version" when a registry model decided
 
 
 class AgentStatus(BaseModel):
@@ -71,6 +145,40 @@ class AgentStatus(BaseModel):
     updated_at: datetime
 
 
+class ShadowReport(BaseModel):
+    model: str
+    live_model: str
+    decisions: int
+    agreement_rate: float
+    shadow_return: float  # following the challenger's decisions, long/flat, no costs
+    live_return: float  # following the live decisions on the same states
+
+
+class TrainingJobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class TrainRequest(BaseModel):
+    steps: int = Field(default=1, ge=1, le=100_000)
+
+
+class TrainingJobStatus(BaseModel):
+    id: str
+    state: TrainingJobState
+    steps: int
+    completed_steps: int = 0
+    loss: float | None = None
+    epsilon: float | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
 class StreamRequest(BaseModel):
     symbol: str
     channel: Literal["trades", "quotes"] = "quotes"
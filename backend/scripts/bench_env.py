@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Throughput of experience collection with ``VectorTradingEnv`` on synthetic
+bars: raw env steps with random actions, and full ε-greedy collection
+(batched forward pass + ``ReplayBuffer.push_batch``).
+
+Usage: python scripts/bench_env.py [--envs 1024] [--steps 500] [--bars 200000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packages.agent.ddqn import DDQNAgent  # noqa: E402
+from packages.agent.env import VectorTradingEnv, collect_experience  # noqa: E402
+from packages.backtest import Bars  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--envs", type=int, default=1_024)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=200_000)
+    parser.add_argument("--symbols", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    bars = []
+    for i in range(args.symbols):
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.001, args.bars)))
+        ts = 1_577_800_000 + np.arange(args.bars, dtype=np.int64) * 60
+        volume = rng.integers(100, 1_000, args.bars).astype(np.float64)
+        bars.append(Bars(f"SYM{i}", ts, close, close * 1.001, close * 0.999, close, volume))
+
+    start = time.perf_counter()
+    env = VectorTradingEnv(bars, num_envs=args.envs, seed=0)
+    env.reset()
+    print(f"setup ({args.symbols} x {args.bars:,} bars): {time.perf_counter() - start:.2f}s")
+
+    actions = rng.integers(0, 3, (args.steps, args.envs))
+    start = time.perf_counter()
+    for a in actions:
+        env.step(a)
+    elapsed = time.perf_counter() - start
+    print(f"env.step, random actions: {args.steps * args.envs / elapsed:>12,.0f} steps/s")
+
+    agent = DDQNAgent(buffer_capacity=args.steps * args.envs)
+    start = time.perf_counter()
+    count = collect_experience(env, agent, args.steps, epsilon=0.1)
+    elapsed = time.perf_counter() - start
+    print(f"collect_experience:       {count / elapsed:>12,.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Latency and decision parity of the DQNetwork inference backends
+(eager, torchscript, int8, compile) at several batch sizes.
+
+Parity is measured against the eager float network on random states: the
+largest absolute Q-value difference and the share of identical argmax
+decisions.
+
+Usage: python scripts/bench_inference.py [--checkpoint models/ddqn_weights.pt]
+           [--backends eager,torchscript,int8,compile] [--iters 2000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packages.agent.ddqn import DQNetwork  # noqa: E402
+from packages.agent.feature_engine import FeatureEngine  # noqa: E402
+from packages.agent.inference import BACKENDS, optimize  # noqa: E402
+
+
+def _latencies(fn, x: torch.Tensor, iters: int) -> np.ndarray:
+    out = np.empty(iters)
+    with torch.no_grad():
+        for _ in range(min(iters, 50)):  # warm-up
+            fn(x)
+        for i in range(iters):
+            start = time.perf_counter()
+            fn(x)
+            out[i] = time.perf_counter() - start
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", help="agent checkpoint (default: random weights)")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--batches", default="1,32,512")
+    parser.add_argument("--iters", type=int, default=2_000)
+    parser.add_argument("--parity-states", type=int, default=10_000)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    net = DQNetwork(FeatureEngine.STATE_DIM, 3)
+    if args.checkpoint:
+        net.load_state_dict(torch.load(args.checkpoint, map_location="cpu")["online"])
+    net.eval()
+
+    states = torch.from_numpy(
+        np.random.default_rng(0).normal(size=(args.parity_states, FeatureEngine.STATE_DIM))
+        .clip(-10, 10).astype(np.float32)
+    )
+    with torch.no_grad():
+        reference = net(states)
+    batches = [int(b) for b in args.batches.split(",")]
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads")
+    print(f"{'backend':<12} {'build':>8} {'batch':>6} {'p50 µs':>10} {'p99 µs':>10} "
+          f"{'max |Δq|':>10} {'agree':>8}")
+    for backend in args.backends.split(","):
+        start = time.perf_counter()
+        try:
+            fn = optimize(net, backend, FeatureEngine.STATE_DIM)
+        except Exception as exc:
+            print(f"{backend:<12} unavailable: {exc}")
+            continue
+        build = time.perf_counter() - start
+        with torch.no_grad():
+            q = fn(states)
+        max_diff = float((q - reference).abs().max())
+        agree = float((q.argmax(1) == reference.argmax(1)).float().mean())
+        for batch in batches:
+            lat = _latencies(fn, states[:batch], args.iters) * 1e6
+            print(f"{backend:<12} {build:>7.2f}s {batch:>6} {np.percentile(lat, 50):>10.1f} "
+                  f"{np.percentile(lat, 99):>10.1f} {max_diff:>10.2e} {agree:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
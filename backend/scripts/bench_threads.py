@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Inference and train_step throughput of the DDQN agent per torch thread
+count, to choose TORCH_NUM_THREADS / TORCH_INTEROP_THREADS for a deployment.
+
+torch sizes its inter-op pool once per process, so every setting runs in a
+fresh child process.  Run it with ``--workers N`` concurrent copies per
+setting to reproduce N gunicorn workers sharing the machine.
+
+Usage: python scripts/bench_threads.py [--threads 1,2,4,8] [--interop 1]
+           [--workers 1] [--seconds 2]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_BATCHES = (1, 32, 512)
+
+
+def _rate(fn, seconds: float) -> float:
+    fn()  # warm-up
+    count, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        fn()
+        count += 1
+    return count / elapsed
+
+
+def _child(threads: int, interop: int, seconds: float) -> None:
+    from packages.agent.ddqn import DDQNAgent
+    from packages.agent.inference import configure_threads
+
+    configure_threads(threads, interop)
+    rng = np.random.default_rng(0)
+    agent = DDQNAgent(batch_size=256, buffer_capacity=50_000)
+    states = rng.normal(size=(50_000, 14)).astype(np.float32)
+    agent.replay.push_batch(
+        states, rng.integers(0, 3, 50_000), rng.normal(size=50_000).astype(np.float32),
+        np.roll(states, -1, axis=0), np.zeros(50_000, dtype=np.float32),
+    )
+    result = {
+        f"infer_{n}": _rate(lambda n=n: agent.q_values_batch(states[:n]), seconds) * n
+        for n in _BATCHES
+    }
+    result["train_step"] = _rate(agent.train_step, seconds)
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", default=",".join(
+        str(n) for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)
+    ))
+    parser.add_argument("--interop", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="concurrent processes per setting")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        _child(args.child, args.interop, args.seconds)
+        return
+
+    print(f"{os.cpu_count()} cores, {args.workers} worker(s), inter-op threads {args.interop}")
+    header = "".join(f"{f'infer b={n} st/s':>18}" for n in _BATCHES)
+    print(f"{'threads':>7}{header}{'train_step/s':>14}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        procs = [
+            subprocess.Popen(
+                [sys.executable, __file__, "--child", str(threads),
+                 "--interop", str(args.interop), "--seconds", str(args.seconds)],
+                stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(args.workers)
+        ]
+        results = [json.loads(p.communicate()[0]) for p in procs]
+        # per-worker mean: what one worker sustains while the others run too
+        mean = {k: sum(r[k] for r in results) / len(results) for k in results[0]}
+        row = "".join(f"{mean[f'infer_{n}']:>18,.0f}" for n in _BATCHES)
+        print(f"{threads:>7}{row}{mean['train_step']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
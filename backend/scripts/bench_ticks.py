@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-tick cost of the pydantic ``Quote`` path versus the
+trusted ``Tick`` fast path (construction, and construction + JSON dict).
+
+Usage: python scripts/bench_ticks.py [--ticks 100000] [--repeat 5]
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from packages.shared.schemas import Quote, Tick  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    rows = [("AAPL", 100.0 + i * 0.01, i, 99.5, 101.0, 99.0, 100.5) for i in range(args.ticks)]
+
+    def quote_build():
+        for s, p, v, o, h, lo, c in rows:
+            Quote(symbol=s, price=p, volume=v, timestamp=now, open=o, high=h, low=lo, close=c)
+
+    def quote_dump():
+        for s, p, v, o, h, lo, c in rows:
+            Quote(
+                symbol=s, price=p, volume=v, timestamp=now, open=o, high=h, low=lo, close=c
+            ).model_dump(mode="json")
+
+    def tick_build():
+        for s, p, v, o, h, lo, c in rows:
+            Tick(s, p, v, now, o, h, lo, c)
+
+    def tick_dump():
+        for s, p, v, o, h, lo, c in rows:
+            Tick(s, p, v, now, o, h, lo, c).as_dict()
+
+    cases = [
+        ("Quote(...)", quote_build),
+        ("Tick(...)", tick_build),
+        ("Quote(...).model_dump(json)", quote_dump),
+        ("Tick(...).as_dict()", tick_dump),
+    ]
+    results = {}
+    print(f"{'path':<30} {'ns/tick':>10}")
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        results[name] = best / args.ticks * 1e9
+        print(f"{name:<30} {results[name]:>10.0f}")
+    print()
+    print(f"construction speed-up: {results['Quote(...)'] / results['Tick(...)']:.1f}x")
+    print(
+        "construction + dump speed-up: "
+        f"{results['Quote(...).model_dump(json)'] / results['Tick(...).as_dict()']:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import asyncio
+import os
+import tempfile
+
+# Run the DB-backed tests against a throwaway SQLite file unless a real
+# DATABASE_URL is provided.  Must happen before settings are first loaded.
+_TMP_DIR = tempfile.mkdtemp(prefix="stocktrade-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP_DIR}/test.db")
+
+
+def pytest_sessionstart(session):
+    from packages.db.engine import close_db, init_db
+
+    async def _create_tables() -> None:
+        await init_db()
+        await close_db()
+
+    asyncio.run(_create_tables())
@@ -0,0 +1,391 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import torch
+from sqlalchemy import select
+
+from packages.agent.ddqn import DDQNAgent
+from packages.agent.feature_engine import FeatureEngine
+from packages.agent.inference import configure_threads
+from packages.agent.jobs import TrainingJobManager
+from packages.agent.model_cache import ModelCache, ModelNotFound
+from packages.agent.registry import ModelWatcher
+from packages.agent.replay_store import MemmapReplayBuffer
+from packages.agent.service import AgentService
+from packages.agent.shadow import ShadowEvaluator, stored_reports
+from packages.agent.snapshot import FLAT_PORTFOLIO, AgentSnapshot, SnapshotTable
+from packages.data.provider import BaseAsyncProvider
+from packages.db.engine import get_session_ctx
+from packages.db.models import ShadowDecisionDB, new_uuid
+from packages.db.repositories import ModelArtifactRepository, ShadowDecisionRepository
+from packages.shared.schemas import OrderSide, Tick, TrainingJobState
+
+
+def _ticks(symbol: str, count: int) -> list[Tick]:
+    now = datetime.now(timezone.utc)
+    return [Tick(symbol, 100.0 + np.sin(i / 3) * 5, 1_000 + i, now) for i in range(count)]
+
+
+def test_feature_engine_split_matches_full_state():
+    engine = FeatureEngine()
+    for tick in _ticks("AAPL", 40):
+        engine.update(tick.as_dict())
+    portfolio = {"position_flag": 1, "cash": 5.0, "total_value": 10.0}
+    state = engine.get_state(portfolio)
+    assert state.shape == (FeatureEngine.STATE_DIM,)
+    assert np.array_equal(state[: FeatureEngine.MARKET_DIM], engine.market_features())
+    assert state[9] == 1.0 and state[11] == 0.5
+
+
+def _hammer(name: str, rounds: int) -> None:
+    table = SnapshotTable.attach(name)
+    for k in range(1, rounds):
+        value = np.full(14, k, dtype=np.float32)
+        table.publish("AAPL", value, value[:3], k % 3, float(k), float(k))
+    table.close()
+
+
+def test_snapshot_readers_never_see_torn_writes():
+    name = f"snap-test-{os.getpid()}"
+    writer = SnapshotTable.create(name, capacity=8)
+    writer.publish("AAPL", np.zeros(14, np.float32), np.zeros(3, np.float32), 0, 0.0, 0.0)
+    proc = multiprocessing.get_context("fork").Process(target=_hammer, args=(name, 20_000))
+    proc.start()
+    reader = SnapshotTable.attach(name)
+    seen = set()
+    while proc.is_alive() or not seen:
+        entry = reader.read("AAPL")
+        if entry is not None:
+            k = entry.price
+            assert (entry.state == k).all() and (entry.q_values == k).all()
+            assert entry.confidence == k
+            seen.add(k)
+    proc.join()
+    assert reader.symbols == ["AAPL"]
+    reader.close()
+    writer.close()
+    assert len(seen) > 1
+
+
+class _Provider(BaseAsyncProvider):
+    name = "test"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_writer_computes_once_for_all_readers():
+    name = f"snap-agent-{os.getpid()}"
+    provider = _Provider()
+    agent = DDQNAgent()
+    writer = AgentSnapshot(provider, agent, name=name, check_interval=0.05)
+    await writer.start()
+    reader_service = AgentService(_Provider())
+    reader_service._agent = agent
+    reader_service.enable_snapshot(name)
+    await reader_service.start()
+    assert (writer.role, reader_service._snapshot.role) == ("writer", "reader")
+
+    await provider._publish_many(_ticks("AAPL", 40) + _ticks("MSFT", 10))
+    await writer.flush()
+    entry = reader_service._snapshot.read("AAPL")
+    assert entry is not None and reader_service._snapshot.read("MSFT") is None
+
+    action = reader_service.get_action("AAPL", FLAT_PORTFOLIO)
+    assert action.side == [OrderSide.HOLD, OrderSide.BUY, OrderSide.SELL][entry.action]
+    assert action.confidence == pytest.approx(entry.confidence)
+    # another portfolio reuses the shared indicators and re-runs the net locally
+    long_state = FeatureEngine.compose(entry.market, {"position_flag": 1, "cash": 0.0})
+    expected = int(np.argmax(agent.q_values(long_state)))
+    held = reader_service.get_action("AAPL", {"position_flag": 1, "cash": 0.0})
+    assert held.side == [OrderSide.HOLD, OrderSide.BUY, OrderSide.SELL][expected]
+
+    await reader_service.stop()
+    await writer.stop()
+
+
+def _filled_agent(transitions: int = 256) -> DDQNAgent:
+    agent = DDQNAgent(batch_size=32)
+    rng = np.random.default_rng(0)
+    states = rng.normal(size=(transitions, 14)).astype(np.float32)
+    agent.replay.push_batch(
+        states, rng.integers(0, 3, transitions), rng.normal(size=transitions),
+        np.roll(states, -1, axis=0), np.zeros(transitions),
+    )
+    return agent
+
+
+def _wait(job, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.done
+
+
+def test_training_jobs_run_off_thread_and_publish_weights(tmp_path):
+    agent = _filled_agent()
+    before = [p.detach().clone() for p in agent.online_net.parameters()]
+    manager = TrainingJobManager(agent, checkpoint=tmp_path / "w.pt", sync_every=10)
+    try:
+        job = manager.submit(steps=25)
+        _wait(job)
+        assert job.state is TrainingJobState.COMPLETED and job.completed_steps == 25
+        assert agent.step_count == 25 and job.loss is not None
+        after = list(agent.online_net.parameters())
+        assert any(not torch.equal(b, a) for b, a in zip(before, after))
+        assert (tmp_path / "w.pt").exists()
+
+        # a job cancelled while still queued never trains
+        blocker = manager.submit(steps=200)
+        queued = manager.submit(steps=5)
+        manager.cancel(queued.id)
+        _wait(blocker)
+        _wait(queued)
+        assert queued.state is TrainingJobState.CANCELLED and queued.completed_steps == 0
+    finally:
+        manager.shutdown()
+
+
+def test_training_job_with_empty_buffer_fails_without_steps():
+    manager = TrainingJobManager(DDQNAgent(), checkpoint=None)
+    try:
+        job = manager.submit(steps=3)
+        _wait(job)
+        assert job.state is TrainingJobState.FAILED and job.completed_steps == 0
+        assert "fewer than one batch" in job.error
+    finally:
+        manager.shutdown()
+
+
+def test_one_step_jobs_checkpoint_on_a_cadence(tmp_path):
+    saves = []
+    manager = TrainingJobManager(
+        _filled_agent(), checkpoint=tmp_path / "w.pt", on_checkpoint=saves.append,
+        checkpoint_every=10, checkpoint_interval=3600,
+    )
+    try:
+        for _ in range(25):
+            _wait(manager.submit(steps=1))
+        # the first job, then every 10 steps
+        assert len(saves) == 3
+    finally:
+        manager.shutdown()
+    # shutdown saves the remaining 4 steps
+    assert len(saves) == 4
+
+
+@pytest.mark.asyncio
+async def test_service_falls_back_to_memory_on_a_mismatched_replay_dir(tmp_path):
+    MemmapReplayBuffer(tmp_path / "replay", capacity=8, state_dim=14).close()
+    service = AgentService(_Provider(), replay_dir=tmp_path / "replay", replay_capacity=16)
+    try:
+        assert service._replay_store is None
+        assert not isinstance(service._agent.replay, MemmapReplayBuffer)
+    finally:
+        await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_model_watcher_hot_swaps_new_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the service's checkpoint path is relative
+    service = AgentService(_Provider())
+    service.enable_model_watch(interval=0)
+    agent, watcher = service._agent, service._watcher
+    agent.batch_size = 32
+    agent.replay = _filled_agent().replay
+    state = np.linspace(-1, 1, 14).astype(np.float32)
+    try:
+        # the service's own job checkpoint is acknowledged, not reloaded
+        _wait(service.jobs.submit(steps=5))
+        assert (tmp_path / "models/ddqn_weights.pt").exists()
+        assert not await watcher.check()
+
+        trained = DDQNAgent(epsilon=0.3)
+        trained.step_count = 1_000
+        trained.save("models/ddqn_weights.pt")
+        old_net = agent.online_net
+        old_q = agent.q_values(state)
+
+        assert await watcher.check()
+        assert agent.online_net is not old_net
+        assert agent.q_values(state) == pytest.approx(trained.q_values(state))
+        assert agent.epsilon == 0.3 and agent.step_count == 1_000
+        with torch.no_grad():  # a decision holding the old reference completes on it
+            assert old_net(torch.from_numpy(state)).tolist() == pytest.approx(old_q)
+        assert not await watcher.check()
+
+        # the next job trains from the swapped-in model, not the old learner
+        job = service.jobs.submit(steps=5)
+        _wait(job)
+        assert job.state is TrainingJobState.COMPLETED and agent.step_count == 1_005
+    finally:
+        await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_model_watcher_skips_a_published_checkpoint_this_process_wrote(tmp_path):
+    agent, path, name = DDQNAgent(), tmp_path / "ddqn.pt", f"own-{new_uuid()[:8]}"
+    published = []
+    watcher = ModelWatcher(agent, path, registry_name=name, on_publish=published.append)
+    served = agent.online_net
+
+    agent.save(str(path), before_replace=watcher.acknowledge)
+    async with get_session_ctx() as session:
+        await ModelArtifactRepository(session).publish(name, "v1", str(path))
+    assert not await watcher.check()
+    assert watcher.version == "v1" and agent.online_net is served
+
+    DDQNAgent().save(str(path))  # someone else's model at the same path
+    async with get_session_ctx() as session:
+        await ModelArtifactRepository(session).publish(name, "v2", str(path))
+    assert await watcher.check() and agent.online_net is not served
+    assert published == [name, name]  # e.g. ModelCache.invalidate, for both versions
+
+
+@pytest.mark.asyncio
+async def test_model_cache_loads_lazily_and_evicts_least_recently_used(tmp_path):
+    agents, names = {}, []
+    async with get_session_ctx() as session:
+        for i in range(3):
+            name = f"cache-{new_uuid()[:8]}"
+            agents[name] = DDQNAgent()
+            agents[name].save(str(tmp_path / f"{i}.pt"))
+            await ModelArtifactRepository(session).publish(name, "v1", str(tmp_path / f"{i}.pt"))
+            names.append(name)
+    a, b, c = names
+    net_bytes = sum(p.numel() * p.element_size() for p in DDQNAgent().online_net.parameters())
+    cache = ModelCache(max_bytes=2 * net_bytes)
+    loads = []
+    load = cache._load
+    cache._load = lambda *key: loads.append(key[:2]) or load(*key)
+    state = np.linspace(-1, 1, 14).astype(np.float32)
+
+    # concurrent first requests share one load; the waiter counts as a hit
+    first, again = await asyncio.gather(cache.get(a), cache.get(a))
+    assert first is again and loads == [(a, "v1")]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.q_values(state) == pytest.approx(agents[a].q_values(state))
+    await cache.get(b)
+    await cache.get(a, "v1")  # pinned version already cached: no lookup
+    await cache.get(c)  # over budget: b is the least recently used
+    assert (a, "v1") in cache and (c, "v1") in cache and (b, "v1") not in cache
+    assert cache.nbytes == 2 * net_bytes and len(loads) == 3
+
+    with pytest.raises(ModelNotFound):
+        await cache.get(a, "v2")
+    with pytest.raises(ModelNotFound):
+        await cache.get("no-such-model")
+
+    # cancelling the request that started a load leaves the other waiters alone
+    cache, release = ModelCache(), threading.Event()
+    load = cache._load
+    cache._load = lambda *key: release.wait(5) and load(*key)
+    owner = asyncio.create_task(cache.get(b))
+    while (b, "v1") not in cache._loading:
+        await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(cache.get(b))
+    while cache.hits == 0:
+        await asyncio.sleep(0.01)
+    owner.cancel()
+    release.set()
+    assert (await waiter).name == b and (b, "v1") in cache
+    with pytest.raises(asyncio.CancelledError):
+        await owner
+
+
+@pytest.mark.asyncio
+async def test_shadow_models_score_live_decisions_in_batches(tmp_path):
+    live = DDQNAgent()
+    same, other = f"shadow-{new_uuid()[:8]}", f"shadow-{new_uuid()[:8]}"
+    live.save(str(tmp_path / "same.pt"))
+    DDQNAgent().save(str(tmp_path / "other.pt"))
+    async with get_session_ctx() as session:
+        repo = ModelArtifactRepository(session)
+        await repo.publish(same, "v1", str(tmp_path / "same.pt"))
+        await repo.publish(other, "v1", str(tmp_path / "other.pt"))
+
+    shadow = ShadowEvaluator(ModelCache(), [same, other], live_model="live", batch_size=16)
+    states = np.random.default_rng(0).normal(size=(40, 14)).astype(np.float32)
+    for i, state in enumerate(states):
+        q = live.q_values(state)
+        shadow.submit("AAPL", 100.0 + i, state, int(np.argmax(q)), q)
+    assert await shadow.flush() == 80  # 40 decisions x 2 challengers, in 3 batches
+    await shadow.stop()
+
+    async with get_session_ctx() as session:
+        reports = await stored_reports(ShadowDecisionRepository(session))
+        row = (await session.execute(
+            select(ShadowDecisionDB).where(ShadowDecisionDB.model == f"{same}@v1").limit(1)
+        )).scalar_one()
+    by_model = {r.model: r for r in reports}
+    report = by_model[f"{same}@v1"]
+    assert report.decisions == 40 and report.agreement_rate == 1.0
+    assert report.shadow_return == pytest.approx(report.live_return)
+    assert by_model[f"{other}@v1"].decisions == 40
+    assert row.q_values == pytest.approx(row.live_q_values, abs=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_shadow_reports_replay_long_flat_returns():
+    model, t0 = f"replay-{new_uuid()[:8]}@1", datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+    def row(i, price, side, live_side):
+        return {
+            "model": model, "live_model": "live", "symbol": "AAPL", "price": price,
+            "side": side, "live_side": live_side, "q_values": [], "live_q_values": [],
+            "timestamp": t0 + timedelta(minutes=i),
+        }
+
+    async with get_session_ctx() as session:
+        repo = ShadowDecisionRepository(session)
+        await repo.log_batch([
+            row(0, 100.0, "BUY", "HOLD"),
+            row(1, 110.0, "SELL", "BUY"),
+            row(2, 121.0, "HOLD", "HOLD"),
+        ])
+        [report] = await stored_reports(repo, model)
+    assert report.decisions == 3 and report.live_model == "live"
+    assert report.agreement_rate == pytest.approx(1 / 3)
+    assert report.shadow_return == pytest.approx(0.10)  # long 100 → 110
+    assert report.live_return == pytest.approx(0.10)  # long 110 → 121
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "int8"])
+def test_inference_backends_match_eager_and_follow_weight_updates(backend):
+    agent, trained = DDQNAgent(), _filled_agent()
+    for _ in range(5):
+        trained.train_step()
+    states = np.random.default_rng(1).normal(size=(256, 14)).astype(np.float32)
+    tol = 0 if backend == "torchscript" else 0.05
+
+    agent.set_inference_backend(backend)
+    assert agent.inference_backend == backend
+    with torch.no_grad():
+        eager = agent.online_net(torch.from_numpy(states)).numpy()
+    assert np.abs(agent.q_values_batch(states) - eager).max() <= tol
+
+    # the variant copies the weights, so it must be rebuilt on every sync
+    agent.copy_weights_from(trained)
+    assert np.abs(agent.q_values_batch(states) - trained.q_values_batch(states)).max() <= tol
+
+
+def test_unknown_inference_backend_falls_back_to_eager():
+    agent = DDQNAgent()
+    agent.set_inference_backend("tensorrt")
+    assert agent.inference_backend == "eager" and agent._serving_net() is agent.online_net
+
+
+def test_configure_threads_splits_cores_between_workers(monkeypatch):
+    before = torch.get_num_threads()
+    monkeypatch.setenv("WEB_CONCURRENCY", str(2 * (os.cpu_count() or 1)))
+    try:
+        assert configure_threads()[0] == 1  # more workers than cores
+        monkeypatch.setenv("WEB_CONCURRENCY", "1")
+        assert configure_threads()[0] == (os.cpu_count() or 1)
+        assert configure_threads(2)[0] == 2
+    finally:
+        torch.set_num_threads(before)
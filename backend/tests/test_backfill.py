@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from twelvedata_stub import TwelveDataStub
+
+from packages.data.backfill import TwelveDataBackfill, plan_windows
+from packages.db.engine import get_session_ctx
+from packages.db.repositories import OHLCVRepository
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+T0 = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+
+async def _bars(symbol: str) -> list:
+    async with get_session_ctx() as session:
+        return list(await OHLCVRepository(session).get_range(symbol, T0, T0 + timedelta(days=1)))
+
+
+async def test_plan_windows_covers_range_without_overlap():
+    windows = plan_windows("aapl", T0, T0 + timedelta(minutes=249), "1min", outputsize=100)
+    assert [(w.start - T0, w.end - T0) for w in windows] == [
+        (timedelta(0), timedelta(minutes=99)),
+        (timedelta(minutes=100), timedelta(minutes=199)),
+        (timedelta(minutes=200), timedelta(minutes=249)),
+    ]
+    assert windows[0].symbol == "AAPL"
+
+
+async def test_backfill_pages_concurrently_and_resumes(tmp_path):
+    stub = TwelveDataStub(series_start=T0.replace(tzinfo=None), series_length=250)
+    checkpoint = tmp_path / "backfill.json"
+
+    def backfill() -> TwelveDataBackfill:
+        return TwelveDataBackfill(
+            "key", concurrency=3, credits_per_minute=1_000, outputsize=100,
+            checkpoint=checkpoint, base_url="http://stub", transport=stub.transport(),
+        )
+
+    end = T0 + timedelta(hours=6)
+    rows = await backfill().run(["BFAA", "BFBB"], T0, end)
+    assert rows == 500
+    bars = await _bars("BFAA")
+    assert len(bars) == 250
+    assert bars[0].timestamp.replace(tzinfo=timezone.utc) == T0
+    assert all(p["timezone"] == "UTC" for _, p in stub.calls)
+
+    # a finished checkpoint makes the rerun a no-op
+    calls = len(stub.calls)
+    assert await backfill().run(["BFAA", "BFBB"], T0, end) == 0
+    assert len(stub.calls) == calls
+
+    # an interrupted window resumes from its cursor without duplicating rows
+    state = json.loads(checkpoint.read_text())
+    key = plan_windows("BFAA", T0, end, "1min", outputsize=100)[0].key
+    state[key] = {"cursor": (T0 + timedelta(minutes=49)).isoformat(), "rows": 0}
+    checkpoint.write_text(json.dumps(state))
+    assert await backfill().run(["BFAA"], T0, end) == 50
+    assert len(await _bars("BFAA")) == 250
+
+
+async def test_backfill_waits_out_rate_limits_and_fails_fast_on_errors():
+    stub = TwelveDataStub(
+        series_start=T0.replace(tzinfo=None), series_length=10,
+        retry_after=0.01, reject_first=6, unknown_symbols=("BFXX",),
+    )
+
+    def backfill() -> TwelveDataBackfill:
+        return TwelveDataBackfill(
+            "key", concurrency=2, credits_per_minute=100_000,
+            base_url="http://stub", transport=stub.transport(),
+        )
+
+    # more 429s than _MAX_RETRIES: the budget waits them out
+    end = T0 + timedelta(minutes=9)
+    assert await backfill().run(["BFRL"], T0, end) == 10
+    assert stub.rejected == 6
+
+    # only "No data is available" reads as empty; other 400s fail the run
+    with pytest.raises(RuntimeError, match="invalid"):
+        await backfill().run(["BFXX", "BFYY"], T0, end)
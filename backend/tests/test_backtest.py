@@ -0,0 +1,184 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+import torch
+
+from packages.agent.ddqn import DDQNAgent, DQNetwork
+from packages.agent.feature_engine import FeatureEngine
+from packages.backtest import (
+    BacktestConfig,
+    Bars,
+    backtest,
+    grid,
+    load_policy,
+    market_features,
+    run_backtest,
+    run_sweep,
+    simulate,
+    walk_forward,
+)
+from packages.db.engine import get_session_ctx
+from packages.db.models import new_uuid
+from packages.db.repositories import BacktestRepository, OHLCVRepository, UserRepository
+
+T0 = datetime(2026, 1, 5, 14, 30, tzinfo=timezone.utc)
+
+
+def _bars(symbol: str, n: int, seed: int = 0) -> Bars:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    ts = int(T0.timestamp()) + np.arange(n, dtype=np.int64) * 3_600
+    return Bars(symbol, ts, close, close * 1.005, close * 0.995, close,
+                rng.integers(100, 1_000, n).astype(np.float64))
+
+
+def _replay(net, bars: Bars, capital: float, cost_bps: float):
+    """Bar-by-bar reference with the same execution model as ``simulate``."""
+    engine = FeatureEngine()
+    cost = cost_bps / 10_000.0
+    cash, shares, entry = capital, 0.0, 0.0
+    trades, trade_day, today = 0, -1, 0
+    actions, equity = [], []
+    for i in range(len(bars)):
+        price = bars.close[i]
+        engine.push(price, bars.volume[i], bars.high[i], bars.low[i])
+        market = engine.market_features()
+        if market is None:
+            actions.append(-1)
+            equity.append(capital)
+            continue
+        day, seconds = divmod(int(bars.ts[i]), 86_400)
+        portfolio = np.array([
+            1.0 if shares else 0.0,
+            price / entry - 1.0 if shares else 0.0,
+            0.0 if shares else 1.0,
+            (today if day == trade_day else 0) / 10.0,
+            (seconds // 3_600) / 24.0,
+        ], dtype=np.float32)
+        state = np.clip(np.concatenate([market, portfolio]), -10.0, 10.0)
+        with torch.no_grad():
+            action = int(net(torch.from_numpy(state[None])).argmax())
+        if (action == 1 and not shares) or (action == 2 and shares):
+            if shares:
+                cash, shares = shares * price * (1 - cost), 0.0
+            else:
+                cash, shares, entry = 0.0, cash * (1 - cost) / price, price
+            trades += 1
+            today = today + 1 if day == trade_day else 1
+            trade_day = day
+        actions.append(action)
+        equity.append(cash + shares * price)
+    return np.array(actions), np.array(equity), trades
+
+
+def test_vectorised_features_match_feature_engine():
+    bars = _bars("AAPL", 300)
+    market = market_features(bars.close, bars.high, bars.low, bars.volume)
+    engine = FeatureEngine()
+    for i in range(len(bars)):
+        engine.push(bars.close[i], bars.volume[i], bars.high[i], bars.low[i])
+        expected = engine.market_features()
+        if expected is None:
+            assert np.isnan(market[i]).all()
+        else:
+            np.testing.assert_allclose(market[i], expected, rtol=1e-5, atol=1e-6)
+
+
+def test_simulate_matches_bar_by_bar_replay():
+    torch.manual_seed(3)
+    net = DQNetwork(FeatureEngine.STATE_DIM, 3).eval()
+    bars = _bars("AAPL", 800, seed=1)
+    config = BacktestConfig(cost_bps=5.0, min_chunk=8, max_chunk=64)
+
+    result = simulate(net, bars, 10_000.0, config)
+    actions, equity, trades = _replay(net, bars, 10_000.0, config.cost_bps)
+
+    assert result.trades == trades > 0
+    assert np.array_equal(result.actions, actions)
+    np.testing.assert_allclose(result.equity, equity, rtol=1e-9)
+
+
+def test_backtest_combines_symbols_and_reports_metrics():
+    torch.manual_seed(0)
+    net = DQNetwork(FeatureEngine.STATE_DIM, 3)
+    a, b = _bars("AAA", 400, seed=2), _bars("BBB", 300, seed=3)
+    result = backtest(net, {"AAA": a, "BBB": b}, BacktestConfig(initial_capital=2_000.0))
+
+    assert result.ts.size == 400
+    assert result.equity[0] == pytest.approx(2_000.0)
+    assert result.trades == sum(r.trades for r in result.per_symbol.values())
+    metrics = result.metrics()
+    assert metrics["final_value"] == pytest.approx(result.equity[-1])
+    assert 0.0 <= metrics["max_drawdown"] < 1.0
+
+
+@pytest.mark.asyncio
+async def test_run_backtest_records_completed_run(tmp_path):
+    bars = _bars("BTQ", 120, seed=4)
+    candles = [
+        {"symbol": "BTQ", "open": bars.open[i], "high": bars.high[i], "low": bars.low[i],
+         "close": bars.close[i], "volume": bars.volume[i],
+         "timestamp": T0 + timedelta(hours=i)}
+        for i in range(len(bars))
+    ]
+    async with get_session_ctx() as session:
+        user = await UserRepository(session).create(f"u{new_uuid()[:12]}", "hash")
+        await OHLCVRepository(session).insert_batch(candles)
+        user_id = user.id
+    checkpoint = tmp_path / "ddqn.pt"
+    DDQNAgent().save(str(checkpoint))
+
+    run_id = await run_backtest(user_id, "ddqn-test", checkpoint, ["BTQ"])
+
+    async with get_session_ctx() as session:
+        run = await BacktestRepository(session).get_run(run_id)
+    assert run.status == "completed"
+    assert run.final_value is not None and run.final_value > 0
+    assert run.symbols == "BTQ"
+
+
+def test_walk_forward_folds_roll_and_anchor():
+    start, day = T0, timedelta(days=1)
+    rolling = walk_forward(start, start + 100 * day, train=40 * day, test=20 * day)
+    assert [(f.train_start, f.test_end) for f in rolling] == [
+        (start, start + 60 * day), (start + 20 * day, start + 80 * day),
+        (start + 40 * day, start + 100 * day),
+    ]
+    anchored = walk_forward(start, start + 100 * day, train=40 * day, test=20 * day, anchored=True)
+    assert all(f.train_start == start for f in anchored)
+    assert [f.test_start for f in anchored] == [f.test_start for f in rolling]
+
+
+def test_fold_slices_share_no_bar():
+    bars, hour = _bars("AAA", 100), timedelta(hours=1)
+    for fold in walk_forward(T0, T0 + 100 * hour, train=40 * hour, test=20 * hour):
+        train = bars.slice(fold.train_start, fold.train_end)
+        test = bars.slice(fold.test_start, fold.test_end)
+        assert len(train) == 40 and len(test) == 20
+        assert train.ts[-1] < test.ts[0]
+
+
+def test_sweep_matches_direct_backtests(tmp_path):
+    torch.manual_seed(5)
+    checkpoints = []
+    for i in range(2):
+        path = tmp_path / f"m{i}.pt"
+        DDQNAgent().save(str(path))
+        checkpoints.append(str(path))
+    bars = {"AAA": _bars("AAA", 500, seed=6), "BBB": _bars("BBB", 500, seed=7)}
+    mid = datetime.fromtimestamp(int(bars["AAA"].ts[250]), timezone.utc)
+    tasks = grid(checkpoints, [("AAA",), ("AAA", "BBB")], [(None, None), (mid, None)], [0.0, 10.0])
+    tasks.append(grid(checkpoints[:1], [("NOPE",)])[0])
+
+    rows = run_sweep(bars, tasks, max_workers=2)
+
+    assert len(rows) == len(tasks) == 17
+    assert rows[-1]["status"] == "failed"
+    for task, row in zip(tasks[:-1], rows[:-1]):
+        net = load_policy(task.checkpoint)
+        subset = {s: bars[s].slice(task.start, task.end) for s in task.symbols}
+        expected = backtest(net, subset, BacktestConfig(cost_bps=task.cost_bps)).metrics()
+        assert row["status"] == "completed"
+        assert row["final_value"] == pytest.approx(expected["final_value"])
+        assert row["total_trades"] == expected["total_trades"]
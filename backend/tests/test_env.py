@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from packages.agent.apex import ApexTrainer, SharedReplayBuffer
+from packages.agent.ddqn import DDQNAgent, ReplayBuffer
+from packages.agent.env import VectorTradingEnv, collect_experience
+from packages.agent.replay_store import MemmapReplayBuffer
+from packages.agent.trainer import TrainingConfig, run_training
+from packages.backtest import Bars, market_features
+from packages.db.engine import get_session_ctx
+from packages.db.repositories import OHLCVRepository, TrainingRepository
+
+
+def _bars(symbol: str, n: int, seed: int) -> Bars:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    ts = 1_767_625_200 + np.arange(n, dtype=np.int64) * 3_600
+    return Bars(symbol, ts, close, close * 1.005, close * 0.995, close,
+                rng.integers(100, 1_000, n).astype(np.float64))
+
+
+def test_replay_buffer_push_batch_wraps_around():
+    buf = ReplayBuffer(capacity=5, state_dim=2)
+    buf.push([0, 0], 0, 0.0, [0, 0], False)
+    states = np.arange(12, dtype=np.float32).reshape(6, 2)
+    buf.push_batch(states, np.arange(1, 7), np.arange(1, 7), states, np.zeros(6))
+    assert len(buf) == 5
+    # newest five transitions survive, written at positions 2, 3, 4, 0, 1
+    assert sorted(buf.actions.tolist()) == [2, 3, 4, 5, 6]
+    s, a, r, ns, d = buf.sample(5)
+    assert s.shape == (5, 2) and sorted(a.tolist()) == [2, 3, 4, 5, 6]
+
+
+def test_env_states_and_rewards_follow_execution_model():
+    bars = _bars("AAA", 400, seed=1)
+    env = VectorTradingEnv([bars], num_envs=16, episode_length=30, cost_bps=10.0, seed=2)
+    states = env.reset()
+    start = env._t.copy()
+    market = market_features(bars.close, bars.high, bars.low, bars.volume)
+    assert states.shape == (16, 14)
+    np.testing.assert_allclose(states[:, :9], np.clip(market[start], -10, 10))
+    assert (states[:, 9] == 0).all() and (states[:, 11] == 1).all()
+
+    total = np.zeros(16)
+    done_at = np.full(16, -1)
+    for step in range(30):
+        next_states, rewards, dones = env.step(np.ones(16, dtype=np.int64))  # buy and hold
+        live = done_at < 0
+        total[live] += rewards[live]
+        if step == 0:
+            assert (next_states[:, 9] == 1).all() and (next_states[:, 12] == 0.1).all()
+        done_at[live & dones] = step
+    assert (done_at >= 0).all()
+
+    end = np.minimum(start + 30, len(bars) - 1)
+    expected = 100.0 * (np.log(bars.close[end] / bars.close[start]) + np.log1p(-0.001))
+    np.testing.assert_allclose(total, expected, rtol=1e-4)
+
+
+def test_collect_experience_fills_replay_buffer():
+    env = VectorTradingEnv([_bars("AAA", 300, 3), _bars("BBB", 200, 4)], num_envs=32, seed=0)
+    env.reset()
+    agent = DDQNAgent(batch_size=64)
+    assert collect_experience(env, agent, steps=10, epsilon=0.5) == 320
+    assert len(agent.replay) == 320
+    assert set(np.unique(agent.replay.actions[:320])) <= {0, 1, 2}
+    assert agent.train_step() is not None
+
+
+@pytest.mark.asyncio
+async def test_run_training_records_run_and_batched_metrics(tmp_path):
+    bars = _bars("TRNQ", 200, seed=5)
+    candles = [
+        {"symbol": "TRNQ", "open": bars.open[i], "high": bars.high[i], "low": bars.low[i],
+         "close": bars.close[i], "volume": bars.volume[i],
+         "timestamp": datetime.fromtimestamp(int(bars.ts[i]), timezone.utc)}
+        for i in range(len(bars))
+    ]
+    async with get_session_ctx() as session:
+        await OHLCVRepository(session).insert_batch(candles)
+
+    config = TrainingConfig(episodes=7, num_envs=8, episode_length=20, batch_size=32, seed=1)
+    output = tmp_path / "trained.pt"
+    run_id = await run_training("ddqn-test", ["TRNQ"], config=config, output=output, flush_every=3)
+
+    async with get_session_ctx() as session:
+        repo = TrainingRepository(session)
+        run = await repo.get_run(run_id)
+        metrics = await repo.get_metrics(run_id)
+    assert run.status == "completed" and run.total_episodes == 7
+    assert run.hyperparameters["symbols"] == ["TRNQ"]
+    assert [m.episode for m in metrics] == list(range(1, 8))
+    assert run.best_reward == pytest.approx(max(m.reward for m in metrics))
+    assert run.final_loss == pytest.approx(metrics[-1].loss)
+    assert output.exists()
+
+
+def test_shared_replay_buffer_is_visible_across_attachments():
+    replay = SharedReplayBuffer.create(capacity=8, state_dim=2)
+    try:
+        other = SharedReplayBuffer.attach(replay.name, 8, 2, replay.lock)
+        states = np.ones((5, 2), dtype=np.float32)
+        other.push_batch(states, np.arange(5), np.ones(5), states, np.zeros(5))
+        other.record_episodes(np.array([1.0, 2.0]))
+        assert len(replay) == 5 and replay.actions[:5].tolist() == [0, 1, 2, 3, 4]
+        assert replay.stats() == (5, 2, 3.0)
+        s, a, r, ns, d = replay.sample(4)
+        assert s.shape == (4, 2)
+        other.close()
+    finally:
+        replay.close()
+
+
+def test_memmap_replay_buffer_survives_reopen(tmp_path):
+    replay = MemmapReplayBuffer(tmp_path / "replay", capacity=8, state_dim=2)
+    states = np.arange(20, dtype=np.float32).reshape(10, 2)
+    replay.push_batch(states, np.arange(10), np.ones(10), states + 1, np.zeros(10))
+    with pytest.raises(RuntimeError):  # one writer per directory
+        MemmapReplayBuffer(tmp_path / "replay", capacity=8, state_dim=2)
+    replay.close()
+
+    reopened = MemmapReplayBuffer(tmp_path / "replay", capacity=8, state_dim=2)
+    try:
+        assert len(reopened) == 8 and reopened.actions.tolist() == list(range(2, 10))
+        reopened.push(states[0], 42, 0.5, states[0], True)  # overwrites the oldest
+        assert reopened.actions[0] == 42 and reopened._pos == 1
+        s, a, r, ns, d = reopened.sample(8)
+        kept = a != 42  # transitions written before the reopen
+        assert kept.sum() == 7 and np.array_equal(ns[kept], s[kept] + 1)
+    finally:
+        reopened.close()
+    with pytest.raises(ValueError):
+        MemmapReplayBuffer(tmp_path / "replay", capacity=16, state_dim=2)
+
+
+def test_apex_actors_feed_the_learner():
+    config = TrainingConfig(
+        episodes=2, num_envs=8, episode_length=10, batch_size=32, actors=2,
+        learning_starts=64, buffer_capacity=4_096, publish_every=5, actor_sync_every=2, seed=0,
+    )
+    trainer = ApexTrainer([_bars("AAA", 300, 1), _bars("BBB", 300, 2)], config)
+    seen = []
+    result = trainer.run(on_episode=seen.append)
+    assert result.episodes == 2 and [m.episode for m in seen] == [1, 2]
+    assert trainer.agent.step_count == 20
+    assert result.final_loss is not None and np.isfinite(result.final_loss)
@@ -0,0 +1,363 @@
+import asyncio
+import os
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+import pytest
+from twelvedata_stub import TwelveDataStub
+
+from packages.data.adapters.mock import MockDataProvider
+from packages.data.adapters.replay import ReplayDataProvider
+from packages.data.adapters.synthetic import SyntheticDataProvider, SyntheticMarket
+from packages.data.adapters.twelvedata import TwelveDataProvider
+from packages.data.bus import BusProvider, decode_frame, encode_frame
+from packages.data.provider import BackpressurePolicy, QuoteQueue
+from packages.data.scheduling import CreditBudget, PollScheduler
+from packages.shared.config import Settings
+from packages.shared.schemas import Quote, Tick
+
+
+def _tick(symbol: str, price: float) -> Tick:
+    return Tick(symbol, price, 1, datetime.now(timezone.utc))
+
+
+async def _drain(queue: QuoteQueue) -> list[tuple[str, float]]:
+    out = []
+    while queue.qsize():
+        q = await queue.get()
+        out.append((q.symbol, q.price))
+    return out
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_newest_quotes():
+    queue = QuoteQueue(maxsize=2, policy="drop_oldest")
+    for price in (1.0, 2.0, 3.0):
+        await queue.put(_tick("AAPL", price))
+    assert await _drain(queue) == [("AAPL", 2.0), ("AAPL", 3.0)]
+
+
+@pytest.mark.asyncio
+async def test_conflate_keeps_latest_per_symbol_in_arrival_order():
+    queue = QuoteQueue(maxsize=10, policy=BackpressurePolicy.CONFLATE)
+    await queue.put(_tick("AAPL", 1.0))
+    await queue.put(_tick("MSFT", 5.0))
+    await queue.put(_tick("AAPL", 2.0))
+    assert await _drain(queue) == [("AAPL", 2.0), ("MSFT", 5.0)]
+
+
+@pytest.mark.asyncio
+async def test_conflate_wakes_waiting_consumer():
+    queue = QuoteQueue(maxsize=1, policy="conflate")
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    await queue.put(_tick("TSLA", 9.0))
+    assert (await asyncio.wait_for(getter, 1)).price == 9.0
+
+
+@pytest.mark.asyncio
+async def test_block_applies_backpressure_to_producer():
+    queue = QuoteQueue(maxsize=1, policy="block")
+    await queue.put(_tick("AAPL", 1.0))
+    putter = asyncio.create_task(queue.put(_tick("AAPL", 2.0)))
+    await asyncio.sleep(0.01)
+    assert not putter.done()
+    assert (await queue.get()).price == 1.0
+    await asyncio.wait_for(putter, 1)
+    assert (await queue.get()).price == 2.0
+
+
+@pytest.mark.asyncio
+async def test_invalid_policy_rejected():
+    with pytest.raises(ValueError):
+        QuoteQueue(policy="unbounded")
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_batch_publish_is_bounded():
+    queue = QuoteQueue(maxsize=3, policy="drop_oldest")
+    await queue.put_many([_tick("AAPL", float(p)) for p in range(5)])
+    await queue.put_many([_tick("MSFT", 9.0)])
+    assert await _drain(queue) == [("AAPL", 3.0), ("AAPL", 4.0), ("MSFT", 9.0)]
+
+
+def test_tick_matches_validated_quote_json():
+    ts = datetime(2024, 1, 2, 14, 30, 0, 250, tzinfo=timezone.utc)
+    tick = Tick("AAPL", 101.5, 10, ts, high=102.0)
+    assert tick.as_dict() == Quote(**asdict(tick)).model_dump(mode="json")
+
+
+def test_synthetic_market_is_seeded_and_consistent():
+    a = SyntheticMarket(200, seed=7).step(50)
+    b = SyntheticMarket(200, seed=7).step(50)
+    assert np.array_equal(a["close"], b["close"])
+    assert a["close"].shape == (50, 200)
+    assert (a["high"] >= np.maximum(a["open"], a["close"])).all()
+    assert (a["low"] <= np.minimum(a["open"], a["close"])).all()
+    # one-factor model: returns across symbols are positively correlated
+    rets = np.diff(np.log(SyntheticMarket(200, seed=7, correlation=0.5).step(500)["close"]), axis=0)
+    corr = np.corrcoef(rets.T)
+    assert corr[np.triu_indices(200, 1)].mean() > 0.2
+
+
+@pytest.mark.asyncio
+async def test_synthetic_provider_cycles_symbols_at_target_rate():
+    provider = SyntheticDataProvider(
+        symbols=["AAPL"], n_symbols=50, tick_rate=5_000, queue_maxsize=100_000
+    )
+    first = provider.take(50)
+    assert first[0].symbol == "AAPL"
+    assert len({q.symbol for q in first}) == 50
+    assert all(q.high >= q.close >= q.low for q in first)
+
+    await provider.start()
+    await asyncio.sleep(0.3)
+    await provider.stop()
+    assert 500 <= provider.ticks_emitted <= 3_000
+
+
+async def _collect(provider, count: int) -> list[Tick]:
+    stream = provider.stream_quotes()
+    return [await asyncio.wait_for(stream.__anext__(), 2) for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_replay_merges_csv_files_in_timestamp_order(tmp_path):
+    (tmp_path / "aapl_1min.csv").write_text(
+        "timestamp,open,high,low,close,volume\n"
+        "2024-01-02T14:30:00Z,10,11,9,10.5,100\n"
+        "2024-01-02T14:32:00Z,10.5,12,10,11.5,200\n"
+    )
+    (tmp_path / "msft.csv").write_text(
+        "timestamp,symbol,price\n"
+        "1704205860,MSFT,300\n"
+    )
+    provider = ReplayDataProvider(str(tmp_path / "*.csv"), speed=0, backpressure="block")
+    await provider.start()
+    quotes = await _collect(provider, 3)
+    await asyncio.wait_for(provider.finished.wait(), 2)
+    await provider.stop()
+
+    assert [(q.symbol, q.price) for q in quotes] == [
+        ("AAPL", 10.5), ("MSFT", 300.0), ("AAPL", 11.5),
+    ]
+    assert quotes[0].high == 11.0 and quotes[1].high is None
+
+
+@pytest.mark.asyncio
+async def test_replay_logs_a_failing_source(tmp_path, caplog):
+    (tmp_path / "bad.csv").write_text("timestamp,symbol,price\nnot-a-time,AAPL,1\n")
+    provider = ReplayDataProvider(str(tmp_path / "bad.csv"), speed=0)
+    await provider.start()
+    await asyncio.wait_for(provider.finished.wait(), 2)
+    await provider.stop()
+    assert "Replay of" in caplog.text and "failed" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_replay_paces_by_speed_and_reads_db(tmp_path):
+    from packages.db.engine import get_session_ctx
+    from packages.db.repositories import OHLCVRepository
+
+    t0 = datetime(2019, 6, 3, 14, 30, tzinfo=timezone.utc)
+    async with get_session_ctx() as session:
+        await OHLCVRepository(session).insert_batch([
+            {"symbol": "RPLY", "open": 1, "high": 1, "low": 1, "close": 1 + i,
+             "volume": 1, "timestamp": t0.replace(second=i)}
+            for i in range(3)
+        ])
+
+    provider = ReplayDataProvider("db:ohlcv", symbols=["RPLY"], speed=10, backpressure="block")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await provider.start()
+    quotes = await _collect(provider, 3)
+    elapsed = loop.time() - started
+    await provider.stop()
+
+    assert [q.close for q in quotes] == [1.0, 2.0, 3.0]
+    # 2 recorded seconds at 10x ≈ 0.2s of wall time
+    assert 0.15 <= elapsed < 1.5
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_credit_budget_refills_and_backs_off():
+    clock = _Clock()
+    budget = CreditBudget(60, clock=clock)
+    assert budget.wait_time(60) == 0
+    budget._tokens = 0.0
+    assert budget.wait_time(3) == pytest.approx(3.0)
+
+    budget.penalize(retry_after=10)
+    assert budget.rate == 30
+    assert budget.wait_time(1) == pytest.approx(12.0)
+    clock.now += 10
+    assert budget.wait_time(1) == pytest.approx(2.0)
+    budget.reward()
+    assert budget.rate == 31
+
+
+def test_poll_scheduler_rotates_and_prefers_watched_symbols():
+    clock = _Clock()
+    scheduler = PollScheduler(["AAA", "BBB", "CCC", "DDD"], max_batch=2, clock=clock)
+    scheduler.touch("DDD")
+    counts = dict.fromkeys(scheduler.symbols, 0)
+    for _ in range(40):
+        batch = scheduler.next_batch(scheduler.batch_size(8))
+        scheduler.mark_polled(batch)
+        for symbol in batch:
+            counts[symbol] += 1
+        clock.now += 1
+    assert min(counts.values()) > 0
+    assert counts["DDD"] > 1.5 * max(counts[s] for s in ("AAA", "BBB", "CCC"))
+
+
+@pytest.mark.asyncio
+async def test_twelvedata_polls_in_budget_rotating_batches():
+    stub = TwelveDataStub()
+    provider = TwelveDataProvider(
+        "key", symbols=["AAPL", "MSFT", "TSLA"], credits_per_minute=600, max_batch=2,
+        base_url="http://stub", transport=stub.transport(),
+    )
+    await provider.start()
+    quotes = await _collect(provider, 6)
+    await provider.stop()
+
+    assert {q.symbol for q in quotes} == {"AAPL", "MSFT", "TSLA"}
+    assert all(len(params["symbol"].split(",")) <= 2 for _, params in stub.calls)
+    assert stub.rejected == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("style", ["http", "body"])
+async def test_twelvedata_backs_off_on_rate_limit(style):
+    stub = TwelveDataStub(credits_per_minute=2, rate_limit_style=style, retry_after=5)
+    provider = TwelveDataProvider(
+        "key", symbols=["AAPL", "MSFT", "TSLA"], credits_per_minute=600, max_batch=1,
+        base_url="http://stub", transport=stub.transport(),
+    )
+    await provider.start()
+    await asyncio.sleep(0.2)
+    await provider.stop()
+
+    assert sum(stub.polled.values()) == 2
+    # one rejection, then the provider waits out Retry-After instead of retrying
+    assert stub.rejected == 1
+    assert provider.budget.rate == 300
+
+
+@pytest.mark.asyncio
+async def test_twelvedata_backs_off_while_unreachable():
+    calls = []
+
+    def refuse(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    provider = TwelveDataProvider(
+        "key", symbols=["AAPL", "MSFT"], credits_per_minute=600, max_batch=1,
+        base_url="http://stub", transport=httpx.MockTransport(refuse),
+    )
+    await provider.start()
+    await asyncio.sleep(0.2)
+    await provider.stop()
+    assert len(calls) == 1  # then waits, instead of retrying the same batch at once
+
+
+@pytest.mark.asyncio
+async def test_quote_bus_shares_one_upstream_and_fails_over(tmp_path):
+    upstreams = []
+
+    def factory():
+        upstreams.append(MockDataProvider(symbols=["AAPL"], interval=0.2))
+        return upstreams[-1]
+
+    path = str(tmp_path / "bus.sock")
+    leader = BusProvider(factory, path, reconnect_delay=0.05)
+    follower = BusProvider(factory, path, reconnect_delay=0.05)
+    await leader.start()
+    await _collect(leader, 1)
+    await follower.start()
+    await follower.subscribe("msft", "quotes")
+    ticks = await _collect(follower, 6)
+
+    assert (leader.role, follower.role) == ("leader", "follower")
+    assert len(upstreams) == 1
+    assert {"AAPL", "MSFT"} <= {t.symbol for t in ticks}
+
+    await leader.stop()
+    for _ in range(100):
+        if follower.role == "leader":
+            break
+        await asyncio.sleep(0.02)
+    assert follower.role == "leader"
+    assert len(upstreams) == 2
+    # the promoted worker re-applies the subscriptions it had forwarded
+    assert "MSFT" in upstreams[-1]._symbols
+    await follower.stop()
+
+
+@pytest.mark.asyncio
+async def test_quote_bus_survives_a_failing_upstream(tmp_path):
+    class Broken(MockDataProvider):
+        async def start(self) -> None:
+            raise ConnectionError("upstream down")
+
+    upstreams = []
+
+    def factory():
+        upstreams.append((Broken if not upstreams else MockDataProvider)(symbols=["AAPL"]))
+        return upstreams[-1]
+
+    bus = BusProvider(factory, str(tmp_path / "bus.sock"), reconnect_delay=0.01)
+    await bus.start()
+    try:
+        assert len(await _collect(bus, 1)) == 1
+        assert len(upstreams) == 2 and bus.role == "leader"
+    finally:
+        await bus.stop()
+
+
+@pytest.mark.asyncio
+async def test_quote_bus_leader_without_local_reader_keeps_feeding_followers(tmp_path):
+    def factory():
+        return MockDataProvider(symbols=["AAPL"], interval=0.01)
+
+    path = str(tmp_path / "bus.sock")
+    options = {"reconnect_delay": 0.05, "queue_maxsize": 1, "backpressure": "block"}
+    leader = BusProvider(factory, path, **options)
+    follower = BusProvider(factory, path, **options)
+    await leader.start()
+    for _ in range(100):
+        if leader.role == "leader":
+            break
+        await asyncio.sleep(0.02)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    # nobody reads the leader's own full BLOCK queue
+    await follower.start()
+    ticks = await _collect(follower, 5)
+    assert len(ticks) == 5
+    await follower.stop()
+    await leader.stop()
+
+
+def test_bus_frames_round_trip_ticks():
+    ts = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+    ticks = [Tick("AAPL", 1.5, 3, ts, close=1.5), Tick("MSFT", 2.0, 0, ts)]
+    assert decode_frame(encode_frame(ticks)) == ticks
+
+
+def test_deprecated_poll_interval_sets_the_min_refresh_interval():
+    with pytest.warns(FutureWarning, match="TWELVEDATA_POLL_INTERVAL"):
+        settings = Settings(twelvedata_poll_interval=60.0, jwt_secret="test")
+    assert settings.twelvedata_min_refresh_interval == 60.0
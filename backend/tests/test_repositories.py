@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from packages.db.engine import get_session_ctx
+from packages.db.models import new_uuid
+from packages.db.repositories import (
+    AgentActionRepository,
+    AuditLogRepository,
+    BacktestRepository,
+    ModelArtifactRepository,
+    OHLCVRepository,
+    OrderRepository,
+    PositionRepository,
+    QuoteRepository,
+    TrainingRepository,
+    UserRepository,
+    UserSettingsRepository,
+)
+from packages.db.retention import QuoteRetentionManager
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+T0 = datetime(2026, 1, 5, 14, 30, tzinfo=timezone.utc)
+
+
+async def _new_user() -> str:
+    async with get_session_ctx() as session:
+        user = await UserRepository(session).create(f"u{new_uuid()[:12]}", "hash")
+        return user.id
+
+
+async def test_user_and_settings():
+    user_id = await _new_user()
+    async with get_session_ctx() as session:
+        users = UserRepository(session)
+        await users.set_active(user_id, False)
+        assert (await users.get_by_id(user_id)).is_active is False
+
+        settings = UserSettingsRepository(session)
+        assert (await settings.get_or_create(user_id)).trading_mode == "paper"
+        row = await settings.upsert(user_id, trading_mode="live")
+        assert row.trading_mode == "live"
+        row = await settings.upsert(user_id, theme="dark")
+        assert (row.trading_mode, row.theme) == ("live", "dark")
+        assert (await settings.get_or_create(user_id)).theme == "dark"
+
+
+async def test_quotes_and_ohlcv_bulk_insert():
+    ticks = [
+        {"symbol": "BULKQ", "price": 100.0 + i, "volume": i, "timestamp": T0 + timedelta(seconds=i)}
+        for i in range(1_000)
+    ]
+    candles = [
+        {"symbol": "BULKQ", "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5,
+         "volume": 10, "timestamp": T0 + timedelta(minutes=i)}
+        for i in range(10)
+    ]
+    async with get_session_ctx() as session:
+        await QuoteRepository(session).insert_batch(ticks)
+        await OHLCVRepository(session).insert_batch(candles)
+
+    async with get_session_ctx() as session:
+        latest = await QuoteRepository(session).get_latest("BULKQ", limit=3)
+        assert [q.price for q in latest] == [1099.0, 1098.0, 1097.0]
+        bars = await OHLCVRepository(session).get_range("BULKQ", T0, T0 + timedelta(minutes=4))
+        assert len(bars) == 5
+
+
+async def test_orders_positions_and_actions():
+    user_id = await _new_user()
+    async with get_session_ctx() as session:
+        orders = OrderRepository(session)
+        order = await orders.create(user_id=user_id, symbol="AAPL", side="buy", quantity=3)
+        await orders.update_status(order.id, "filled", filled_price=101.0)
+
+        positions = PositionRepository(session)
+        await positions.upsert(user_id, "AAPL", quantity=3, avg_entry_price=101.0)
+        await positions.upsert(user_id, "AAPL", quantity=5)
+
+        actions = AgentActionRepository(session)
+        await actions.log("AAPL", "BUY", 0.9, "ddqn-test")
+
+    async with get_session_ctx() as session:
+        [order] = await OrderRepository(session).get_user_orders(user_id)
+        assert (order.status, order.filled_price) == ("filled", 101.0)
+        [pos] = await PositionRepository(session).get_user_positions(user_id)
+        assert (pos.quantity, pos.avg_entry_price) == (5, 101.0)
+        recent = await AgentActionRepository(session).get_recent(limit=5)
+        assert any(a.model_version == "ddqn-test" for a in recent)
+
+
+async def test_models_training_backtests_and_audit():
+    user_id = await _new_user()
+    name = f"model-{new_uuid()[:8]}"
+    async with get_session_ctx() as session:
+        await ModelArtifactRepository(session).register(name, "1", metrics={"sharpe": 1.2})
+
+        training = TrainingRepository(session)
+        run = await training.create_run(name, {"lr": 1e-4})
+        await training.log_metric(run.id, episode=1, loss=0.5, reward=1.0)
+        await training.complete_run(run.id, best_reward=1.0, final_loss=0.5)
+
+        await BacktestRepository(session).create(user_id=user_id, model_name=name, symbols="AAPL")
+        await AuditLogRepository(session).log("TEST", user_id=user_id, details={"ok": True})
+
+    async with get_session_ctx() as session:
+        artifact = await ModelArtifactRepository(session).get_by_name(name)
+        assert artifact.metrics == {"sharpe": 1.2}
+        [run] = [r for r in await TrainingRepository(session).list_runs() if r.model_name == name]
+        assert (run.status, run.best_reward) == ("completed", 1.0)
+        assert len(await BacktestRepository(session).get_user_backtests(user_id)) == 1
+        assert any(e.user_id == user_id for e in await AuditLogRepository(session).get_recent())
+
+
+async def test_retention_rolls_up_and_deletes_old_windows():
+    old = datetime(2020, 3, 2, 10, 0, tzinfo=timezone.utc)
+    ticks = [
+        {"symbol": "RETQ", "price": p, "volume": 1, "timestamp": old + timedelta(seconds=s)}
+        for s, p in [(0, 10.0), (10, 12.0), (70, 11.0)]
+    ]
+    async with get_session_ctx() as session:
+        await QuoteRepository(session).insert_batch(ticks)
+
+    manager = QuoteRetentionManager(retention_days=7, rollup_seconds=60)
+    assert await manager.run_once() >= 1
+
+    # rolling the same window up again replaces its bars instead of duplicating them
+    async with get_session_ctx() as session:
+        await QuoteRepository(session).insert_batch(ticks)
+    assert await manager.run_once() >= 1
+
+    async with get_session_ctx() as session:
+        assert await QuoteRepository(session).get_latest("RETQ") == []
+        bars = await OHLCVRepository(session).get_range("RETQ", old, old + timedelta(hours=1))
+        assert [(b.open, b.high, b.close, b.volume) for b in bars] == [
+            (10.0, 12.0, 12.0, 2),
+            (11.0, 11.0, 11.0, 1),
+        ]
+
+
+async def test_repository_and_pool_metrics_recorded():
+    from prometheus_client import REGISTRY
+
+    def sample(name: str, labels: dict | None = None) -> float:
+        return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+    label = {"operation": "QuoteRepository.get_latest"}
+    before = sample("app_db_query_duration_seconds_count", label)
+    checkouts = sample("app_db_pool_checkout_wait_seconds_count")
+
+    async with get_session_ctx() as session:
+        await QuoteRepository(session).get_latest("NOPE")
+
+    assert sample("app_db_query_duration_seconds_count", label) == before + 1
+    assert sample("app_db_pool_checkout_wait_seconds_count") > checkouts
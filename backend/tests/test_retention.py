@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from packages.db.retention import (
+    parse_partition_bounds,
+    partition_name,
+    rollup_bars,
+    window_start,
+)
+
+
+def _ts(h: int, m: int, s: int = 0) -> datetime:
+    return datetime(2026, 10, 19, h, m, s, tzinfo=timezone.utc)
+
+
+def test_window_start_aligns_to_partition_width():
+    ts = datetime(2026, 10, 19, 15, 30, tzinfo=timezone.utc)
+    assert window_start(ts) == datetime(2026, 10, 19, tzinfo=timezone.utc)
+    # multi-day windows are aligned to the epoch, not to the calendar week
+    start = window_start(ts, days=7)
+    assert start <= ts
+    assert (ts - start).days < 7
+    assert window_start(start, days=7) == start
+
+
+def test_partition_name():
+    assert partition_name(datetime(2026, 10, 19, tzinfo=timezone.utc)) == "quotes_p20261019"
+
+
+def test_parse_partition_bounds_reads_catalog_expression():
+    expr = "FOR VALUES FROM ('2026-10-19 02:00:00+02') TO ('2026-10-26 00:00:00+00')"
+    lo, hi = parse_partition_bounds(expr)
+    assert lo == datetime(2026, 10, 19, tzinfo=timezone.utc)
+    assert hi == datetime(2026, 10, 26, tzinfo=timezone.utc)
+    assert parse_partition_bounds("DEFAULT") is None
+    assert parse_partition_bounds("FOR VALUES FROM (MINVALUE) TO ('2026-10-19')") is None
+
+
+def test_rollup_bars_folds_ticks_per_symbol_and_bucket():
+    ticks = [
+        ("AAPL", 100.0, 10, _ts(9, 30, 1)),
+        ("AAPL", 102.0, 5, _ts(9, 30, 20)),
+        ("AAPL", 99.0, 5, _ts(9, 30, 59)),
+        ("AAPL", 101.0, 1, _ts(9, 31, 0)),
+        ("MSFT", 300.0, 7, _ts(9, 30, 5)),
+    ]
+    bars = list(rollup_bars(ticks, bucket_seconds=60))
+
+    assert [(b["symbol"], b["timestamp"]) for b in bars] == [
+        ("AAPL", _ts(9, 30)),
+        ("AAPL", _ts(9, 31)),
+        ("MSFT", _ts(9, 30)),
+    ]
+    first = bars[0]
+    ohlc = (first["open"], first["high"], first["low"], first["close"])
+    assert ohlc == (100.0, 102.0, 99.0, 99.0)
+    assert first["volume"] == 20
+
+
+def test_rollup_bars_empty_input():
+    assert list(rollup_bars([])) == []
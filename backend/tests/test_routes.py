@@ -1,3 +1,5 @@
+import json
+
 import pytest
 import pytest_asyncio
 from fastapi import HTTPException
@@ -123,3 +125,75 @@ async def test_agent_status(client, auth_headers):
     assert "epsilon" in data
     assert "buffer_size" in data
     assert "step_count" in data
+
+
+async def test_trades_keyset_pagination(client, auth_headers):
+    headers = auth_headers
+    for i in range(3):
+        r = await client.post(
+            "/api/v1/trades",
+            headers=headers,
+            json={"symbol": "MSFT", "side": "SELL", "quantity": 1, "price": 10.0 + i},
+        )
+        assert r.status_code == 200
+
+    seen: list[int] = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/api/v1/trades", headers=headers, params=params)
+        assert r.status_code == 200
+        seen.extend(t["id"] for t in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) >= 4
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == len(seen)
+
+    r = await client.get("/api/v1/trades", headers=headers, params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+async def test_trades_export_streams_csv_and_ndjson(client, auth_headers):
+    headers = auth_headers
+    r = await client.get("/api/v1/trades", headers=headers, params={"limit": 500})
+    expected = sorted(t["id"] for t in r.json())
+
+    r = await client.get("/api/v1/trades/export", headers=headers, params={"format": "csv"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    lines = r.text.strip().splitlines()
+    assert lines[0].startswith("id,user_id,symbol")
+    assert [int(line.split(",")[0]) for line in lines[1:]] == expected
+
+    r = await client.get("/api/v1/trades/export", headers=headers, params={"format": "ndjson"})
+    assert r.status_code == 200
+    rows = [json.loads(line) for line in r.text.strip().splitlines()]
+    assert [row["id"] for row in rows] == expected
+
+
+async def test_training_runs_as_background_job(client, auth_headers):
+    r = await client.post("/api/v1/rl/train", headers=auth_headers, json={"steps": 2})
+    assert r.status_code == 202
+    job = r.json()
+    assert job["state"] in ("queued", "running", "failed") and job["steps"] == 2
+
+    async with client.stream(
+        "GET", f"/api/v1/rl/jobs/{job['id']}/events?interval=0.05", headers=auth_headers
+    ) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        events = [
+            json.loads(line[len("data: "):])
+            async for line in stream.aiter_lines()
+            if line.startswith("data: ")
+        ]
+    # the replay buffer is empty, so the job fails without a gradient step
+    assert events[-1]["state"] == "failed" and events[-1]["completed_steps"] == 0
+    assert "fewer than one batch" in events[-1]["error"]
+
+    r = await client.get(f"/api/v1/rl/jobs/{job['id']}", headers=auth_headers)
+    assert r.status_code == 200 and r.json()["state"] == "failed"
+    r = await client.get("/api/v1/rl/jobs/missing", headers=auth_headers)
+    assert r.status_code == 404
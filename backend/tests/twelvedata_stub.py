@@ -0,0 +1,128 @@
+"""
+In-process stand-in for the Twelve Data REST API.
+
+Serves ``/price``, ``/quote`` and ``/time_series`` from deterministic data and
+enforces a per-minute credit budget the way the real API does — either with
+HTTP 429 + ``Retry-After`` or with a 200 ``{"code": 429}`` body.  Mount it on
+an ``httpx.ASGITransport`` and hand that to the provider under test.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class TwelveDataStub:
+    def __init__(
+        self,
+        credits_per_minute: int = 1_000,
+        rate_limit_style: str = "http",  # http | body
+        retry_after: float = 1.0,
+        series_start: datetime = datetime(2024, 1, 2, 14, 30),
+        series_length: int = 0,
+        reject_first: int = 0,
+        unknown_symbols: tuple[str, ...] = (),
+    ) -> None:
+        self.credits_per_minute = credits_per_minute
+        self.rate_limit_style = rate_limit_style
+        self.retry_after = retry_after
+        self.series_start = series_start
+        self.series_length = series_length
+        self.reject_first = reject_first
+        self.unknown_symbols = set(unknown_symbols)
+        self.calls: list[tuple[str, dict]] = []
+        self.polled: dict[str, int] = {}
+        self.rejected = 0
+        self._spent: list[tuple[float, int]] = []
+        self.app = Starlette(routes=[
+            Route("/price", self._price),
+            Route("/quote", self._quote),
+            Route("/time_series", self._time_series),
+        ])
+
+    def transport(self) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self.app)
+
+    # ── credit accounting ─────────────────────────────────────
+
+    def _charge(self, credits: int) -> JSONResponse | None:
+        now = time.monotonic()
+        self._spent = [(t, c) for t, c in self._spent if now - t < 60.0]
+        over_budget = sum(c for _, c in self._spent) + credits > self.credits_per_minute
+        if over_budget or self.rejected < self.reject_first:
+            self.rejected += 1
+            body = {"code": 429, "message": "You have run out of API credits", "status": "error"}
+            headers = {"Retry-After": str(self.retry_after)}
+            status = 429 if self.rate_limit_style == "http" else 200
+            return JSONResponse(body, status_code=status, headers=headers)
+        self._spent.append((now, credits))
+        return None
+
+    @staticmethod
+    def _price_for(symbol: str) -> float:
+        return float(100 + sum(map(ord, symbol)) % 400)
+
+    # ── endpoints ─────────────────────────────────────────────
+
+    async def _price(self, request: Request) -> JSONResponse:
+        params = dict(request.query_params)
+        self.calls.append(("/price", params))
+        symbols = [s for s in params.get("symbol", "").split(",") if s]
+        if (limited := self._charge(len(symbols))) is not None:
+            return limited
+        for s in symbols:
+            self.polled[s] = self.polled.get(s, 0) + 1
+        if len(symbols) == 1:
+            return JSONResponse({"price": str(self._price_for(symbols[0]))})
+        return JSONResponse({s: {"price": str(self._price_for(s))} for s in symbols})
+
+    async def _quote(self, request: Request) -> JSONResponse:
+        params = dict(request.query_params)
+        self.calls.append(("/quote", params))
+        if (limited := self._charge(1)) is not None:
+            return limited
+        symbol = params["symbol"]
+        price = self._price_for(symbol)
+        return JSONResponse({"symbol": symbol, "close": str(price), "open": str(price)})
+
+    async def _time_series(self, request: Request) -> JSONResponse:
+        """Minute bars, newest first, bounded by ``start_date``/``end_date``/``outputsize``."""
+        params = dict(request.query_params)
+        self.calls.append(("/time_series", params))
+        if (limited := self._charge(1)) is not None:
+            return limited
+        symbol = params["symbol"]
+        if symbol in self.unknown_symbols:
+            message = f"**symbol** {symbol} is invalid or not supported"
+            return JSONResponse({"code": 400, "message": message, "status": "error"})
+        size = int(params.get("outputsize", 30))
+        bars = [self.series_start + timedelta(minutes=i) for i in range(self.series_length)]
+        if "start_date" in params:
+            start = datetime.fromisoformat(params["start_date"])
+            bars = [b for b in bars if b >= start]
+        if "end_date" in params:
+            end = datetime.fromisoformat(params["end_date"])
+            bars = [b for b in bars if b <= end]
+        bars = bars[::-1][:size]
+        if not bars:
+            return JSONResponse({"code": 400, "message": "No data is available", "status": "error"})
+        base = self._price_for(symbol)
+        values = [
+            {
+                "datetime": b.strftime("%Y-%m-%d %H:%M:%S"),
+                "open": f"{base:.2f}",
+                "high": f"{base + 1:.2f}",
+                "low": f"{base - 1:.2f}",
+                "close": f"{base + 0.5:.2f}",
+                "volume": "100",
+            }
+            for b in bars
+        ]
+        return JSONResponse(
+            {"meta": {"symbol": symbol, "interval": "1min"}, "values": values, "status": "ok"}
+        )
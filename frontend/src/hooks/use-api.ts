@@ -137,12 +137,21 @@ export interface TradeFilters {
 	to?: string;
 }
 
-export interface TrainingResult {
-	loss: number | null;
-	epsilon: number;
+export interface TrainingJob {
+	id: string;
+	state: "queued" | "running" | "completed" | "failed" | "cancelled";
 	steps: number;
+	completed_steps: number;
+	loss: number | null;
+	epsilon: number | null;
+	error: string | null;
+	created_at: string;
+	started_at: string | null;
+	finished_at: string | null;
 }
 
+const TRAINING_POLL_MS = 500;
+
 export interface StreamSubscribePayload {
 	symbol: string;
 	channel?: "quotes" | "trades";
@@ -278,7 +287,18 @@ export function useTradeHistory(page: number, filters: TradeFilters = {}) {
 export function useTrainStep() {
 	const queryClient = useQueryClient();
 	return useMutation({
-		mutationFn: () => requestJson<TrainingResult>("/api/v1/rl/train", { method: "POST" }),
+		// Training runs as a background job; poll it until it finishes.
+		mutationFn: async (steps: number = 1) => {
+			let job = await requestJson<TrainingJob>("/api/v1/rl/train", {
+				method: "POST",
+				body: JSON.stringify({ steps }),
+			});
+			while (job.state === "queued" || job.state === "running") {
+				await new Promise((resolve) => setTimeout(resolve, TRAINING_POLL_MS));
+				job = await requestJson<TrainingJob>(`/api/v1/rl/jobs/${job.id}`);
+			}
+			return job;
+		},
 		onSuccess: () => {
 			queryClient.invalidateQueries({ queryKey: ["agent-status"] });
 		},
@@ -15,9 +15,7 @@ export default function AgentPage() {
   const confidence = useMemo(() => Math.round((status?.last_action?.confidence ?? 0) * 100), [status]);
 
   const runTraining = async () => {
-    for (let i = 0; i < manualCount; i += 1) {
-      await train.mutateAsync();
-    }
+    await train.mutateAsync(manualCount);
     await refetch();
   };
 
@@ -79,8 +77,8 @@ export default function AgentPage() {
           {train.data && (
             <div className="mt-4 grid grid-cols-1 sm:grid-cols-3 gap-3 text-sm">
               <Info label="Loss" value={train.data.loss == null ? "-" : train.data.loss.toFixed(4)} />
-              <Info label="Epsilon" value={train.data.epsilon.toFixed(4)} />
-              <Info label="Steps" value={String(train.data.steps)} />
+              <Info label="Epsilon" value={train.data.epsilon == null ? "-" : train.data.epsilon.toFixed(4)} />
+              <Info label="Steps" value={`${train.data.completed_steps} / ${train.data.steps}`} />
             </div>
           )}
         </section>